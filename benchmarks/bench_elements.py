@@ -0,0 +1,74 @@
+"""Memory-per-note benchmark for RheingoldGraph elements.
+
+Compares Note against a reference dict-backed Note with the same fields,
+laid out as Note was before it used __slots__ and interned values.
+
+Usage:
+    python benchmarks/bench_elements.py [num_notes]
+"""
+import sys
+import timeit
+import tracemalloc
+from itertools import cycle, islice
+
+from rheingoldgraph.elements import Note
+
+
+class DictNote:
+    """Reference Note keeping its fields in __dict__."""
+    label = 'Note'
+
+    def __init__(self, name=None, length=None, dot=None):
+        self.name = name
+        self.length = length
+        self.dot = dot
+        self._id = None
+
+    @classmethod
+    def from_dict(cls, mapping):
+        mapping = mapping.copy()
+        mapping.pop('label')
+
+        note = cls.__new__(cls)
+        note._id = mapping.pop('id', None)
+        for key, value in mapping.items():
+            setattr(note, key, value)
+
+        return note
+
+
+def note_dicts(num_notes):
+    """Note properties as returned by the graph, cycling through a small vocabulary."""
+    names = ['{0}{1}'.format(step, octave) for octave in range(2, 5) for step in 'CDEFGAB']
+    values = cycle([(name, length, dot) for name in names for length in (4, 8, 16) for dot in (0, 1)])
+    # Build each name at runtime, as strings from the graph are not interned
+    return [{'id': i, 'label': 'Note', 'name': ''.join(list(name)), 'length': length, 'dot': dot}
+            for i, (name, length, dot) in enumerate(islice(values, num_notes))]
+
+
+def bytes_per_note(cls, mappings):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    notes = [cls.from_dict(m) for m in mappings]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # Do not count the list holding the notes
+    total -= sys.getsizeof(notes)
+    return total / len(notes)
+
+
+def main(num_notes=100000):
+    mappings = note_dicts(num_notes)
+
+    print('{0} notes'.format(num_notes))
+    for cls in (DictNote, Note):
+        per_note = bytes_per_note(cls, mappings)
+        seconds = timeit.timeit(lambda: [cls.from_dict(m) for m in mappings], number=3) / 3
+        print('{0:>8}: {1:6.1f} bytes/note, from_dict {2:6.3f} usec/note'.format(
+            cls.__name__, per_note, seconds / num_notes * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,43 @@
+"""Microbenchmark of pitch name and MIDI number conversions.
+
+Compares the precomputed tables in rheingoldgraph.pitch against
+parsing every name with pretty_midi.
+
+Usage:
+    python benchmarks/bench_pitch.py [num_notes]
+"""
+import sys
+import timeit
+from itertools import cycle, islice
+
+import pretty_midi
+
+from rheingoldgraph import pitch
+from rheingoldgraph.musicxml import get_parts_from_xml
+
+
+def main(num_notes=100000):
+    parts = get_parts_from_xml('scores/BachCelloSuiteDminPrelude.xml')
+    bach = [n.note.name for n in parts[0].notes if n.note.name != 'R']
+    names = list(islice(cycle(bach), num_notes))
+    numbers = [pitch.note_name_to_number(n) for n in names]
+
+    cases = [('name -> number', 'pretty_midi', lambda: [pretty_midi.note_name_to_number(n) for n in names]),
+             ('name -> number', 'table', lambda: [pitch.note_name_to_number(n) for n in names]),
+             ('number -> name', 'pretty_midi', lambda: [pretty_midi.note_number_to_name(n) for n in numbers]),
+             ('number -> name', 'table', lambda: [pitch.note_number_to_name(n) for n in numbers])]
+
+    print('{0} notes'.format(num_notes))
+    results = {}
+    for conversion, method, func in cases:
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        results[conversion, method] = seconds
+        print('{0} {1:>12}: {2:7.3f} usec/note'.format(conversion, method, seconds / num_notes * 1e6))
+
+    for conversion in ('name -> number', 'number -> name'):
+        print('{0} speedup: {1:.1f}x'.format(
+            conversion, results[conversion, 'pretty_midi'] / results[conversion, 'table']))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,221 @@
+"""End-to-end benchmarks of Session ingest, retrieval and export.
+
+Runs each scenario against a Gremlin Server, or the in-process memory backend,
+and appends one JSON record per scenario to a results file,
+so timings can be tracked over time.
+Every record carries the throughput of the scenario in notes per second
+of its median time, ex: the ingest rate in notes/sec,
+and the number of traversals (round trips) the scenario made,
+counted by Session metrics, and a scenario that makes more round trips
+than the last recorded run of the same scenario and size is reported as a regression.
+
+Scenarios:
+    ingest       add_lines_from_xml on the Bach prelude, and on scores scaled to each size
+    notes        get_line_and_notes
+    playable     get_playable_line
+    proto        get_line_as_sequence_proto
+    summary      graph_summary
+    drop         drop_line
+
+Usage:
+    python benchmarks/bench_session.py [--backend server|memory] [--server-uri URI]
+                                       [--sizes 1000,10000,100000] [--repeat 3]
+                                       [--results benchmarks/results.jsonl]
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from lxml import etree
+
+from rheingoldgraph.backend import GremlinServerBackend, MemoryBackend, DEFAULT_GREMLIN_URI
+from rheingoldgraph.session import Session
+
+BACH_SCORE = os.path.join(os.path.dirname(__file__), '..', 'scores', 'BachCelloSuiteDminPrelude.xml')
+DEFAULT_RESULTS = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+DEFAULT_SIZES = (1000, 10000, 100000)
+BENCH_LINE = 'bench_line'
+BPM = 80
+
+
+def scaled_score(source, num_notes, filename):
+    """Write a single-part score of exactly num_notes notes.
+
+    The measures of the first part of source are repeated, and renumbered,
+    until the part has num_notes notes.
+    """
+    doc = etree.parse(source)
+    root = doc.getroot()
+    parts = root.findall('part')
+    for part in parts[1:]:
+        root.remove(part)
+    part_list = root.find('part-list')
+    for score_part in part_list.findall('score-part')[1:]:
+        part_list.remove(score_part)
+
+    part = parts[0]
+    measures = part.findall('measure')
+    for measure in measures:
+        part.remove(measure)
+
+    count = 0
+    number = 0
+    while count < num_notes:
+        for measure in measures:
+            number += 1
+            measure = copy.deepcopy(measure)
+            measure.set('number', str(number))
+            for note in measure.findall('note'):
+                if count == num_notes:
+                    measure.remove(note)
+                else:
+                    count += 1
+            part.append(measure)
+            if count == num_notes:
+                break
+
+    doc.write(filename, xml_declaration=True, encoding='UTF-8')
+
+
+def round_trips(session):
+    return sum(stats.count for stats in session.metrics().values())
+
+
+def timed(session, func):
+    """Run func once, returning (seconds, round trips)."""
+    session.reset_metrics()
+    start = time.perf_counter()
+    # graph_summary and others print progress we do not want to time or show
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    return time.perf_counter() - start, round_trips(session)
+
+
+def run_line(session, filename, line_name, num_notes, repeat):
+    """Ingest, read and drop a line repeat times.
+
+    Returns:
+        dict of scenario to list of (seconds, round trips), one per repetition
+    """
+    scenarios = {}
+    for _ in range(repeat):
+        if session.find_line(line_name):
+            session.drop_line(line_name)
+
+        runs = [('ingest', lambda: session.add_lines_from_xml(filename, line_name)),
+                ('notes', lambda: list(session.get_line_and_notes(line_name))),
+                ('playable', lambda: list(session.get_playable_line(line_name, BPM))),
+                ('proto', lambda: session.get_line_as_sequence_proto(line_name, BPM)),
+                ('summary', lambda: session.graph_summary()),
+                ('drop', lambda: session.drop_line(line_name))]
+        for scenario, func in runs:
+            scenarios.setdefault(scenario, []).append(timed(session, func))
+
+    return scenarios
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def records(scenarios, source, num_notes, backend, run_info):
+    for scenario, runs in scenarios.items():
+        seconds = [s for s, _ in runs]
+        median = statistics.median(seconds)
+        record = dict(run_info)
+        record.update({'backend': backend,
+                       'scenario': scenario,
+                       'source': source,
+                       'notes': num_notes,
+                       'repeat': len(runs),
+                       'min_seconds': min(seconds),
+                       'median_seconds': median,
+                       'notes_per_second': num_notes / median if median else None,
+                       'round_trips': runs[-1][1]})
+        yield record
+
+
+def load_previous(filename):
+    """Return the last recorded round trips of every (backend, scenario, source, notes)."""
+    previous = {}
+    if not os.path.exists(filename):
+        return previous
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                previous[r['backend'], r['scenario'], r['source'], r['notes']] = r['round_trips']
+    return previous
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backend', choices=('server', 'memory'), default='server')
+    parser.add_argument('--server-uri', default=DEFAULT_GREMLIN_URI)
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma-separated note counts of the scaled scores')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--results', default=DEFAULT_RESULTS,
+                        help='JSON lines file the results are appended to')
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    run_info = {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'commit': git_commit(),
+                'python': platform.python_version()}
+    if args.backend == 'memory':
+        backend, backend_name = MemoryBackend(), 'memory'
+    else:
+        backend, backend_name = GremlinServerBackend(args.server_uri), args.server_uri
+    previous = load_previous(args.results)
+
+    results = []
+    with Session(backend=backend, metrics=True) as session, \
+            tempfile.TemporaryDirectory() as tmp:
+        bach = etree.parse(BACH_SCORE).getroot().findall('part')[0].findall('measure/note')
+        cases = [('bach', BACH_SCORE, len(bach))]
+        for size in sizes:
+            filename = os.path.join(tmp, 'scaled_{0}.xml'.format(size))
+            scaled_score(BACH_SCORE, size, filename)
+            cases.append(('scaled', filename, size))
+
+        for source, filename, num_notes in cases:
+            scenarios = run_line(session, filename, BENCH_LINE, num_notes, args.repeat)
+            results.extend(records(scenarios, source, num_notes, backend_name, run_info))
+
+    regressions = []
+    print('{0:>8} {1:>8} {2:>9} {3:>10} {4:>10} {5:>11} {6:>12}'.format(
+        'source', 'notes', 'scenario', 'min sec', 'median sec', 'notes/sec', 'round trips'))
+    for r in results:
+        before = previous.get((r['backend'], r['scenario'], r['source'], r['notes']))
+        flag = ''
+        if before is not None and r['round_trips'] > before:
+            flag = '  REGRESSION (was {0})'.format(before)
+            regressions.append(r)
+        print('{0:>8} {1:>8} {2:>9} {3:>10.4f} {4:>10.4f} {5:>11.0f} {6:>12}{7}'.format(
+            r['source'], r['notes'], r['scenario'], r['min_seconds'], r['median_seconds'],
+            r['notes_per_second'] or 0, r['round_trips'], flag))
+
+    with open(args.results, 'a') as f:
+        for r in results:
+            f.write(json.dumps(r, sort_keys=True) + '\n')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,6 +26,7 @@ setup(
     ],
     install_requires=[
         'gremlinpython==3.3.1',
-        'mido==1.2.8'
+        'mido==1.2.8',
+        'numpy'
     ]
 )
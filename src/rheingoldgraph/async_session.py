@@ -0,0 +1,451 @@
+"""RheingoldGraph asyncio session."""
+import asyncio
+import logging
+import time
+
+from gremlin_python.process.traversal import T
+from gremlin_python.structure.graph import Graph
+
+from rheingoldgraph.backend import GremlinServerBackend
+from rheingoldgraph.elements import Note, timed_notes
+from rheingoldgraph.index import melody_from_notes, motif_keys, search_postings, DEFAULT_NGRAM_SIZE
+from rheingoldgraph.musicxml import stream_parts_from_xml, part_line_name
+from rheingoldgraph.stats import LineStatistics, GraphSummary
+from rheingoldgraph.session import (Session, PlayableNoteBuilder, LineDoesNotExist, LineExists,
+                                    LineIngestError, RheingoldGraphIntegrityError,
+                                    DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, DEFAULT_DROP_BATCH_SIZE,
+                                    SKIP_SPANS)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+
+
+class AsyncSession:
+    """A RheingoldGraph Session for asyncio applications.
+
+    Mirrors the Session API, but every traversal is submitted asynchronously,
+    so many line reads and ingests can share one event loop.
+    Up to pool_size requests are kept in flight at once,
+    one per pooled websocket connection.
+    """
+    def __init__(self, server_uri=None, *, backend=None, pool_size=DEFAULT_POOL_SIZE):
+        """Instantiate a new RheingoldGraph AsyncSession.
+
+        Args:
+            server_uri: Gremlin Server websocket URI
+            backend: backend to connect to, by default a GremlinServerBackend for server_uri
+            pool_size: number of websocket connections, and so of requests in flight
+        """
+        if backend is None:
+            backend = GremlinServerBackend(server_uri)
+
+        self.backend = backend
+        self.pool_size = pool_size
+        self._connection = backend.connect(pool_size=pool_size)
+        self._in_flight = asyncio.Semaphore(pool_size)
+
+        self.graph = Graph()
+        self.g = self.graph.traversal().withRemote(self._connection)
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def close(self):
+        """Close the connections to Gremlin Server."""
+        self._connection.close()
+
+
+    async def _submit(self, traversal, terminal='toList'):
+        """Submit a traversal and await its result without blocking the event loop.
+
+        Args:
+            traversal: traversal to submit
+            terminal: name of the terminal step to apply, ex: 'toList', 'next'
+        """
+        async with self._in_flight:
+            future = traversal.promise(lambda t: getattr(t, terminal)())
+            return await asyncio.wrap_future(future)
+
+
+    async def find_line(self, line_name):
+        """Returns a Line vertex if it exists, otherwise return None.
+
+        Args:
+            line_name: Name of line to find
+        """
+        result = await self._submit(self.g.V().hasLabel('Line').has('name', line_name)
+                                    .as_('v').properties().as_('p').select('v', 'p'))
+        if result == []:
+            return None
+        vertex_list = Session._build_vertex_list_from_result(result)
+
+        # Ensure only one line with that name exists
+        if len(vertex_list) > 1:
+            raise RheingoldGraphIntegrityError
+
+        return Session._build_object_from_props(vertex_list[0])
+
+
+    async def _iter_note_chunks(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Iterate asynchronously through a line in chunks of note properties.
+
+        The next chunk is requested before the current chunk is handed to the caller,
+        so network latency overlaps with processing.
+
+        Args:
+            line_name: Name of line to retrieve
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            async generator of lists of (prop_dict, tied_to_next) pairs, in line order
+        """
+        traversal = self.g.V().hasLabel('Line').has('name', line_name).out('start')
+        rows = await self._submit(Session._note_chunk_traversal(traversal, chunk_size))
+
+        while rows != []:
+            pending = None
+            if len(rows) == chunk_size:
+                traversal = self.g.V(rows[-1]['v'].id).out('next')
+                pending = asyncio.ensure_future(
+                    self._submit(Session._note_chunk_traversal(traversal, chunk_size)))
+
+            try:
+                yield [(Session._build_prop_dict_from_row(row), row['tied'] > 0) for row in rows]
+            except GeneratorExit:
+                if pending is not None:
+                    pending.cancel()
+                raise
+
+            rows = await pending if pending is not None else []
+
+
+    async def get_line_and_notes(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Get all notes in a musical line from the graph.
+
+        Args:
+            line_name: Name of line to retrieve
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            async generator of Notes
+        """
+        async for chunk in self._iter_note_chunks(line_name, chunk_size):
+            for prop_dict, _ in chunk:
+                yield Note.from_dict(prop_dict)
+
+
+    async def get_playable_line(self, line_name, bpm, *, excerpt_len=None,
+                                chunk_size=DEFAULT_CHUNK_SIZE):
+        """Iterate through a notation line and return a playable representation.
+
+        Args:
+            line_name: Name of the musical line
+            bpm: tempo in beats per minute
+            excerpt_len: a integer number of notes to include
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            async generator of protobuf Notes
+        """
+        line = await self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        builder = PlayableNoteBuilder(bpm)
+        num_notes_returned = 0
+        async for chunk in self._iter_note_chunks(line_name, chunk_size):
+            for prop_dict, tied in chunk:
+                pb_note = builder.add(Note.from_dict(prop_dict), tied)
+                if pb_note is None:
+                    continue
+                yield pb_note
+
+                num_notes_returned += 1
+                if num_notes_returned == excerpt_len:
+                    return
+
+
+    async def _add_line(self, line_name):
+        """Add a line to the graph and return it.
+
+        Raises:
+            LineExists: if a line with that name is already in the graph
+        """
+        result = await self._submit(Session._add_line_traversal(self.g, line_name), 'next')
+        return Session._line_from_add_result(result, line_name)
+
+
+    async def _add_notes(self, line, notes, batch_size=DEFAULT_BATCH_SIZE):
+        """Add a stream of notes to a line, one traversal per batch.
+
+        Args:
+            line: Line object the notes belong to
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+            batch_size: maximum number of notes written per traversal
+        Returns:
+            note_counter: number of notes added
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+
+        note_counter = 0
+        prev_note_id = None
+        tied_to_prev = False
+        batch = []
+        for pair in timed_notes(notes):
+            batch.append(pair)
+            if len(batch) < batch_size:
+                continue
+
+            prev_note_id = await self._submit(Session._note_batch_traversal(
+                self.g, line.id, batch, prev_note_id, tied_to_prev), 'next')
+            tied_to_prev = batch[-1][1]
+            note_counter += len(batch)
+            batch = []
+
+        if batch:
+            await self._submit(Session._note_batch_traversal(
+                self.g, line.id, batch, prev_note_id, tied_to_prev), 'next')
+            note_counter += len(batch)
+
+        return note_counter
+
+
+    async def _add_part(self, line_name, notes, batch_size=DEFAULT_BATCH_SIZE, skip_spans=None):
+        """Add a new line and its notes to the graph, as Session._add_part does.
+
+        Args:
+            line_name: Name of the line to add
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+            batch_size: maximum number of notes written per traversal
+            skip_spans: if given, spans of the skip edges to add to the line
+        Returns:
+            note_counter: number of notes added
+        """
+        logger.info('Adding line %s', line_name)
+        start_time = time.perf_counter()
+        line = await self._add_line(line_name)
+
+        # Add notes to the line, keeping them for the n-gram index, if the graph has one
+        ngram_size = await self._ngram_size()
+        if ngram_size is not None:
+            notes = list(notes)
+        stats = LineStatistics()
+        note_counter = await self._add_notes(line, stats.track(notes), batch_size)
+        await self._submit(Session._line_statistics_traversal(self.g, line.id, stats), 'iterate')
+        if ngram_size is not None:
+            await self._add_ngram_postings(line.id, notes, ngram_size, batch_size)
+        # A line no longer than the shortest span has no skip edges
+        if skip_spans and note_counter > min(skip_spans):
+            await self.add_skip_edges(line_name, skip_spans, batch_size=batch_size)
+
+        elapsed = time.perf_counter() - start_time
+        logger.info('Line %s (%d notes) added in %.2f sec (%.1f notes/sec)',
+                    line_name, note_counter, elapsed, note_counter / elapsed if elapsed else 0)
+
+        return note_counter
+
+
+    async def add_lines_from_xml(self, filename, piece_name=None, *, batch_size=DEFAULT_BATCH_SIZE,
+                                 skip_spans=SKIP_SPANS):
+        """Add lines in graph from an xml file.
+
+        The file is streamed, as in Session.add_lines_from_xml.
+        Parts are read in document order and written concurrently, each as its own line,
+        with at most pool_size parts held in memory at once.
+        No line is written if any of them already exists.
+        Every part is written to completion, and any failures are raised
+        together as a LineIngestError.
+
+        Args:
+            filename: XML filename
+            piece_name: Name to give the piece of music,
+                        used for constructing line names
+            batch_size: maximum number of notes written per traversal
+            skip_spans: spans of the skip edges to add to each line,
+                        so seeks and range reads do not walk the line.
+                        None adds no skip edges.
+        """
+        if skip_spans:
+            Session._check_skip_spans(skip_spans)
+        parts = stream_parts_from_xml(filename)
+        line_names = [part_line_name(piece_name, part, len(parts)) for part in parts]
+
+        # Check if any line already exists
+        existing = await asyncio.gather(*[self.find_line(name) for name in line_names])
+        if any(existing):
+            logger.warning('Line already exists')
+            raise LineExists
+
+        if len(parts) == 1:
+            await self._add_part(line_names[0], parts[0].notes, batch_size, skip_spans)
+            return
+
+        errors = {}
+        slots = asyncio.Semaphore(self.pool_size)
+
+        async def add_part(line_name, notes):
+            try:
+                await self._add_part(line_name, notes, batch_size, skip_spans)
+            except Exception as e:
+                errors[line_name] = e
+            finally:
+                slots.release()
+
+        tasks = []
+        for line_name, part in zip(line_names, parts):
+            await slots.acquire()
+            # The parts share one pass over the file, so read them here, in order
+            try:
+                notes = list(part.notes)
+            except Exception as e:
+                slots.release()
+                errors[line_name] = e
+                continue
+            tasks.append(asyncio.ensure_future(add_part(line_name, notes)))
+        await asyncio.gather(*tasks)
+
+        if errors:
+            raise LineIngestError(errors)
+
+
+    async def add_skip_edges(self, line_name, spans=SKIP_SPANS, *, batch_size=DEFAULT_BATCH_SIZE):
+        """Add hierarchical 'skip' edges along a line, see Session.add_skip_edges.
+
+        The edge batches are submitted concurrently.
+
+        Args:
+            line_name: Name of the line
+            spans: increasing note spans, each dividing the next, ex: (16, 256, 4096)
+            batch_size: maximum number of edges written per traversal
+        Returns:
+            edge_counter: number of skip edges added
+        """
+        spans = Session._check_skip_spans(spans)
+        if not spans:
+            raise ValueError('spans must be positive integers')
+
+        line = await self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        # Until the new edges are written, seek walks the line along 'next' edges
+        await self._submit(self.g.V(line.id).properties('skip_spans').drop(), 'iterate')
+        await self._submit(self.g.V(line.id).in_('in_line').outE('skip').drop(), 'iterate')
+        num_notes = await self._submit(self.g.V(line.id).in_('in_line').count(), 'next')
+        rows = await self._submit(Session._skip_sources_traversal(self.g, line.id, num_notes,
+                                                                  spans[0]))
+        edges = Session._skip_edges_plan({row['index']: row['id'] for row in rows},
+                                         num_notes, spans)
+        await asyncio.gather(*[
+            self._submit(Session._skip_edges_traversal(self.g, edges[i:i + batch_size]), 'iterate')
+            for i in range(0, len(edges), batch_size)])
+        await self._submit(Session._skip_spans_traversal(self.g, line.id, spans, len(edges)),
+                           'iterate')
+
+        logger.info('Line %s (%d skip edges) added', line_name, len(edges))
+
+        return len(edges)
+
+
+    async def _ngram_size(self):
+        """Return the n-gram size of the index stored in the graph, or None if it has none."""
+        values = await self._submit(Session._ngram_size_traversal(self.g))
+        return values[0] if values else None
+
+
+    async def _add_ngram_postings(self, line_id, notes, n, batch_size=DEFAULT_BATCH_SIZE):
+        """Write the n-gram postings of a line, submitting the batches concurrently."""
+        postings = Session._ngram_postings(notes, n)
+        await asyncio.gather(*[
+            self._submit(Session._ngram_postings_traversal(self.g, line_id,
+                                                           postings[i:i + batch_size]), 'iterate')
+            for i in range(0, len(postings), batch_size)])
+
+        return len(postings)
+
+
+    async def build_ngram_index(self, n=DEFAULT_NGRAM_SIZE, *, chunk_size=DEFAULT_CHUNK_SIZE,
+                                batch_size=DEFAULT_BATCH_SIZE):
+        """Index the melodic n-grams of every line, see Session.build_ngram_index.
+
+        Returns:
+            posting_counter: number of postings added
+        """
+        if n < 2:
+            raise ValueError('n must be at least 2')
+
+        while True:
+            ngram_ids = await self._submit(
+                self.g.V().hasLabel('NGram').limit(DEFAULT_DROP_BATCH_SIZE).id())
+            if not ngram_ids:
+                break
+            await self._submit(self.g.V(*ngram_ids).drop(), 'iterate')
+        await self._submit(Session._ngram_index_traversal(self.g, n), 'iterate')
+
+        posting_counter = 0
+        lines = await self._submit(self.g.V().hasLabel('Line').project('id', 'name')
+                                   .by(T.id).by('name'))
+        for line in lines:
+            notes = [(Note.from_dict(prop_dict), tied)
+                     async for chunk in self._iter_note_chunks(line['name'], chunk_size)
+                     for prop_dict, tied in chunk]
+            posting_counter += await self._add_ngram_postings(line['id'], notes, n, batch_size)
+
+        logger.info('N-gram index (%d postings) built', posting_counter)
+
+        return posting_counter
+
+
+    async def search_pattern(self, notes, *, rhythm=True):
+        """Find a motif in every line of the graph, see Session.search_pattern.
+
+        The postings of every n-gram of the motif are read concurrently.
+
+        Returns:
+            matches: sorted list of PatternMatches (line_name, index)
+        """
+        melody = melody_from_notes((note, False) for note in notes)
+        ngram_size = await self._ngram_size()
+        if ngram_size is None:
+            ngram_size = DEFAULT_NGRAM_SIZE
+            await self.build_ngram_index(ngram_size)
+
+        keys = motif_keys(melody, ngram_size, rhythm)
+        rows = await asyncio.gather(*[self._submit(Session._ngram_lookup_traversal(self.g, key))
+                                      for key in keys])
+        postings = {key: Session._postings_from_rows(key_rows)
+                    for key, key_rows in zip(keys, rows)}
+
+        return search_postings(melody, ngram_size, rhythm, postings.get)
+
+
+    async def graph_summary(self, verify=False):
+        """Print a summary of musical information in our graph, see Session.graph_summary.
+
+        The full-count traversals are submitted concurrently.
+
+        Args:
+            verify: count the whole graph instead of using stored statistics
+        Returns:
+            summary: GraphSummary
+        """
+        summary = None
+        if not verify:
+            rows = await self._submit(Session._line_properties_traversal(self.g))
+            summary = Session._summary_from_line_properties(rows)
+
+        if summary is None:
+            summary = GraphSummary(*await asyncio.gather(*[
+                self._submit(traversal, 'next')
+                for traversal in Session._graph_summary_traversals(self.g)]))
+
+        Session._print_graph_summary(*summary)
+
+        return summary
@@ -0,0 +1,59 @@
+"""RheingoldGraph graph backends.
+
+A backend opens the remote connections a Session runs its traversals on.
+GremlinServerBackend connects to a Gremlin Server over websockets.
+MemoryBackend runs traversals in process against a MemoryGraph,
+ex: for tests and offline batch jobs.
+"""
+from gremlin_python.driver.driver_remote_connection import DriverRemoteConnection
+
+from rheingoldgraph.memory import MemoryGraph, MemoryRemoteConnection
+
+DEFAULT_GREMLIN_URI = 'ws://localhost:8182/gremlin'
+
+
+class GremlinServerBackend:
+    """Graph served by a Gremlin Server."""
+    def __init__(self, server_uri=None):
+        """Instantiate a new GremlinServerBackend.
+
+        Args:
+            server_uri: Gremlin Server websocket URI
+        """
+        self.server_uri = server_uri if server_uri is not None else DEFAULT_GREMLIN_URI
+
+
+    def __repr__(self):
+        return 'GremlinServerBackend({0!r})'.format(self.server_uri)
+
+
+    def connect(self, pool_size=None):
+        """Open a new connection to the server.
+
+        Args:
+            pool_size: number of websocket connections held by the connection
+        """
+        return DriverRemoteConnection(self.server_uri, 'g', pool_size=pool_size)
+
+
+class MemoryBackend:
+    """Graph held in process by a MemoryGraph.
+
+    Every connection opened from the same backend shares its graph.
+    """
+    def __init__(self, graph=None):
+        """Instantiate a new MemoryBackend.
+
+        Args:
+            graph: MemoryGraph to use, by default a new, empty graph
+        """
+        self.graph = graph if graph is not None else MemoryGraph()
+
+
+    def __repr__(self):
+        return 'MemoryBackend({0!r})'.format(self.graph)
+
+
+    def connect(self, pool_size=None):
+        """Open a new connection to the graph. pool_size is ignored."""
+        return MemoryRemoteConnection(self.graph)
@@ -0,0 +1,93 @@
+"""RheingoldGraph client-side line cache."""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LineCache:
+    """Size-bounded LRU cache of Lines and their materialized notes.
+
+    Entries are keyed by line name. Each entry holds the Line vertex
+    and, once a line has been read in full, its list of (Note, tied_to_next) pairs.
+    Cached Note objects are shared between readers and should not be modified.
+    """
+    def __init__(self, maxsize=128):
+        if maxsize < 1:
+            raise ValueError('maxsize must be a positive integer')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def __contains__(self, line_name):
+        return line_name in self._entries
+
+
+    def _get(self, line_name, index):
+        with self._lock:
+            entry = self._entries.get(line_name)
+            if entry is None or entry[index] is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(line_name)
+            self.hits += 1
+            return entry[index]
+
+
+    def _put(self, line_name, index, value):
+        with self._lock:
+            entry = self._entries.setdefault(line_name, [None, None])
+            entry[index] = value
+            self._entries.move_to_end(line_name)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+    def get_line(self, line_name):
+        """Return the cached Line, or None on a miss."""
+        return self._get(line_name, 0)
+
+
+    def put_line(self, line_name, line):
+        """Cache a Line."""
+        self._put(line_name, 0, line)
+
+
+    def get_notes(self, line_name):
+        """Return the cached list of (Note, tied_to_next) pairs, or None on a miss."""
+        return self._get(line_name, 1)
+
+
+    def put_notes(self, line_name, notes):
+        """Cache the full list of (Note, tied_to_next) pairs of a line."""
+        self._put(line_name, 1, list(notes))
+
+
+    def invalidate(self, line_name):
+        """Remove a line from the cache, if present."""
+        with self._lock:
+            self._entries.pop(line_name, None)
+
+
+    def clear(self):
+        """Remove all lines from the cache and reset its counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+    def info(self):
+        """Return cache statistics."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
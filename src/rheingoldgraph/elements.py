@@ -1,31 +1,62 @@
 """RheingoldGraph elements module."""
+import sys
 
-import pretty_midi
+import numpy as np
 from magenta.protobuf import music_pb2
+from mido import Message, MetaMessage, MidiFile, MidiTrack, bpm2tempo
 
-class PropertyDescriptor:
-    def __init__(self, name):
-        self.name = name
+from rheingoldgraph.pitch import note_name_to_number
+
+DEFAULT_TICKS_PER_BEAT = 480
+REST_PITCH = -1
+
+# Interned (name, length, dot) values, shared by every Note with the same value
+_NOTE_VALUES = {}
+
+
+def intern_note_value(name, length, dot):
+    """Return the shared (name, length, dot) tuple for a note value.
+
+    Notes only hold a reference to their value, so a corpus of millions of notes
+    stores each distinct pitch and duration combination once.
+    """
+    # Keep int and float lengths apart, ex: 4 and 4.0
+    key = (name, length, dot, type(length))
+    value = _NOTE_VALUES.get(key)
+    if value is None:
+        if isinstance(name, str):
+            name = sys.intern(name)
+        value = _NOTE_VALUES.setdefault(key, (name, length, dot))
+
+    return value
+
+
+class NoteValueField:
+    """Descriptor for one field of a Note's interned value."""
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
 
 
     def __get__(self, instance, objtype):
         if instance is None:
             return self
-        return instance.__dict__[self.name]
+        return instance._value[self.index]
 
 
     def __set__(self, instance, value):
-        # Add validate here
-        instance.__dict__[self.name] = value
-
-
-    def __delete__(self, instance):
-        del instance.__dict__[self.name]
+        fields = list(instance._value)
+        fields[self.index] = value
+        instance._value = intern_note_value(*fields)
 
 
 class Vertex:
     """Generic RheingoldGraph OGM Vertex element."""
- 
+    __slots__ = ('_id',)
+
+    _properties = ()
+
     @property
     def id(self):
         return self._id
@@ -52,26 +83,84 @@ class Vertex:
         return {key: getattr(self, key, None) for key in self._properties}
 
 
+    def _set_properties(self, mapping):
+        for key in self._properties:
+            setattr(self, key, mapping.get(key))
+
+
     @classmethod
     def from_dict(cls, mapping):
-        """Alternate constructor for Vertex classes."""
-        mapping = mapping.copy()
-        mapping.pop('label')
+        """Alternate constructor for Vertex classes.
+
+        Keys other than 'id' and the properties of the class are ignored.
+        """
+        vertex = cls.__new__(cls)
+        vertex._id = mapping.get('id')
+        vertex._set_properties(mapping)
+
+        return vertex
+
+
+class GenericVertex(Vertex):
+    """A Vertex whose label has no class of its own, ex: an NGram.
+
+    Its properties are whatever the graph holds, kept in a dict
+    and read as attributes.
+    """
+    __slots__ = ('label', '_values')
+
+    def __init__(self, label, **properties):
+        self._id = None
+        self.label = label
+        self._values = properties
+
 
+    def __getattr__(self, key):
+        # Only called for names that are not slots or class attributes
+        if key == '_values':
+            raise AttributeError(key)
+        try:
+            return self._values[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+
+    def __repr__(self):
+        property_list = ['{0}={1!r}'.format(key, value) for key, value in self._values.items()]
+        return 'GenericVertex({0!r}, {1})'.format(self.label, ', '.join(property_list))
+
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.label == other.label and self._values == other._values
+        else:
+            return False
+
+
+    @property
+    def _properties(self):
+        return tuple(self._values)
+
+
+    @classmethod
+    def from_dict(cls, mapping):
+        """Alternate constructor, keeping every key other than 'id' and 'label'."""
         vertex = cls.__new__(cls)
-        vertex._id = mapping.pop('id', None)
-        for key, value in mapping.items():
-            setattr(vertex, key, value)
+        vertex._id = mapping.get('id')
+        vertex.label = mapping.get('label')
+        vertex._values = {key: value for key, value in mapping.items()
+                          if key not in ('id', 'label')}
 
         return vertex
 
 
 class Line(Vertex):
     """A Line Vertex."""
+    __slots__ = ('name',)
+
     label = 'Line'
-    name = PropertyDescriptor('name')
 
-    _properties = ['name']
+    _properties = ('name',)
 
     def __init__(self, name=None):
         self.name = name
@@ -84,27 +173,230 @@ class Line(Vertex):
 
 class Note(Vertex):
     """A Note Vertex.
+
+    The name, length and dot of a note are stored together as one interned value.
+    A note read from the graph also carries its position in its line:
+    index (0-based ordinal), onset and duration (in ticks of DEFAULT_TICKS_PER_BEAT),
+    and the number of the measure it is in, where the source notation has one.
+    Timing is not part of the note's value, so it does not affect equality.
     """
+    __slots__ = ('_value', 'index', 'onset', 'duration', 'measure')
+
     label = 'Note'
 
-    name = PropertyDescriptor('name')
-    length = PropertyDescriptor('length')
-    dot = PropertyDescriptor('dot')
+    name = NoteValueField(0)
+    length = NoteValueField(1)
+    dot = NoteValueField(2)
 
-    _properties = ['name', 'length', 'dot']
+    _properties = ('name', 'length', 'dot')
+    _timing_properties = ('index', 'onset', 'duration', 'measure')
 
     def __init__(self, name=None, length=None, dot=None):
-        self.name = name
-        self.length = length
-        self.dot = dot
+        self._value = intern_note_value(name, length, dot)
         self._id = None
+        self.index = None
+        self.onset = None
+        self.duration = None
+        self.measure = None
+
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self._value == other._value
+        else:
+            return False
+
+
+    def _set_properties(self, mapping):
+        self._value = intern_note_value(mapping.get('name'), mapping.get('length'),
+                                        mapping.get('dot'))
+        self.index = mapping.get('index')
+        self.onset = mapping.get('onset')
+        self.duration = mapping.get('duration')
+        self.measure = mapping.get('measure')
+
+
+    def timing_dict(self):
+        """Return the timing properties of the note that are set."""
+        return {key: getattr(self, key) for key in self._timing_properties
+                if getattr(self, key) is not None}
+
+
+    def ticks(self, ticks_per_beat=DEFAULT_TICKS_PER_BEAT):
+        """Notated duration of the note, in ticks."""
+        return 4 * ticks_per_beat / self.length * (2 - 0.5 ** self.dot)
 
 
     def to_protobuf(self):
         """Protocol Buffer output."""
         # TODO(ryanstauffer): Confirm that we need this
         note = music_pb2.NoteSequence.Note()
-        note.pitch = pretty_midi.note_name_to_number(self.name)
+        note.pitch = note_name_to_number(self.name)
         note.denominator = self.length
 
         return note
+
+
+def timed_notes(notes, start_index=0, start_onset=0):
+    """Set the index, onset and duration of a stream of notes.
+
+    Measure numbers are left as they are.
+
+    Args:
+        notes: iterable of (Note, tied_to_next) pairs, in line order
+        start_index: index of the first note in its line
+        start_onset: onset of the first note from the start of its line, in ticks
+    Returns:
+        generator of the same (Note, tied_to_next) pairs, with timing set
+    """
+    index = start_index
+    onset = start_onset
+    for note, tied_to_next in notes:
+        note.index = index
+        note.onset = onset
+        note.duration = note.ticks()
+        yield note, tied_to_next
+
+        index += 1
+        onset += note.duration
+
+
+class LineFrame:
+    """Columnar representation of a line.
+
+    Holds the pitch, length, dot and tie of every note of a line as NumPy arrays,
+    so timing and export are computed with array operations
+    instead of per-note Python loops.
+    Rests have a pitch of REST_PITCH.
+    """
+    def __init__(self, pitch, length, dot, tied, name=None):
+        self.name = name
+        self.pitch = np.asarray(pitch, dtype=np.int64)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.dot = np.asarray(dot, dtype=np.int64)
+        self.tied = np.asarray(tied, dtype=bool)
+
+        if not (len(self.pitch) == len(self.length) == len(self.dot) == len(self.tied)):
+            raise ValueError('LineFrame columns must all have the same length')
+
+
+    def __len__(self):
+        return len(self.pitch)
+
+
+    def __repr__(self):
+        return 'LineFrame(name={0!r}, notes={1})'.format(self.name, len(self))
+
+
+    @classmethod
+    def from_notes(cls, notes, name=None):
+        """Alternate constructor from an iterable of (Note, tied_to_next) pairs."""
+        pitch = []
+        length = []
+        dot = []
+        tied = []
+        for note, tied_to_next in notes:
+            pitch.append(REST_PITCH if note.name == 'R' else note_name_to_number(note.name))
+            length.append(note.length)
+            dot.append(note.dot)
+            tied.append(tied_to_next)
+
+        return cls(pitch, length, dot, tied, name=name)
+
+
+    def durations(self, ticks_per_beat=DEFAULT_TICKS_PER_BEAT):
+        """Duration of every note, in ticks."""
+        return 4 * ticks_per_beat / self.length * (2 - 0.5 ** self.dot)
+
+
+    def onsets(self, ticks_per_beat=DEFAULT_TICKS_PER_BEAT):
+        """Onset of every note from the start of the line, in ticks."""
+        durations = self.durations(ticks_per_beat)
+        return np.cumsum(durations) - durations
+
+
+    def playable(self, ticks_per_beat=DEFAULT_TICKS_PER_BEAT):
+        """Merge tied notes and drop rests.
+
+        A chain of tied notes sounds as one note, with the pitch of its last note.
+
+        Returns:
+            pitch, onset, duration: arrays with one entry per sounding note,
+            onset and duration in ticks
+        """
+        if len(self) == 0:
+            return (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+        durations = self.durations(ticks_per_beat)
+        onsets = np.cumsum(durations) - durations
+
+        # A new group starts after every note that is not tied to the next
+        starts = np.concatenate(([True], ~self.tied[:-1]))
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:], len(self)) - 1
+        group_durations = np.add.reduceat(durations, first)
+
+        pitch = self.pitch[last]
+        keep = pitch != REST_PITCH
+
+        return pitch[keep], onsets[first][keep], group_durations[keep]
+
+
+    def to_sequence_proto(self, bpm, *, excerpt_len=None, velocity=100,
+                          ticks_per_beat=DEFAULT_TICKS_PER_BEAT):
+        """Return the line as a protobuf NoteSequence.
+
+        Args:
+            bpm: tempo in beats per minute
+            excerpt_len: a integer number of notes to include
+            velocity: velocity of every note
+            ticks_per_beat: MIDI ticks per beat
+        """
+        pitch, onset, duration = self.playable(ticks_per_beat)
+        if excerpt_len is not None:
+            pitch, onset, duration = pitch[:excerpt_len], onset[:excerpt_len], duration[:excerpt_len]
+
+        seconds_per_tick = 60 / (bpm * ticks_per_beat)
+        start_time = onset * seconds_per_tick
+        end_time = (onset + duration) * seconds_per_tick
+
+        sequence = music_pb2.NoteSequence()
+        sequence.ticks_per_quarter = ticks_per_beat
+        sequence.tempos.add(qpm=bpm)
+        for p, start, end in zip(pitch.tolist(), start_time.tolist(), end_time.tolist()):
+            sequence.notes.add(pitch=p, velocity=velocity, start_time=start, end_time=end)
+        sequence.total_time = end_time[-1] if len(end_time) else 0
+
+        return sequence
+
+
+    def to_midi_file(self, filename, bpm, *, excerpt_len=None, velocity=100,
+                     ticks_per_beat=DEFAULT_TICKS_PER_BEAT):
+        """Save the line to a .mid file.
+
+        Args:
+            filename: name of the MIDI file to create, ex: my_midi.mid
+            bpm: tempo in beats per minute
+            excerpt_len: a integer number of notes to include
+            velocity: velocity of every note
+            ticks_per_beat: MIDI ticks per beat
+        """
+        pitch, onset, duration = self.playable(ticks_per_beat)
+        if excerpt_len is not None:
+            pitch, onset, duration = pitch[:excerpt_len], onset[:excerpt_len], duration[:excerpt_len]
+
+        # Delta times between consecutive note_on and note_off messages
+        on_ticks = np.rint(onset).astype(np.int64)
+        off_ticks = np.rint(onset + duration).astype(np.int64)
+        on_deltas = on_ticks - np.concatenate(([0], off_ticks[:-1]))
+        off_deltas = off_ticks - on_ticks
+
+        mid = MidiFile(ticks_per_beat=ticks_per_beat)
+        track = MidiTrack()
+        mid.tracks.append(track)
+        track.append(MetaMessage('set_tempo', tempo=bpm2tempo(bpm)))
+        for p, on_delta, off_delta in zip(pitch.tolist(), on_deltas.tolist(), off_deltas.tolist()):
+            track.append(Message('note_on', note=p, velocity=velocity, time=on_delta))
+            track.append(Message('note_off', note=p, velocity=velocity, time=off_delta))
+
+        mid.save(filename)
@@ -0,0 +1,205 @@
+"""RheingoldGraph melodic n-gram index.
+
+Lines are indexed as melodies: tied notes are merged into the note they sound as,
+and rests are skipped. Every run of n consecutive melody notes is keyed by
+its pitch intervals, and by its pitch intervals together with its rhythm
+(the ratio of each note's duration to the previous one's),
+so a motif is found in any transposition and at any tempo.
+Shorter runs, down to 2 notes, are keyed as well, so every motif is found
+by exact key lookups.
+"""
+import threading
+from collections import namedtuple
+
+from rheingoldgraph.pitch import note_name_to_number
+
+DEFAULT_NGRAM_SIZE = 4
+
+PatternMatch = namedtuple('PatternMatch', ['line_name', 'index'])
+
+
+def melody_from_notes(notes):
+    """Reduce a line to the notes that sound.
+
+    Args:
+        notes: iterable of (Note, tied_to_next) pairs, in line order
+    Returns:
+        melody: list of (pitch, ticks, index) tuples, where index is the position
+                in the line of the first note of a tied group
+    """
+    melody = []
+    group_index = None
+    group_ticks = 0
+    for position, (note, tied_to_next) in enumerate(notes):
+        if group_index is None:
+            group_index = position if note.index is None else note.index
+        group_ticks += note.ticks() if note.duration is None else note.duration
+
+        if tied_to_next:
+            continue
+        if note.name != 'R':
+            melody.append((note_name_to_number(note.name), group_ticks, group_index))
+        group_index = None
+        group_ticks = 0
+
+    return melody
+
+
+def _intervals(melody):
+    return tuple(b[0] - a[0] for a, b in zip(melody, melody[1:]))
+
+
+def _rhythm(melody):
+    return tuple(round(b[1] / a[1], 6) for a, b in zip(melody, melody[1:]))
+
+
+def ngram_key(melody, rhythm=True):
+    """Key a run of melody notes by its intervals, and its rhythm if asked.
+
+    Returns:
+        key: string, ex: 'i:3 4' or 'r:3 4/1.0 2.0'
+    """
+    intervals = ' '.join(str(interval) for interval in _intervals(melody))
+    if not rhythm:
+        return 'i:' + intervals
+
+    return 'r:{0}/{1}'.format(intervals, ' '.join(repr(ratio) for ratio in _rhythm(melody)))
+
+
+def ngram_keys(melody, n):
+    """Yield (position, key) for every run of 2 to n notes of a melody.
+
+    Every run has an interval key and an interval and rhythm key.
+    Runs shorter than n are keyed too, so a motif shorter than n notes
+    is found with a single lookup, like an n-gram.
+    """
+    for position in range(len(melody) - 1):
+        for size in range(2, min(n, len(melody) - position) + 1):
+            run = melody[position:position + size]
+            yield position, ngram_key(run, rhythm=False)
+            yield position, ngram_key(run)
+
+
+def motif_keys(melody, n, rhythm=True):
+    """Keys of the n-grams of a motif, in order, or its own key if it is shorter than n."""
+    size = min(n, len(melody))
+    return [ngram_key(melody[offset:offset + size], rhythm)
+            for offset in range(len(melody) - size + 1)]
+
+
+def search_postings(melody, n, rhythm, postings):
+    """Find every occurrence of a melody, from the postings of its n-grams.
+
+    The postings of each n-gram of the melody are intersected,
+    starting from the rarest, so the cost depends on the number of
+    candidate positions rather than on the size of the corpus.
+
+    Args:
+        melody: the motif, as returned by melody_from_notes
+        n: n-gram size of the index
+        rhythm: if True, durations must match as well as intervals
+        postings: callable taking a key, and returning a dict of
+                  line name to dict of melody position to line index
+    Returns:
+        matches: sorted list of PatternMatches
+    """
+    if len(melody) < 2:
+        raise ValueError('a motif needs at least 2 pitched notes')
+
+    windows = []
+    for offset, key in enumerate(motif_keys(melody, n, rhythm)):
+        lines = postings(key)
+        if not lines:
+            return []
+        windows.append((offset, lines))
+
+    # The line index of each occurrence is that of its first window
+    first = windows[0][1]
+    # Start from the window with the fewest occurrences
+    windows.sort(key=lambda window: sum(len(p) for p in window[1].values()))
+    offset, lines = windows[0]
+    candidates = {line_name: {p - offset for p in positions}
+                  for line_name, positions in lines.items()}
+    for offset, lines in windows[1:]:
+        for line_name in list(candidates):
+            positions = lines.get(line_name, ())
+            candidates[line_name] &= {p - offset for p in positions}
+            if not candidates[line_name]:
+                del candidates[line_name]
+
+    return sorted(PatternMatch(line_name, first[line_name][position])
+                  for line_name, positions in candidates.items()
+                  for position in positions)
+
+
+class NGramIndex:
+    """In-memory inverted index from melodic n-grams to their positions in lines.
+
+    Postings are kept per line, so lines can be added and removed one at a time.
+    Session.build_ngram_index stores the same postings in the graph.
+    """
+    def __init__(self, n=DEFAULT_NGRAM_SIZE):
+        if n < 2:
+            raise ValueError('n must be at least 2')
+
+        self.n = n
+        # key -> line_name -> melody position -> line index
+        self._postings = {}
+        # line_name -> keys of the line
+        self._lines = {}
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._lines)
+
+
+    def __contains__(self, line_name):
+        return line_name in self._lines
+
+
+    def add_line(self, line_name, notes):
+        """Index a line, replacing any earlier entry for it.
+
+        Args:
+            line_name: Name of the line
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+        """
+        melody = melody_from_notes(notes)
+        with self._lock:
+            self._remove(line_name)
+            keys = self._lines[line_name] = set()
+            for position, key in ngram_keys(melody, self.n):
+                self._postings.setdefault(key, {}) \
+                              .setdefault(line_name, {})[position] = melody[position][2]
+                keys.add(key)
+
+
+    def _remove(self, line_name):
+        for key in self._lines.pop(line_name, ()):
+            lines = self._postings[key]
+            del lines[line_name]
+            if not lines:
+                del self._postings[key]
+
+
+    def remove_line(self, line_name):
+        """Remove a line from the index, if present."""
+        with self._lock:
+            self._remove(line_name)
+
+
+    def search(self, notes, rhythm=True):
+        """Find every occurrence of a motif, see search_postings.
+
+        Args:
+            notes: the motif, as a list of Notes
+            rhythm: if True, durations must match as well as intervals
+        Returns:
+            matches: sorted list of PatternMatches, with the line index
+                     of the first note of each occurrence
+        """
+        melody = melody_from_notes((note, False) for note in notes)
+        with self._lock:
+            return search_postings(melody, self.n, rhythm,
+                                   lambda key: self._postings.get(key, {}))
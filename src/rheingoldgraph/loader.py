@@ -0,0 +1,198 @@
+"""RheingoldGraph offline bulk loader.
+
+Writes lines to a GraphSON 3.0 adjacency list file, using the same
+Line/Note schema (start, next, tie and in_line edges, note timing
+and line statistics) that Session writes.
+TinkerGraph can load the file at startup through its graphLocation setting,
+so a large corpus can be loaded without any network writes.
+Example TinkerGraph properties:
+
+    gremlin.tinkergraph.graphLocation=/path/to/corpus.json
+    gremlin.tinkergraph.graphFormat=graphson
+"""
+import json
+import logging
+
+from rheingoldgraph.elements import timed_notes
+from rheingoldgraph.musicxml import part_line_name
+from rheingoldgraph.quantize import notes_from_sequence_proto
+from rheingoldgraph.stats import LineStatistics
+
+logger = logging.getLogger(__name__)
+
+
+def _typed(value):
+    """Convert a value to its typed GraphSON 3.0 representation."""
+    if isinstance(value, bool) or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return {'@type': 'g:Int32', '@value': value}
+    if isinstance(value, float):
+        return {'@type': 'g:Double', '@value': value}
+
+    raise TypeError('Unsupported GraphSON property type: {0}'.format(type(value)))
+
+
+class GraphSONWriter:
+    """Stream Line and Note vertices to a GraphSON adjacency list file.
+
+    Vertex, edge and property ids are allocated sequentially from start_id,
+    so several lines can be written to the same file.
+    """
+    def __init__(self, fileobj, start_id=1):
+        self.fileobj = fileobj
+        self._next_id = start_id
+        self.num_vertices = 0
+        self.num_edges = 0
+
+
+    def _new_id(self):
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+
+    def _write_vertex(self, vertex_id, label, properties, out_edges, in_edges):
+        """Write a single vertex and its incident edges.
+
+        Args:
+            vertex_id: id of the vertex
+            label: vertex label
+            properties: dict of vertex properties
+            out_edges: list of (edge_label, edge_id, in_vertex_id) tuples
+            in_edges: list of (edge_label, edge_id, out_vertex_id) tuples
+        """
+        vertex = {'id': _typed(vertex_id), 'label': label}
+
+        if in_edges:
+            vertex['inE'] = {}
+            for label, edge_id, out_id in in_edges:
+                vertex['inE'].setdefault(label, []).append(
+                    {'id': _typed(edge_id), 'outV': _typed(out_id)})
+        if out_edges:
+            vertex['outE'] = {}
+            for label, edge_id, in_id in out_edges:
+                vertex['outE'].setdefault(label, []).append(
+                    {'id': _typed(edge_id), 'inV': _typed(in_id)})
+
+        vertex['properties'] = {key: [{'id': _typed(self._new_id()), 'value': _typed(value)}]
+                                for key, value in properties.items()}
+
+        self.fileobj.write(json.dumps(vertex, separators=(',', ':')))
+        self.fileobj.write('\n')
+        self.num_vertices += 1
+
+
+    def write_line(self, line_name, notes):
+        """Write a line and its notes.
+
+        Notes are streamed with a lookahead of one note,
+        so only the in_line edge ids of the line are held in memory.
+
+        Args:
+            line_name: name of the line
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+        Returns:
+            note_counter: number of notes written
+        """
+        line_id = self._new_id()
+        line_out = []
+        line_in = []
+
+        # Edges from the previous note: (label, edge_id, prev_note_id)
+        in_edges = []
+        stats = LineStatistics()
+        notes = stats.track(timed_notes(notes))
+        current = next(notes, None)
+        if current is not None:
+            note_id = self._new_id()
+            start_id = self._new_id()
+            line_out.append(('start', start_id, note_id))
+            in_edges.append(('start', start_id, line_id))
+
+        note_counter = 0
+        while current is not None:
+            note, tied_to_next = current
+            upcoming = next(notes, None)
+
+            in_line_id = self._new_id()
+            out_edges = [('in_line', in_line_id, line_id)]
+            line_in.append(('in_line', in_line_id, note_id))
+
+            next_in_edges = []
+            if upcoming is not None:
+                next_note_id = self._new_id()
+                next_id = self._new_id()
+                out_edges.append(('next', next_id, next_note_id))
+                next_in_edges.append(('next', next_id, note_id))
+                if tied_to_next:
+                    tie_id = self._new_id()
+                    out_edges.append(('tie', tie_id, next_note_id))
+                    next_in_edges.append(('tie', tie_id, note_id))
+
+            properties = note.property_dict()
+            properties.update(note.timing_dict())
+            self._write_vertex(note_id, note.label, properties, out_edges, in_edges)
+            self.num_edges += len(out_edges)
+            note_counter += 1
+
+            current = upcoming
+            if upcoming is not None:
+                note_id = next_note_id
+            in_edges = next_in_edges
+
+        properties = {'name': line_name}
+        properties.update(stats.to_properties())
+        self._write_vertex(line_id, 'Line', properties, line_out, line_in)
+        self.num_edges += len(line_out)
+
+        return note_counter
+
+
+def write_lines_to_graphson(lines, filename, start_id=1):
+    """Write lines to a GraphSON file.
+
+    Args:
+        lines: iterable of (line_name, notes) pairs,
+            where notes is an iterable of (Note, tied_to_next) pairs
+        filename: name of the GraphSON file to create
+        start_id: first vertex/edge id to allocate
+    Returns:
+        writer: the GraphSONWriter used, with vertex and edge counts
+    """
+    with open(filename, 'w') as f:
+        writer = GraphSONWriter(f, start_id)
+        for line_name, notes in lines:
+            note_counter = writer.write_line(line_name, notes)
+            logger.info('Line %s (%d notes) written', line_name, note_counter)
+
+    return writer
+
+
+def parts_to_graphson(parts, filename, piece_name=None, start_id=1):
+    """Write XmlParts to a GraphSON file.
+
+    Lines are named as they are by Session.add_lines_from_xml.
+
+    Args:
+        parts: list of XmlParts, ex: from get_parts_from_xml
+        filename: name of the GraphSON file to create
+        piece_name: Name to give the piece of music,
+                    used for constructing line names
+        start_id: first vertex/edge id to allocate
+    """
+    lines = ((part_line_name(piece_name, part, len(parts)), part.notes) for part in parts)
+    return write_lines_to_graphson(lines, filename, start_id)
+
+
+def sequence_to_graphson(sequence, line_name, filename, start_id=1):
+    """Write a protobuf NoteSequence to a GraphSON file as a single line.
+
+    Args:
+        sequence: protobuf NoteSequence
+        line_name: name of the new line
+        filename: name of the GraphSON file to create
+        start_id: first vertex/edge id to allocate
+    """
+    lines = [(line_name, notes_from_sequence_proto(sequence))]
+    return write_lines_to_graphson(lines, filename, start_id)
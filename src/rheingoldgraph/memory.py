@@ -0,0 +1,786 @@
+"""RheingoldGraph in-process graph.
+
+MemoryGraph is a pure-Python property graph. Edges are kept in adjacency lists
+keyed by edge label on both of their vertices, and vertex IDs are indexed by label
+and by the value of chosen properties, ex: the name of a Line.
+MemoryRemoteConnection runs Gremlin bytecode directly against a MemoryGraph,
+in place of a DriverRemoteConnection, so a Session needs no Gremlin Server
+and makes no network round trips.
+
+Only the steps RheingoldGraph issues are supported. Any other step raises UnsupportedStep.
+"""
+import threading
+from concurrent.futures import Future
+from itertools import islice
+
+from gremlin_python.driver.remote_connection import RemoteTraversal, RemoteTraversalSideEffects
+from gremlin_python.process.traversal import Bytecode, Cardinality, P, T, Traverser
+from gremlin_python.structure import graph as gremlin_graph
+
+DEFAULT_INDEX_KEYS = ('name', 'key')
+
+# Exceptions
+class UnsupportedStep(Exception):
+    pass
+
+class TraversalError(Exception):
+    pass
+
+
+# Graph elements
+class _Vertex:
+    __slots__ = ('id', 'label', 'properties', 'out_edges', 'in_edges')
+
+    def __init__(self, vertex_id, label):
+        self.id = vertex_id
+        self.label = label
+        # key -> list of _VertexProperty
+        self.properties = {}
+        # edge label -> {edge id: _Edge}, in insertion order
+        self.out_edges = {}
+        self.in_edges = {}
+
+
+    def value(self, key):
+        props = self.properties.get(key)
+        return props[0].value if props else None
+
+
+    def to_gremlin(self):
+        return gremlin_graph.Vertex(self.id, self.label)
+
+
+class _Edge:
+    __slots__ = ('id', 'label', 'out_v', 'in_v', 'properties')
+
+    def __init__(self, edge_id, label, out_v, in_v):
+        self.id = edge_id
+        self.label = label
+        self.out_v = out_v
+        self.in_v = in_v
+        self.properties = {}
+
+
+    def value(self, key):
+        return self.properties.get(key)
+
+
+    def to_gremlin(self):
+        return gremlin_graph.Edge(self.id, self.out_v.to_gremlin(), self.label,
+                                  self.in_v.to_gremlin())
+
+
+class _VertexProperty:
+    __slots__ = ('id', 'key', 'value', 'vertex')
+
+    def __init__(self, property_id, key, value, vertex):
+        self.id = property_id
+        self.key = key
+        self.value = value
+        self.vertex = vertex
+
+
+    @property
+    def label(self):
+        return self.key
+
+
+    def to_gremlin(self):
+        return gremlin_graph.VertexProperty(self.id, self.key, self.value, self.vertex.to_gremlin())
+
+
+# Results of these types are returned as they are
+_SCALAR_TYPES = frozenset([str, int, float, bool, type(None)])
+
+
+def _to_gremlin(obj):
+    """Convert a traversal result to the types a Gremlin Server response is read as."""
+    if type(obj) in _SCALAR_TYPES:
+        return obj
+    if isinstance(obj, (_Vertex, _Edge, _VertexProperty)):
+        return obj.to_gremlin()
+    if isinstance(obj, dict):
+        return {_to_gremlin(key): _to_gremlin(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_to_gremlin(item) for item in obj]
+
+    return obj
+
+
+class MemoryGraph:
+    """In-process property graph with indexed adjacency.
+
+    Vertices, edges and vertex properties share one sequence of integer IDs,
+    as in TinkerGraph. Vertex properties have single cardinality unless
+    Cardinality.list is given.
+    """
+    def __init__(self, index_keys=DEFAULT_INDEX_KEYS):
+        """Instantiate a new, empty MemoryGraph.
+
+        Args:
+            index_keys: vertex property keys whose values are indexed
+        """
+        self.index_keys = frozenset(index_keys)
+        self.lock = threading.RLock()
+
+        self._vertices = {}
+        self._edges = {}
+        self._next_id = 0
+        # label -> {vertex id: None}, in insertion order
+        self._label_index = {}
+        # (key, value) -> {vertex id: None}
+        self._property_index = {}
+
+
+    def __repr__(self):
+        return 'MemoryGraph(vertices={0}, edges={1})'.format(len(self._vertices), len(self._edges))
+
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+
+    def add_vertex(self, label):
+        vertex = _Vertex(self._new_id(), label)
+        self._vertices[vertex.id] = vertex
+        self._label_index.setdefault(label, {})[vertex.id] = None
+        return vertex
+
+
+    def add_edge(self, label, out_v, in_v):
+        edge = _Edge(self._new_id(), label, out_v, in_v)
+        self._edges[edge.id] = edge
+        out_v.out_edges.setdefault(label, {})[edge.id] = edge
+        in_v.in_edges.setdefault(label, {})[edge.id] = edge
+        return edge
+
+
+    def set_property(self, element, key, value, cardinality=Cardinality.single):
+        if isinstance(element, _Edge):
+            element.properties[key] = value
+            return element
+        if not isinstance(element, _Vertex):
+            raise TraversalError('Cannot set a property on {0!r}'.format(element))
+
+        if cardinality == Cardinality.single:
+            for prop in element.properties.pop(key, ()):
+                self._unindex(prop)
+        prop = _VertexProperty(self._new_id(), key, value, element)
+        element.properties.setdefault(key, []).append(prop)
+        if key in self.index_keys:
+            self._property_index.setdefault((key, value), {})[element.id] = None
+
+        return element
+
+
+    def _unindex(self, prop):
+        if prop.key not in self.index_keys:
+            return
+        ids = self._property_index.get((prop.key, prop.value))
+        if ids is not None:
+            ids.pop(prop.vertex.id, None)
+            if not ids:
+                del self._property_index[prop.key, prop.value]
+
+
+    def remove(self, element):
+        """Remove a vertex (and its edges), an edge or a vertex property."""
+        if isinstance(element, _Vertex):
+            if self._vertices.pop(element.id, None) is None:
+                return
+            for adjacency in (element.out_edges, element.in_edges):
+                for edges in list(adjacency.values()):
+                    for edge in list(edges.values()):
+                        self.remove(edge)
+            for props in element.properties.values():
+                for prop in props:
+                    self._unindex(prop)
+            self._label_index[element.label].pop(element.id, None)
+        elif isinstance(element, _Edge):
+            if self._edges.pop(element.id, None) is None:
+                return
+            element.out_v.out_edges[element.label].pop(element.id, None)
+            element.in_v.in_edges[element.label].pop(element.id, None)
+        elif isinstance(element, _VertexProperty):
+            props = element.vertex.properties.get(element.key, [])
+            if element in props:
+                props.remove(element)
+                if not props:
+                    del element.vertex.properties[element.key]
+                self._unindex(element)
+        else:
+            raise TraversalError('Cannot drop {0!r}'.format(element))
+
+
+    def vertices(self, ids=(), label=None, key=None, value=None):
+        """Return vertices by ID, or all vertices narrowed by the label and property indexes.
+
+        Vertices found through an index still need to be checked against
+        any other conditions of the traversal.
+        """
+        if ids:
+            return [self._vertices[i] for i in ids if i in self._vertices]
+
+        candidates = None
+        if label is not None:
+            candidates = self._label_index.get(label, {})
+        if key in self.index_keys:
+            indexed = self._property_index.get((key, value), {})
+            if candidates is None or len(indexed) < len(candidates):
+                candidates = indexed
+        if candidates is None:
+            return list(self._vertices.values())
+
+        return [self._vertices[i] for i in candidates]
+
+
+    def edges(self):
+        return list(self._edges.values())
+
+
+class _Traverser:
+    """An element of a traversal, with the elements it has been labelled along the way."""
+    __slots__ = ('obj', 'labels')
+
+    def __init__(self, obj, labels):
+        self.obj = obj
+        self.labels = labels
+
+
+    def split(self, obj):
+        return _Traverser(obj, self.labels)
+
+
+def _unwrap_ids(args):
+    """Element IDs given to V(), as IDs or elements."""
+    ids = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            ids.extend(_unwrap_ids(arg))
+        elif isinstance(arg, gremlin_graph.Element):
+            ids.append(arg.id)
+        else:
+            ids.append(arg)
+    return ids
+
+
+def _test(predicate, value):
+    """Test a property value against a P, or against a plain value for equality."""
+    if not isinstance(predicate, P):
+        return value == predicate
+
+    operator = predicate.operator
+    if operator in ('and', 'or'):
+        results = (_test(predicate.value, value), _test(predicate.other, value))
+        return all(results) if operator == 'and' else any(results)
+    if operator in ('within', 'without'):
+        members = predicate.value
+        if len(members) == 1 and isinstance(members[0], (list, tuple, set)):
+            members = members[0]
+        return (value in members) == (operator == 'within')
+    if value is None:
+        return False
+    if operator == 'eq':
+        return value == predicate.value
+    if operator == 'neq':
+        return value != predicate.value
+    if operator == 'lt':
+        return value < predicate.value
+    if operator == 'lte':
+        return value <= predicate.value
+    if operator == 'gt':
+        return value > predicate.value
+    if operator == 'gte':
+        return value >= predicate.value
+    if operator == 'between':
+        return predicate.value <= value < predicate.other
+    if operator == 'inside':
+        return predicate.value < value < predicate.other
+    if operator == 'outside':
+        return value < predicate.value or value > predicate.other
+
+    raise UnsupportedStep('P.{0}'.format(operator))
+
+
+def _element_value(obj, key):
+    """Value of a key of an element, as used by has() and by()."""
+    if key == T.id:
+        return obj.id
+    if key == T.label:
+        return obj.label
+    if isinstance(obj, (_Vertex, _Edge)):
+        return obj.value(key)
+    if isinstance(obj, dict):
+        return obj.get(key)
+
+    raise TraversalError('{0!r} has no property {1!r}'.format(obj, key))
+
+
+class _Step:
+    __slots__ = ('name', 'args', 'modulators')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        # modulator name -> list of argument tuples, ex: 'by', 'from', 'times'
+        self.modulators = {}
+
+
+    def modulator(self, name, default=None):
+        values = self.modulators.get(name)
+        return values[-1] if values else default
+
+
+# Steps that modulate the step before them, rather than process traversers
+_MODULATORS = frozenset(['by', 'from', 'to', 'times', 'emit', 'until'])
+# Modulators that may come before repeat(), as in emit().repeat(...) or until(...).repeat(...)
+_LEADING_MODULATORS = {'emit': 'emit_first', 'until': 'until_first'}
+
+
+def _compile(instructions):
+    """Group step instructions with their modulators.
+
+    An emit() or until() before repeat() is kept as a modulator of the repeat.
+    As in Gremlin, one that follows a repeat() modulates it,
+    unless the repeat already has one, ex: until(a).repeat(b).until(c).repeat(d).
+    """
+    steps = []
+    leading = {}
+    for instruction in instructions:
+        name, args = instruction[0], tuple(instruction[1:])
+        if name in _LEADING_MODULATORS:
+            first = _LEADING_MODULATORS[name]
+            if not steps or steps[-1].name != 'repeat' or \
+                    name in steps[-1].modulators or first in steps[-1].modulators:
+                leading[first] = [args]
+                continue
+        if name in _MODULATORS:
+            if not steps:
+                raise TraversalError('{0}() does not follow a step'.format(name))
+            steps[-1].modulators.setdefault(name, []).append(args)
+            continue
+
+        step = _Step(name, args)
+        if leading:
+            if name != 'repeat':
+                raise UnsupportedStep('{0}() before {1}()'.format(
+                    ', '.join(key[:-len('_first')] for key in leading), name))
+            step.modulators.update(leading)
+            leading = {}
+        steps.append(step)
+
+    return steps
+
+
+class _Interpreter:
+    """Runs the steps of a traversal against a MemoryGraph."""
+    def __init__(self, graph):
+        self.graph = graph
+        self._cache = {}
+
+
+    def steps(self, bytecode):
+        key = id(bytecode)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] is not bytecode:
+            cached = (bytecode, _compile(bytecode.step_instructions))
+            self._cache[key] = cached
+        return cached[1]
+
+
+    def run(self, bytecode, traversers):
+        """Apply the steps of bytecode, one at a time, to a list of _Traversers.
+
+        Every step runs over all traversers before the next step starts,
+        so a write traversal of thousands of steps does not nest thousands of generators.
+        """
+        steps = self.steps(bytecode)
+        for position, step in enumerate(steps):
+            method = getattr(self, '_step_' + step.name, None)
+            if method is None:
+                raise UnsupportedStep(step.name)
+            if step.name == 'V' and not step.args:
+                traversers = list(method(traversers, step, steps[position + 1:]))
+            else:
+                traversers = list(method(traversers, step))
+        return traversers
+
+
+    def results(self, bytecode, traverser):
+        """Results of a child traversal started from one traverser."""
+        return [t.obj for t in self.run(bytecode, [traverser])]
+
+
+    def _by(self, traverser, modulator):
+        """Apply a by() modulator to a traverser."""
+        if not modulator:
+            return traverser.obj
+        arg = modulator[0]
+        if isinstance(arg, Bytecode):
+            results = self.results(arg, traverser)
+            if not results:
+                raise TraversalError('by() traversal produced no value')
+            return results[0]
+
+        value = _element_value(traverser.obj, arg)
+        if value is None:
+            raise TraversalError('{0!r} has no property {1!r}'.format(traverser.obj, arg))
+        return value
+
+
+    # Start steps
+    def _step_V(self, traversers, step, rest=()):
+        ids = _unwrap_ids(step.args)
+        label = key = value = None
+        # Use the label and property indexes for the has() steps that follow V()
+        for following in rest:
+            if following.name == 'hasLabel' and len(following.args) == 1 and label is None:
+                label = following.args[0]
+            elif following.name == 'has' and len(following.args) == 2 and key is None and \
+                    not isinstance(following.args[1], P):
+                key, value = following.args
+            else:
+                break
+        for traverser in traversers:
+            for vertex in self.graph.vertices(ids, label, key, value):
+                yield traverser.split(vertex)
+
+
+    def _step_E(self, traversers, step):
+        if step.args:
+            raise UnsupportedStep('E() with IDs')
+        for traverser in traversers:
+            for edge in self.graph.edges():
+                yield traverser.split(edge)
+
+
+    # Filters
+    def _step_hasLabel(self, traversers, step):
+        labels = set(step.args)
+        return (t for t in traversers if t.obj.label in labels)
+
+
+    def _step_has(self, traversers, step):
+        if len(step.args) == 1:
+            key, = step.args
+            return (t for t in traversers if _element_value(t.obj, key) is not None)
+        if len(step.args) == 3:
+            label, key, predicate = step.args
+            return (t for t in traversers if t.obj.label == label and
+                    _test(predicate, _element_value(t.obj, key)))
+
+        key, predicate = step.args
+        return (t for t in traversers if _test(predicate, _element_value(t.obj, key)))
+
+
+    def _step_not(self, traversers, step):
+        child, = step.args
+        for traverser in traversers:
+            if not self.run(child, [traverser]):
+                yield traverser
+
+
+    def _step_limit(self, traversers, step):
+        limit, = step.args
+        return islice(traversers, limit)
+
+
+    # Navigation
+    def _adjacent(self, traversers, step, direction, to_vertex):
+        labels = step.args
+        for traverser in traversers:
+            vertex = traverser.obj
+            for adjacency, other in ((vertex.out_edges, 'in_v'), (vertex.in_edges, 'out_v')):
+                if direction != 'both' and (adjacency is vertex.out_edges) != (direction == 'out'):
+                    continue
+                for label in (labels or list(adjacency)):
+                    for edge in list(adjacency.get(label, {}).values()):
+                        yield traverser.split(getattr(edge, other) if to_vertex else edge)
+
+
+    def _step_out(self, traversers, step):
+        return self._adjacent(traversers, step, 'out', True)
+
+
+    def _step_in(self, traversers, step):
+        return self._adjacent(traversers, step, 'in', True)
+
+
+    def _step_both(self, traversers, step):
+        return self._adjacent(traversers, step, 'both', True)
+
+
+    def _step_outE(self, traversers, step):
+        return self._adjacent(traversers, step, 'out', False)
+
+
+    def _step_inE(self, traversers, step):
+        return self._adjacent(traversers, step, 'in', False)
+
+
+    def _step_bothE(self, traversers, step):
+        return self._adjacent(traversers, step, 'both', False)
+
+
+    def _step_inV(self, traversers, step):
+        return (t.split(t.obj.in_v) for t in traversers)
+
+
+    def _step_outV(self, traversers, step):
+        return (t.split(t.obj.out_v) for t in traversers)
+
+
+    # Maps
+    def _step_identity(self, traversers, step):
+        return traversers
+
+
+    def _step_id(self, traversers, step):
+        return (t.split(t.obj.id) for t in traversers)
+
+
+    def _step_label(self, traversers, step):
+        return (t.split(t.obj.label) for t in traversers)
+
+
+    def _step_constant(self, traversers, step):
+        value, = step.args
+        return (t.split(value) for t in traversers)
+
+
+    def _step_properties(self, traversers, step):
+        for traverser in traversers:
+            vertex = traverser.obj
+            for key in (step.args or list(vertex.properties)):
+                for prop in list(vertex.properties.get(key, ())):
+                    yield traverser.split(prop)
+
+
+    def _step_values(self, traversers, step):
+        for traverser in self._step_properties(traversers, step):
+            yield traverser.split(traverser.obj.value)
+
+
+    def _step_valueMap(self, traversers, step):
+        if any(isinstance(arg, bool) for arg in step.args):
+            raise UnsupportedStep('valueMap(true)')
+        for traverser in traversers:
+            vertex = traverser.obj
+            keys = step.args or list(vertex.properties)
+            yield traverser.split({key: [prop.value for prop in vertex.properties[key]]
+                                   for key in keys if key in vertex.properties})
+
+
+    def _step_project(self, traversers, step):
+        keys = step.args
+        modulators = step.modulators.get('by', [()])
+        for traverser in traversers:
+            yield traverser.split({key: self._by(traverser, modulators[i % len(modulators)])
+                                   for i, key in enumerate(keys)})
+
+
+    def _step_as(self, traversers, step):
+        for traverser in traversers:
+            labels = dict(traverser.labels)
+            for label in step.args:
+                labels[label] = traverser.obj
+            yield _Traverser(traverser.obj, labels)
+
+
+    def _step_select(self, traversers, step):
+        keys = step.args
+        for traverser in traversers:
+            if any(key not in traverser.labels for key in keys):
+                continue
+            if len(keys) == 1:
+                yield traverser.split(traverser.labels[keys[0]])
+            else:
+                yield traverser.split({key: traverser.labels[key] for key in keys})
+
+
+    def _step_unfold(self, traversers, step):
+        for traverser in traversers:
+            obj = traverser.obj
+            if isinstance(obj, dict):
+                for item in obj.items():
+                    yield traverser.split(dict([item]))
+            elif isinstance(obj, (list, tuple, set)):
+                for item in obj:
+                    yield traverser.split(item)
+            else:
+                yield traverser
+
+
+    def _step_coalesce(self, traversers, step):
+        for traverser in traversers:
+            for child in step.args:
+                results = self.run(child, [traverser])
+                if results:
+                    yield from results
+                    break
+
+
+    def _step_repeat(self, traversers, step):
+        body, = step.args
+        times = step.modulator('times')
+        until = step.modulator('until') or step.modulator('until_first')
+        if (times is None) == (until is None):
+            raise UnsupportedStep('repeat() needs one of times() or until()')
+        emit_first = 'emit_first' in step.modulators
+        emit = 'emit' in step.modulators
+        if until is not None:
+            if emit or emit_first:
+                raise UnsupportedStep('repeat() with both emit() and until()')
+            for traverser in traversers:
+                yield from self._repeat_until(body, until[0], traverser,
+                                              'until_first' in step.modulators)
+            return
+
+        times = times[0]
+        for traverser in traversers:
+            frontier = [traverser]
+            if emit_first:
+                yield traverser
+            for loop in range(times):
+                frontier = self.run(body, frontier)
+                if emit or emit_first or loop == times - 1:
+                    yield from frontier
+
+
+    def _repeat_until(self, body, condition, traverser, check_first):
+        """Loop a traverser through body until condition has results.
+
+        With check_first, as in until(...).repeat(...), the condition is
+        checked before every loop, otherwise after every loop.
+        """
+        frontier = [traverser] if check_first else self.run(body, [traverser])
+        while frontier:
+            remaining = []
+            for t in frontier:
+                if self.run(condition, [t]):
+                    yield t
+                else:
+                    remaining.append(t)
+            frontier = self.run(body, remaining) if remaining else []
+
+
+    # Barriers
+    def _step_count(self, traversers, step):
+        yield _Traverser(sum(1 for _ in traversers), {})
+
+
+    def _step_fold(self, traversers, step):
+        yield _Traverser([t.obj for t in traversers], {})
+
+
+    def _step_group(self, traversers, step):
+        if step.args:
+            raise UnsupportedStep('group() with a side-effect key')
+        modulators = step.modulators.get('by', [])
+        key_by = modulators[0] if modulators else ()
+        value_by = modulators[1] if len(modulators) > 1 else None
+
+        groups = {}
+        for traverser in traversers:
+            groups.setdefault(self._by(traverser, key_by), []).append(traverser)
+
+        result = {}
+        for key, members in groups.items():
+            if value_by is None or not value_by:
+                result[key] = [t.obj for t in members]
+            elif isinstance(value_by[0], Bytecode):
+                values = [t.obj for t in self.run(value_by[0], members)]
+                # A reducing traversal, ex: count(), gives one value per group
+                result[key] = values[0] if len(values) == 1 else values
+            else:
+                result[key] = [_element_value(t.obj, value_by[0]) for t in members]
+
+        yield _Traverser(result, {})
+
+
+    # Side effects
+    def _step_addV(self, traversers, step):
+        label = step.args[0] if step.args else 'vertex'
+        for traverser in traversers:
+            yield traverser.split(self.graph.add_vertex(label))
+
+
+    def _end_vertex(self, traverser, modulator):
+        if modulator is None:
+            return traverser.obj
+        arg, = modulator
+        if isinstance(arg, Bytecode):
+            results = self.results(arg, traverser)
+            if not results:
+                raise TraversalError('addE() endpoint traversal produced no vertex')
+            return results[0]
+        if arg not in traverser.labels:
+            raise TraversalError('No step is labelled {0!r}'.format(arg))
+        return traverser.labels[arg]
+
+
+    def _step_addE(self, traversers, step):
+        label, = step.args
+        for traverser in traversers:
+            out_v = self._end_vertex(traverser, step.modulator('from'))
+            in_v = self._end_vertex(traverser, step.modulator('to'))
+            yield traverser.split(self.graph.add_edge(label, out_v, in_v))
+
+
+    def _step_property(self, traversers, step):
+        args = step.args
+        cardinality = Cardinality.single
+        if isinstance(args[0], Cardinality):
+            cardinality, args = args[0], args[1:]
+        if len(args) != 2:
+            raise UnsupportedStep('property() with meta-properties')
+        key, value = args
+        for traverser in traversers:
+            self.graph.set_property(traverser.obj, key, value, cardinality)
+            yield traverser
+
+
+    def _step_drop(self, traversers, step):
+        for traverser in traversers:
+            self.graph.remove(traverser.obj)
+        return []
+
+
+class MemoryRemoteConnection:
+    """Remote connection that runs traversals against a MemoryGraph.
+
+    A drop-in replacement for DriverRemoteConnection.
+    Each traversal runs to completion under the graph's lock,
+    so concurrent sessions see every traversal as atomic.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+
+
+    def close(self):
+        pass
+
+
+    def submit(self, bytecode):
+        """Run a traversal and return its results as a RemoteTraversal."""
+        if bytecode.source_instructions:
+            raise UnsupportedStep(bytecode.source_instructions[0][0])
+
+        with self.graph.lock:
+            interpreter = _Interpreter(self.graph)
+            results = [_to_gremlin(t.obj)
+                       for t in interpreter.run(bytecode, [_Traverser(None, {})])]
+
+        return RemoteTraversal(iter([Traverser(result) for result in results]),
+                               RemoteTraversalSideEffects(None, None))
+
+
+    def submitAsync(self, bytecode):
+        """Run a traversal and return a completed Future of its RemoteTraversal."""
+        future = Future()
+        try:
+            future.set_result(self.submit(bytecode))
+        except Exception as e:
+            future.set_exception(e)
+        return future
@@ -0,0 +1,150 @@
+"""RheingoldGraph traversal metrics.
+
+An InstrumentedConnection wraps the remote connection of a Session
+and records every traversal submitted through it: the Session method that issued it,
+its latency, the number of result rows and the size of the request payload.
+Sessions created without metrics use the bare connection, so they pay nothing.
+"""
+import math
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+from gremlin_python.structure.io.graphsonV3d0 import GraphSONWriter
+
+DEFAULT_MAX_SAMPLES = 10000
+
+TraversalRecord = namedtuple('TraversalRecord', ['call_site', 'latency', 'rows', 'payload_bytes'])
+
+CallSiteStats = namedtuple('CallSiteStats', ['count', 'total', 'mean', 'p50', 'p95', 'p99', 'max',
+                                             'rows', 'payload_bytes'])
+
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class TraversalMetrics:
+    """Thread-safe collector of TraversalRecords, grouped by call site.
+
+    Counts and totals cover every record.
+    Percentiles are computed from the most recent max_samples latencies of each call site.
+    """
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES, hook=None):
+        """Instantiate a new TraversalMetrics.
+
+        Args:
+            max_samples: number of latencies kept per call site for percentiles
+            hook: optional callable, called with every TraversalRecord,
+                  ex: to export to an external collector
+        """
+        self.max_samples = max_samples
+        self.hook = hook
+        self._lock = threading.Lock()
+        # call_site -> [count, total latency, max latency, rows, payload bytes, latencies]
+        self._sites = {}
+
+
+    def record(self, record):
+        """Add a TraversalRecord and pass it to the hook, if any."""
+        with self._lock:
+            site = self._sites.get(record.call_site)
+            if site is None:
+                site = [0, 0.0, 0.0, 0, 0, deque(maxlen=self.max_samples)]
+                self._sites[record.call_site] = site
+            site[0] += 1
+            site[1] += record.latency
+            site[2] = max(site[2], record.latency)
+            site[3] += record.rows
+            site[4] += record.payload_bytes
+            site[5].append(record.latency)
+
+        if self.hook is not None:
+            self.hook(record)
+
+
+    def summary(self):
+        """Return a dict of call site to CallSiteStats, latencies in seconds."""
+        with self._lock:
+            sites = {call_site: (count, total, max_latency, rows, payload, sorted(latencies))
+                     for call_site, (count, total, max_latency, rows, payload, latencies)
+                     in self._sites.items()}
+
+        return {call_site: CallSiteStats(count, total, total / count,
+                                         _percentile(ordered, 0.5),
+                                         _percentile(ordered, 0.95),
+                                         _percentile(ordered, 0.99),
+                                         max_latency, rows, payload)
+                for call_site, (count, total, max_latency, rows, payload, ordered)
+                in sorted(sites.items())}
+
+
+    def reset(self):
+        """Discard all records."""
+        with self._lock:
+            self._sites.clear()
+
+
+class InstrumentedConnection:
+    """Remote connection wrapper that records every submitted traversal.
+
+    The call site of a traversal is the outermost method of the instrumented modules
+    on the stack, followed by the innermost one where they differ,
+    ex: 'get_playable_line/find_line'.
+    Attributes other than submit are those of the wrapped connection.
+    """
+    def __init__(self, connection, metrics, module_files):
+        """Instantiate a new InstrumentedConnection.
+
+        Args:
+            connection: remote connection to wrap, ex: a DriverRemoteConnection
+            metrics: TraversalMetrics to record to
+            module_files: file names of the modules whose methods are call sites
+        """
+        self.connection = connection
+        self.metrics = metrics
+        self._module_files = frozenset(module_files)
+        self._writer = GraphSONWriter()
+
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+    def _call_site(self):
+        outermost = innermost = None
+        frame = sys._getframe(2)
+        while frame is not None:
+            if frame.f_code.co_filename in self._module_files:
+                outermost = frame.f_code.co_name
+                if innermost is None:
+                    innermost = outermost
+            frame = frame.f_back
+
+        if outermost is None:
+            return '<unknown>'
+        if outermost == innermost:
+            return outermost
+        return '{0}/{1}'.format(outermost, innermost)
+
+
+    def submit(self, bytecode):
+        """Submit a traversal to the wrapped connection and record it.
+
+        Results are read in full, so the latency includes the whole response.
+        """
+        call_site = self._call_site()
+        payload_bytes = len(self._writer.writeObject(bytecode).encode('utf-8'))
+
+        start = time.perf_counter()
+        remote_traversal = self.connection.submit(bytecode)
+        results = list(remote_traversal.traversers)
+        latency = time.perf_counter() - start
+
+        remote_traversal.traversers = iter(results)
+        self.metrics.record(TraversalRecord(call_site, latency, len(results), payload_bytes))
+
+        return remote_traversal
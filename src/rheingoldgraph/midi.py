@@ -1,14 +1,27 @@
 """RheingoldGraph Midi module."""
 
+import heapq
 import itertools
+import logging
+import threading
 import time
-from collections import namedtuple
+from collections import deque, namedtuple
 
 import mido
 from mido import Message, bpm2tempo, open_output, MidiFile, MidiTrack
 mido.set_backend('mido.backends.rtmidi')
 import pretty_midi
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKAHEAD = 0.5
+DEFAULT_JITTER_SAMPLES = 10000
+DEFAULT_PROGRAM = 12
+# General MIDI reserves channel 10 (9 from 0) for percussion
+MELODIC_CHANNELS = tuple(c for c in range(16) if c != 9)
+
+JitterStats = namedtuple('JitterStats', ['count', 'mean', 'max', 'p99'])
+
 # Let's try to remove this functionality right now...it's confusing for now and not strictly necessary
 def build_midi_notes(num_octaves=9, naming='standard', middle_c_name='C4', middle_c_note_num=60):
     """Generate a dictionary of midi notes given parameters.
@@ -49,6 +62,199 @@ def build_midi_notes(num_octaves=9, naming='standard', middle_c_name='C4', middl
     return midi_note
 
 
+def merge_note_streams(streams, channels=None):
+    """Merge several streams of protobuf Notes into one, in start time order.
+
+    Streams are read lazily, one note ahead each,
+    so memory does not grow with the length of the streams.
+
+    Args:
+        streams: list of iterables of protobuf Notes, each in start time order
+        channels: MIDI channel of each stream, by default MELODIC_CHANNELS in turn
+    Returns:
+        generator of (channel, protobuf Note) pairs
+    """
+    if channels is None:
+        channels = [MELODIC_CHANNELS[i % len(MELODIC_CHANNELS)] for i in range(len(streams))]
+
+    tagged = [zip(itertools.repeat(channel), stream) for channel, stream in zip(channels, streams)]
+    return heapq.merge(*tagged, key=lambda event: event[1].start_time)
+
+
+class MIDIScheduler:
+    """Send timed MIDI messages from a background thread.
+
+    Messages are queued with a time in seconds from the start of playback,
+    and sent at that absolute deadline on a monotonic clock,
+    so timing errors do not build up over a long line.
+    Any number of notes may sound at once.
+    The queue only runs lookahead seconds ahead of playback:
+    schedule() blocks a producer that gets further ahead than that.
+    note_off messages never block, so a long note does not hold back
+    the notes that start while it sounds.
+
+    The lateness of every message sent is counted, see jitter().
+    Memory use does not grow with the length of playback:
+    the p99 is computed from the most recent jitter_samples messages.
+    """
+    def __init__(self, outport, *, lookahead=DEFAULT_LOOKAHEAD, clock=time.monotonic,
+                 jitter_samples=DEFAULT_JITTER_SAMPLES):
+        """Instantiate a new MIDIScheduler.
+
+        Args:
+            outport: mido output port, or any object with a send(message) method
+            lookahead: how far ahead of playback messages may be queued, in seconds
+            clock: monotonic clock returning seconds
+            jitter_samples: number of recent lateness samples kept for the p99
+        """
+        self.outport = outport
+        self.lookahead = lookahead
+        self.clock = clock
+
+        self._events = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._start_time = None
+        self._finished = False
+        self._stopped = False
+        self._sounding = set()
+        # Count, total and max cover every message sent
+        self._late_count = 0
+        self._late_total = 0.0
+        self._late_max = 0.0
+        self._lateness = deque(maxlen=jitter_samples)
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.stop()
+
+
+    def elapsed(self):
+        """Seconds since playback started, or 0 if it has not started."""
+        if self._start_time is None:
+            return 0
+        return self.clock() - self._start_time
+
+
+    def start(self):
+        """Start playback on a background thread."""
+        if self._thread is not None:
+            raise RuntimeError('MIDIScheduler has already been started')
+
+        self._start_time = self.clock()
+        self._thread = threading.Thread(target=self._run, name='MIDIScheduler', daemon=True)
+        self._thread.start()
+
+
+    def schedule(self, when, message):
+        """Queue a message to be sent when seconds after the start of playback.
+
+        Blocks while when is more than lookahead seconds ahead of playback,
+        unless the message is a note_off.
+        """
+        # At equal times, note_off goes first so a repeated pitch is not cut short
+        priority = 0 if message.type == 'note_off' else 1
+        with self._condition:
+            while priority and not self._stopped and self._start_time is not None and \
+                    when - self.elapsed() > self.lookahead:
+                self._condition.wait(when - self.elapsed() - self.lookahead)
+            if self._stopped:
+                return
+            heapq.heappush(self._events, (when, priority, next(self._counter), message))
+            self._condition.notify_all()
+
+
+    def schedule_note(self, pitch, velocity, start_time, end_time, channel=0):
+        """Queue the note_on and note_off messages of a note."""
+        self.schedule(start_time, Message('note_on', note=pitch, velocity=velocity,
+                                          channel=channel))
+        self.schedule(end_time, Message('note_off', note=pitch, velocity=velocity,
+                                        channel=channel))
+
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if not self._events:
+                        if self._finished:
+                            return
+                        self._condition.wait()
+                        continue
+
+                    wait = self._events[0][0] - self.elapsed()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+
+                if self._stopped:
+                    return
+                when, _, _, message = heapq.heappop(self._events)
+                # Let a blocked producer queue the next message
+                self._condition.notify_all()
+
+            self.outport.send(message)
+            self._record_lateness(self.elapsed() - when)
+            if message.type == 'note_on':
+                self._sounding.add((message.channel, message.note))
+            elif message.type == 'note_off':
+                self._sounding.discard((message.channel, message.note))
+
+
+    def finish(self):
+        """Wait until every queued message has been sent."""
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+
+    def stop(self):
+        """Stop playback now, dropping queued messages and silencing sounding notes."""
+        with self._condition:
+            self._stopped = True
+            self._events.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+        for channel, note in sorted(self._sounding):
+            self.outport.send(Message('note_off', note=note, velocity=0, channel=channel))
+        self._sounding.clear()
+
+
+    def _record_lateness(self, lateness):
+        self._late_count += 1
+        self._late_total += lateness
+        self._late_max = max(self._late_max, lateness)
+        self._lateness.append(lateness)
+
+
+    def jitter(self):
+        """Return how late messages were sent, in seconds.
+
+        Returns:
+            JitterStats(count, mean, max, p99), with the p99 of recent messages
+        """
+        if not self._late_count:
+            return JitterStats(0, 0, 0, 0)
+
+        lateness = sorted(self._lateness)
+        p99 = lateness[min(len(lateness) - 1, int(0.99 * len(lateness)))]
+        return JitterStats(self._late_count, self._late_total / self._late_count,
+                           self._late_max, p99)
+
+
 class MIDIEngine(object):
     """Midi Engine to play notes from Rheingold and Tensorflow."""
     def __init__(self, midi_port, ticks_per_beat=480):
@@ -61,38 +267,88 @@ class MIDIEngine(object):
         self.ticks_per_beat = ticks_per_beat 
 
 
-    def play_protobuf(self, notes):
+    def play_protobuf(self, notes, *, lookahead=DEFAULT_LOOKAHEAD):
         """Play protobuf Notes over a MIDI port.
 
+        Notes are played by a MIDIScheduler, so they may overlap.
+        Playback starts with the first note, whatever its start time.
+
         Args:
-            notes: an iterable of Protocol Buffer Notes 
+            notes: an iterable of Protocol Buffer Notes, in start time order
+            lookahead: how far ahead of playback notes are read, in seconds
+        Returns:
+            jitter: JitterStats of the messages sent
+        """
+        with open_output(self.midi_port) as outport:
 
+            outport.send(Message('program_change', program=DEFAULT_PROGRAM))
+
+            jitter = self._play_on_port(outport, ((0, n) for n in notes), lookahead)
+
+        logger.info('Played %d MIDI messages, mean lateness %.2f ms, max %.2f ms',
+                    jitter.count, jitter.mean * 1000, jitter.max * 1000)
+
+        return jitter
+
+
+    def play_protobuf_streams(self, streams, *, programs=None, lookahead=DEFAULT_LOOKAHEAD):
+        """Play several streams of protobuf Notes together over a MIDI port.
+
+        Each stream is played on its own channel, MELODIC_CHANNELS in turn,
+        and the streams are merged lazily as they play.
+
+        Args:
+            streams: list of iterables of protobuf Notes, each in start time order
+            programs: General MIDI program of each stream, by default DEFAULT_PROGRAM
+            lookahead: how far ahead of playback notes are read, in seconds
+        Returns:
+            jitter: JitterStats of the messages sent
         """
+        channels = [MELODIC_CHANNELS[i % len(MELODIC_CHANNELS)] for i in range(len(streams))]
+        if programs is None:
+            programs = [DEFAULT_PROGRAM] * len(streams)
+
         with open_output(self.midi_port) as outport:
+            for channel, program in sorted(set(zip(channels, programs))):
+                outport.send(Message('program_change', program=program, channel=channel))
+
+            events = merge_note_streams(streams, channels)
+            jitter = self._play_on_port(outport, events, lookahead)
+
+        logger.info('Played %d MIDI messages, mean lateness %.2f ms, max %.2f ms',
+                    jitter.count, jitter.mean * 1000, jitter.max * 1000)
+
+        return jitter
+
+
+    @staticmethod
+    def _play_on_port(outport, events, lookahead=DEFAULT_LOOKAHEAD, clock=time.monotonic):
+        """Play (channel, protobuf Note) pairs, in start time order, on an open port.
+
+        Playback starts once the first note has been read,
+        so the time taken to fetch it does not cut the first notes short.
+        """
+        scheduler = MIDIScheduler(outport, lookahead=lookahead, clock=clock)
+        try:
+            offset = None
+            for channel, n in events:
+                if offset is None:
+                    offset = n.start_time
+                    scheduler.start()
+                scheduler.schedule_note(n.pitch, n.velocity,
+                                        n.start_time - offset, n.end_time - offset, channel)
+            scheduler.finish()
+
+        except KeyboardInterrupt:
+            logger.info('Stopping MIDI output')
+            scheduler.stop()
+            outport.reset()
+            outport.panic()
+        except Exception:
+            scheduler.stop()
+            raise
 
-            outport.send(Message('program_change', program=12))
-            
-            try:
-                last_end_time = 0
-                for n in notes:
-                    # Calculate sleep time for rests
-                    sleep_time = n.start_time - last_end_time
-                    if sleep_time > 0:
-                        print("Rest {0} sec".format(sleep_time))
-                        time.sleep(sleep_time)
-
-                    # Send note messages
-                    note_duration = n.end_time - n.start_time
-                    outport.send(Message('note_on', note=n.pitch, velocity=n.velocity))
-                    print("Note {0}, {1} sec".format(n.pitch, note_duration))
-                    time.sleep(note_duration)
-                    outport.send(Message('note_off', note=n.pitch, velocity=n.velocity))
-                    last_end_time = n.end_time
-
-            except KeyboardInterrupt:
-                print('Stopping MIDI output')
-                outport.reset()
-                outport.panic()
+        return scheduler.jitter()
 
 
     # I can get rid of this method shortly
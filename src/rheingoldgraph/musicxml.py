@@ -2,7 +2,7 @@
 
 This module currently supports parsing of monophonic lines from Music XML files.
 """
-from collections import namedtuple
+from collections import deque, namedtuple
 from lxml import etree
 
 from rheingoldgraph.elements import Note
@@ -49,6 +49,21 @@ def get_part_information_from_music_xml(doc):
     return parts
 
 
+def part_line_name(piece_name, part, num_parts):
+    """Name the line that a part is stored as.
+
+    Args:
+        piece_name: Name given to the piece of music
+        part: XmlPart
+        num_parts: number of parts in the piece
+    """
+    # TODO(ryan): Make this more robust
+    if num_parts == 1:
+        return piece_name
+
+    return '{0}_{1}'.format(piece_name, part.id)
+
+
 def parse_xml(filename):
     doc = etree.parse(filename)
 
@@ -60,55 +75,76 @@ def parse_xml(filename):
         print(part.notes)
 
 
-def get_part_note_generator(part_id, doc):
-    """Get the notes for a specific part."""
-    part_data = doc.find("part[@id='{0}']".format(part_id))
+def _measure_number(measure, prev_number):
+    """Number of a MusicXML measure element.
 
-    # Set the division of the quarter
-    # Technically, the divisions for each part could change after the first measure
-    # Our initial parser assumes they remain constant
-    divisions = int(part_data.find('measure/attributes/divisions').text)
+    Falls back to counting on from the previous measure
+    when the number attribute is missing or not an integer, ex: '12a'.
+    """
+    try:
+        return int(measure.get('number'))
+    except (TypeError, ValueError):
+        return prev_number + 1
+
+
+def _xml_note_from_element(note, measure=None):
+    """Build an XMLNote from a MusicXML note element, in the given measure."""
+    # Build note name
+    if note.find('rest') is None:
+        # Get pitch_class_base 
+        pitch_class_base = note.find('pitch/step').text
+
+        # Get accidental
+        try:
+            alter = int(note.find('pitch/alter').text)
+            if alter == -1:
+                accidental = 'b'
+            elif alter == 1:
+                accidental = '#'
+        except AttributeError:
+            accidental = ''
+
+        # Get octave
+        octave = note.find('pitch/octave').text
 
-    note_list = []
+        note_name = pitch_class_base + accidental + octave
 
-    for note in part_data.findall('measure/note'):
-        # Build note name
-        if note.find('rest') is None:
-            # Get pitch_class_base 
-            pitch_class_base = note.find('pitch/step').text
+    else:
+        note_name = 'R'
 
-            # Get accidental
-            try:
-                alter = int(note.find('pitch/alter').text)
-                if alter == -1:
-                    accidental = 'b'
-                elif alter == 1:
-                    accidental = '#'
-            except AttributeError:
-                accidental = ''
+    # Build length
+    # Length is interpreted from the note type, not the XML duration 
+    length = XML_LENGTH[note.find('type').text]
 
-            # Get octave
-            octave = note.find('pitch/octave').text
+    # Get dots
+    dot = len(note.findall('dot'))
 
-            note_name = pitch_class_base + accidental + octave
+    # Check for tie
+    if note.find("tie[@type='start']") is not None:
+        tied = True
+    else:
+        tied = False
 
-        else:
-            note_name = 'R'
+    xml_note = XMLNote(Note(note_name, length, dot), tied)
+    xml_note.note.measure = measure
 
-        # Build length
-        # Length is interpreted from the note type, not the XML duration 
-        length = XML_LENGTH[note.find('type').text]
+    return xml_note
 
-        # Get dots
-        dot = len(note.findall('dot'))
 
-        # Check for tie
-        if note.find("tie[@type='start']") is not None:
-            tied = True
-        else:
-            tied = False
+def get_part_note_generator(part_id, doc):
+    """Get the notes for a specific part."""
+    part_data = doc.find("part[@id='{0}']".format(part_id))
+
+    # Set the division of the quarter
+    # Technically, the divisions for each part could change after the first measure
+    # Our initial parser assumes they remain constant
+    divisions = int(part_data.find('measure/attributes/divisions').text)
 
-        yield XMLNote(Note(note_name, length, dot), tied)
+    number = 0
+    for measure in part_data.findall('measure'):
+        number = _measure_number(measure, number)
+        for note in measure.findall('note'):
+            yield _xml_note_from_element(note, number)
 
 
 def get_parts_from_xml(filename):
@@ -123,3 +159,109 @@ def get_parts_from_xml(filename):
         part.notes = get_part_note_generator(part.id, doc) 
 
     return parts 
+
+
+def _clear_element(elem):
+    """Free a fully processed element, and any siblings processed before it."""
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+
+class _PartStreams:
+    """A single iterparse pass shared by the note generators of several parts.
+
+    Notes are read from the file as a generator asks for them.
+    Notes of other parts read on the way are buffered until their generator runs,
+    so parts may be consumed in any order, not only in document order.
+    Elements are cleared once they have been processed.
+    """
+    def __init__(self, events, part_ids):
+        self._events = events
+        self._buffers = {part_id: deque() for part_id in part_ids}
+        self._ended = set()
+        self._part_id = None
+        self._number = 0
+
+
+    def notes(self, part_id):
+        """Yield the XMLNotes of a part."""
+        buffer = self._buffers[part_id]
+        while buffer or (part_id not in self._ended and self._advance()):
+            if buffer:
+                yield buffer.popleft()
+
+        # Later notes of the part are no longer buffered
+        del self._buffers[part_id]
+
+
+    def _advance(self):
+        """Read up to the next note or part end. Returns False at the end of the file."""
+        for event, elem in self._events:
+            if event == 'start':
+                if elem.tag == 'part':
+                    self._part_id = elem.get('id')
+                    self._number = 0
+                elif elem.tag == 'measure':
+                    self._number = _measure_number(elem, self._number)
+                continue
+
+            if elem.tag == 'note':
+                buffer = self._buffers.get(self._part_id)
+                if buffer is not None:
+                    buffer.append(_xml_note_from_element(elem, self._number))
+                _clear_element(elem)
+                if buffer is not None:
+                    return True
+            elif elem.tag == 'measure':
+                _clear_element(elem)
+            elif elem.tag == 'part':
+                self._ended.add(self._part_id)
+                _clear_element(elem)
+                return True
+
+        return False
+
+
+def stream_parts_from_xml(filename):
+    """Get a list of XmlParts from an XML file, streaming their notes.
+
+    Unlike get_parts_from_xml, the document is never held in memory as a whole.
+    The part-list is read up front, and the notes of every part are then read
+    in a single iterparse pass, clearing elements as soon as they are processed.
+
+    Parts are listed in part-list order, which need not be the order of
+    the part elements. Reading a part's notes buffers the notes of any part
+    that comes before it in the file and has not been read yet,
+    so memory stays flat when parts are consumed in document order.
+
+    Args:
+        filename: XML filename
+    Returns:
+        part_list: list of XmlPart objects with XmlNote generators
+    """
+    events = etree.iterparse(filename, events=('start', 'end'))
+
+    parts = []
+    for event, elem in events:
+        if event == 'end' and elem.tag == 'part-list':
+            parts = get_part_information_from_music_xml(elem.getparent())
+            _clear_element(elem)
+            break
+
+    streams = _PartStreams(events, [part.id for part in parts])
+    for part in parts:
+        part.notes = streams.notes(part.id)
+
+    return parts
+
+
+def iter_xml_notes(filename):
+    """Stream (part_id, XMLNote) pairs for all parts of an XML file in one pass.
+
+    Args:
+        filename: XML filename
+    """
+    for part in stream_parts_from_xml(filename):
+        for xml_note in part.notes:
+            yield part.id, xml_note
@@ -0,0 +1,43 @@
+"""RheingoldGraph pitch spelling.
+
+Precomputed, immutable tables between pitch names and MIDI note numbers,
+following the same conventions as pretty_midi (middle C is C4, MIDI note 60).
+Names may use '#' and 'b' accidentals, as produced by the MusicXML parser,
+including double sharps and flats and enharmonic spellings such as B#3 and Cb4.
+"""
+from types import MappingProxyType
+
+PITCH_CLASSES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+ACCIDENTALS = {'': 0, '#': 1, '##': 2, 'b': -1, 'bb': -2}
+OCTAVES = range(-1, 10)
+SHARP_NAMES = ('C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B')
+
+
+def _build_name_to_number():
+    table = {}
+    for step, pitch_class in PITCH_CLASSES.items():
+        for accidental, offset in ACCIDENTALS.items():
+            for octave in OCTAVES:
+                number = 12 * (octave + 1) + pitch_class + offset
+                if 0 <= number <= 127:
+                    table['{0}{1}{2}'.format(step, accidental, octave)] = number
+    return MappingProxyType(table)
+
+
+NAME_TO_NUMBER = _build_name_to_number()
+NUMBER_TO_NAME = tuple('{0}{1}'.format(SHARP_NAMES[n % 12], n // 12 - 1) for n in range(128))
+
+
+def note_name_to_number(name):
+    """Convert a pitch name, ex: 'Bb3', to a MIDI note number."""
+    try:
+        return NAME_TO_NUMBER[name]
+    except KeyError:
+        raise ValueError('Unknown pitch name: {0!r}'.format(name)) from None
+
+
+def note_number_to_name(number):
+    """Convert a MIDI note number to a pitch name, spelled with sharps, ex: 'A#3'."""
+    if not 0 <= number <= 127:
+        raise ValueError('MIDI note number out of range: {0!r}'.format(number))
+    return NUMBER_TO_NAME[number]
@@ -0,0 +1,180 @@
+"""RheingoldGraph Gremlin Server connection pool."""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from rheingoldgraph.backend import GremlinServerBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+
+# Exceptions
+class PoolExhausted(Exception):
+    pass
+
+class PoolClosed(Exception):
+    pass
+
+
+# Classes
+class ConnectionPool:
+    """A thread-safe, size-bounded pool of graph connections.
+
+    Connections are opened lazily through a backend, up to maxsize,
+    and are reused once released.
+    Several Sessions, in several threads, can borrow from the same pool.
+    """
+    def __init__(self, server_uri=None, maxsize=DEFAULT_POOL_SIZE, *, backend=None, timeout=None,
+                 connection_factory=None):
+        """Instantiate a new ConnectionPool.
+
+        Args:
+            server_uri: Gremlin Server websocket URI
+            maxsize: maximum number of open connections
+            backend: backend to open connections from,
+                     by default a GremlinServerBackend for server_uri
+            timeout: default number of seconds to wait for a free connection.
+                     Waits forever if None.
+            connection_factory: callable taking server_uri and returning a new connection,
+                                used instead of the backend
+        """
+        if maxsize < 1:
+            raise ValueError('maxsize must be a positive integer')
+
+        if backend is None:
+            backend = GremlinServerBackend(server_uri)
+
+        self.backend = backend
+        self.server_uri = getattr(backend, 'server_uri', server_uri)
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._connection_factory = connection_factory
+
+        # Idle connections, the most recently released last
+        self._idle = []
+        self._num_open = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    @property
+    def num_open(self):
+        """Number of connections currently open, idle or borrowed."""
+        return self._num_open
+
+
+    @property
+    def num_idle(self):
+        """Number of open connections waiting to be borrowed."""
+        return len(self._idle)
+
+
+    def _open(self):
+        if self._connection_factory is not None:
+            return self._connection_factory(self.server_uri)
+        return self.backend.connect()
+
+
+    def acquire(self, timeout=None):
+        """Borrow a connection from the pool.
+
+        Idle connections are reused first. A new connection is opened if none
+        is idle and the pool is not full. Otherwise, waits for a connection
+        to be released, or discarded.
+
+        Args:
+            timeout: number of seconds to wait, overriding the pool default
+        Returns:
+            connection: an open connection, which must be given back
+                        with release(), or discard() if it is broken
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._available:
+            while True:
+                if self._closed:
+                    raise PoolClosed
+                if self._idle:
+                    return self._idle.pop()
+                if self._num_open < self.maxsize:
+                    # Reserve the slot, and open the connection outside the lock
+                    self._num_open += 1
+                    break
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhausted('No connection released within timeout')
+                self._available.wait(remaining)
+
+        try:
+            return self._open()
+        except Exception:
+            self._free_slot()
+            raise
+
+
+    def release(self, connection):
+        """Give a borrowed connection back to the pool.
+
+        Connections released after the pool is closed are closed instead.
+        """
+        with self._available:
+            if not self._closed:
+                self._idle.append(connection)
+                self._available.notify()
+                return
+
+        self.discard(connection)
+
+
+    def discard(self, connection):
+        """Close a borrowed connection instead of giving it back, ex: a broken connection.
+
+        Its place in the pool is freed, so a new connection can be opened.
+        """
+        self._free_slot()
+        try:
+            connection.close()
+        except Exception:
+            logger.warning('Error closing discarded connection', exc_info=True)
+
+
+    def _free_slot(self):
+        with self._available:
+            self._num_open -= 1
+            self._available.notify()
+
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager borrowing a connection for the duration of the block."""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+
+    def close(self):
+        """Close all idle connections, and any borrowed connection once released.
+
+        Callers waiting for a connection raise PoolClosed.
+        """
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+
+        for connection in idle:
+            self.discard(connection)
@@ -0,0 +1,140 @@
+"""RheingoldGraph background prefetch.
+
+Reads a stream ahead of its consumer on a background thread,
+so slow graph reads do not stall a real-time consumer such as MIDI playback.
+"""
+import threading
+from collections import deque, namedtuple
+
+DEFAULT_HIGH_WATERMARK = 256
+DEFAULT_LOW_WATERMARK = 64
+
+PrefetchStats = namedtuple('PrefetchStats', ['produced', 'consumed', 'underruns', 'refills'])
+
+
+class PrefetchBuffer:
+    """Iterate a stream through a bounded buffer filled by a background thread.
+
+    The producer thread reads the stream until high_watermark items are buffered,
+    then pauses until the consumer has drained the buffer to low_watermark,
+    so graph reads are made in bursts well ahead of the consumer.
+    An underrun is counted every time the consumer finds the buffer empty
+    after the first item, ex: when graph latency spikes.
+    Any exception raised by the stream is raised to the consumer.
+    """
+    def __init__(self, stream, *, high_watermark=DEFAULT_HIGH_WATERMARK,
+                 low_watermark=DEFAULT_LOW_WATERMARK):
+        """Instantiate a new PrefetchBuffer and start reading the stream.
+
+        Args:
+            stream: iterable to read ahead
+            high_watermark: maximum number of items buffered
+            low_watermark: number of buffered items at which reading resumes
+        """
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError('watermarks must satisfy 0 <= low_watermark < high_watermark')
+
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+
+        self._stream = stream
+        self._buffer = deque()
+        self._condition = threading.Condition()
+        self._done = False
+        self._closed = False
+        self._error = None
+
+        self.produced = 0
+        self.consumed = 0
+        self.underruns = 0
+        self.refills = 0
+
+        self._thread = threading.Thread(target=self._produce, name='PrefetchBuffer', daemon=True)
+        self._thread.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def __iter__(self):
+        return self
+
+
+    def __len__(self):
+        return len(self._buffer)
+
+
+    def _produce(self):
+        try:
+            for item in self._stream:
+                with self._condition:
+                    if self._closed:
+                        break
+                    self._buffer.append(item)
+                    self.produced += 1
+                    self._condition.notify_all()
+
+                    if len(self._buffer) >= self.high_watermark:
+                        while not self._closed and len(self._buffer) > self.low_watermark:
+                            self._condition.wait()
+                        self.refills += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            close = getattr(self._stream, 'close', None)
+            if close is not None:
+                close()
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+
+    def __next__(self):
+        with self._condition:
+            if not self._buffer and not self._done and self.consumed:
+                self.underruns += 1
+            while not self._buffer and not self._done:
+                self._condition.wait()
+
+            if not self._buffer:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                raise StopIteration
+
+            item = self._buffer.popleft()
+            self.consumed += 1
+            if len(self._buffer) <= self.low_watermark:
+                self._condition.notify_all()
+
+            return item
+
+
+    def wait_ready(self, timeout=None):
+        """Wait until an item is buffered, or the stream has ended.
+
+        Args:
+            timeout: number of seconds to wait. Waits forever if None.
+        Returns:
+            True if the buffer is ready, False if the timeout expired
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._buffer or self._done, timeout)
+
+
+    def close(self):
+        """Stop reading the stream and drop any buffered items."""
+        with self._condition:
+            self._closed = True
+            self._buffer.clear()
+            self._condition.notify_all()
+
+
+    def stats(self):
+        """Return item counts, underruns and the number of times reading resumed."""
+        return PrefetchStats(self.produced, self.consumed, self.underruns, self.refills)
@@ -0,0 +1,166 @@
+"""RheingoldGraph quantization of performed notes into notated values.
+
+A whole sequence is quantized at once with NumPy:
+the start and end of every note and rest are rounded to a grid of
+1/resolution whole notes, so rounding errors do not build up along a sequence,
+and each rounded duration is split into (length, dot, tie) runs
+with a precomputed lookup table.
+"""
+
+import numpy as np
+
+from rheingoldgraph.elements import Note, REST_PITCH
+from rheingoldgraph.pitch import NUMBER_TO_NAME
+
+DEFAULT_RESOLUTION = 16
+
+
+def _build_fragment_table(resolution):
+    """Split every duration of 1 to 2 * resolution - 1 grid units into dotted values.
+
+    Durations are written in binary, with the whole note as the highest bit.
+    Each run of consecutive set bits is one value, with a dot per extra bit,
+    ex: 7 sixteenths (0111) is a double dotted quarter.
+
+    Returns:
+        lengths: array of shape (2 * resolution, max fragments), padded with 0
+        dots: array of the same shape
+        counts: number of fragments for each duration
+    """
+    if resolution < 1 or resolution & (resolution - 1):
+        raise ValueError('resolution must be a power of 2')
+
+    num_bits = resolution.bit_length()
+    fragments = [[] for _ in range(2 * resolution)]
+    for units in range(1, 2 * resolution):
+        bit = num_bits - 1
+        while bit >= 0:
+            if not units >> bit & 1:
+                bit -= 1
+                continue
+            length = resolution >> bit
+            dot = 0
+            bit -= 1
+            while bit >= 0 and units >> bit & 1:
+                dot += 1
+                bit -= 1
+            fragments[units].append((length, dot))
+
+    width = max(len(f) for f in fragments)
+    lengths = np.zeros((2 * resolution, width), dtype=np.int64)
+    dots = np.zeros((2 * resolution, width), dtype=np.int64)
+    counts = np.array([len(f) for f in fragments], dtype=np.int64)
+    for units, fragment in enumerate(fragments):
+        for i, (length, dot) in enumerate(fragment):
+            lengths[units, i] = length
+            dots[units, i] = dot
+
+    return lengths, dots, counts
+
+
+_FRAGMENT_TABLES = {DEFAULT_RESOLUTION: _build_fragment_table(DEFAULT_RESOLUTION)}
+
+
+def _fragment_table(resolution):
+    if resolution not in _FRAGMENT_TABLES:
+        _FRAGMENT_TABLES[resolution] = _build_fragment_table(resolution)
+    return _FRAGMENT_TABLES[resolution]
+
+
+def quantize_durations(pitches, durations, resolution=DEFAULT_RESOLUTION):
+    """Quantize back to back events into notated (pitch, length, dot, tie) runs.
+
+    Event boundaries, not durations, are rounded to the grid,
+    ex: 12 triplet eighths last one whole note, not 12 sixteenths.
+
+    Args:
+        pitches: array of MIDI pitches, REST_PITCH for rests
+        durations: array of durations, as fractions of a whole note
+        resolution: grid of the quantization, as a fraction of a whole note
+    Returns:
+        pitches, lengths, dots, tied_to_next: arrays with one entry per notated value.
+        Values split from the same event are tied, except for rests.
+    """
+    lengths_table, dots_table, counts_table = _fragment_table(resolution)
+
+    pitches = np.asarray(pitches, dtype=np.int64)
+    durations = np.maximum(np.asarray(durations, dtype=np.float64), 0)
+    boundaries = np.rint(np.cumsum(durations) * resolution).astype(np.int64)
+    units = np.diff(boundaries, prepend=0)
+
+    # Durations of two whole notes or more start with a run of tied whole notes
+    extra_wholes = np.maximum(units // resolution - 1, 0)
+    tail = units - extra_wholes * resolution
+    counts = extra_wholes + counts_table[tail]
+
+    # One row per notated value, with its position within its event
+    event = np.repeat(np.arange(len(units)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    table_position = position - extra_wholes[event]
+    is_whole = table_position < 0
+    table_position = np.maximum(table_position, 0)
+
+    lengths = np.where(is_whole, 1, lengths_table[tail[event], table_position])
+    dots = np.where(is_whole, 0, dots_table[tail[event], table_position])
+    tied_to_next = (position < counts[event] - 1) & (pitches[event] != REST_PITCH)
+
+    return pitches[event], lengths, dots, tied_to_next
+
+
+def sequence_proto_to_arrays(sequence):
+    """Get the events of a monophonic NoteSequence as arrays, with rests between notes.
+
+    Notes are ordered by start time, and each note is cut short where the next one starts.
+    The gap before each note, including any gap before the first note, becomes a rest.
+
+    Args:
+        sequence: protobuf NoteSequence
+    Returns:
+        pitches: array of MIDI pitches, REST_PITCH for rests
+        durations: array of durations, as fractions of a whole note
+    """
+    # For now we just handle a single tempo
+    bpm = sequence.tempos[0].qpm if sequence.tempos else 120
+
+    num_notes = len(sequence.notes)
+    start = np.fromiter((n.start_time for n in sequence.notes), np.float64, num_notes)
+    end = np.fromiter((n.end_time for n in sequence.notes), np.float64, num_notes)
+    pitch = np.fromiter((n.pitch for n in sequence.notes), np.int64, num_notes)
+
+    order = np.argsort(start, kind='stable')
+    start, end, pitch = start[order], end[order], pitch[order]
+
+    next_start = np.append(start[1:], np.inf)
+    end = np.minimum(end, next_start)
+    prev_end = np.insert(end[:-1], 0, 0.0)
+
+    # Interleave a (possibly empty) rest before every note
+    durations = np.empty(2 * num_notes, dtype=np.float64)
+    durations[0::2] = np.maximum(start - prev_end, 0)
+    durations[1::2] = np.maximum(end - start, 0)
+    pitches = np.empty(2 * num_notes, dtype=np.int64)
+    pitches[0::2] = REST_PITCH
+    pitches[1::2] = pitch
+
+    # Seconds to fractions of a whole note
+    durations *= bpm / 240
+
+    return pitches, durations
+
+
+def notes_from_sequence_proto(sequence, resolution=DEFAULT_RESOLUTION):
+    """Quantize a protobuf NoteSequence into notated Notes.
+
+    Args:
+        sequence: protobuf NoteSequence
+        resolution: grid of the quantization, as a fraction of a whole note
+    Returns:
+        generator of (Note, tied_to_next) pairs
+    """
+    pitches, lengths, dots, tied = quantize_durations(*sequence_proto_to_arrays(sequence),
+                                                      resolution=resolution)
+
+    for pitch, length, dot, tied_to_next in zip(pitches.tolist(), lengths.tolist(),
+                                                dots.tolist(), tied.tolist()):
+        name = 'R' if pitch == REST_PITCH else NUMBER_TO_NAME[pitch]
+        yield Note(name, length, dot), tied_to_next
@@ -1,26 +1,47 @@
 """RheingoldGraph session."""
+import builtins
+import logging
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from itertools import islice
 
-import pretty_midi
-
-from gremlin_python.driver.driver_remote_connection import DriverRemoteConnection
 from gremlin_python.structure.graph import Graph
+from gremlin_python.process.traversal import Cardinality
 from gremlin_python import statics
 
 import magenta
 from magenta.protobuf import music_pb2
 
-from rheingoldgraph.elements import Vertex, Note
+from rheingoldgraph.backend import GremlinServerBackend, DEFAULT_GREMLIN_URI
+from rheingoldgraph.cache import LineCache
+from rheingoldgraph.index import (melody_from_notes, ngram_keys, search_postings,
+                                  DEFAULT_NGRAM_SIZE)
+from rheingoldgraph.elements import GenericVertex, Line, Note, LineFrame, timed_notes, \
+                                    DEFAULT_TICKS_PER_BEAT
+from rheingoldgraph.metrics import TraversalMetrics, InstrumentedConnection
 from rheingoldgraph.midi import MIDIEngine
-from rheingoldgraph.musicxml import get_parts_from_xml
+from rheingoldgraph.musicxml import stream_parts_from_xml, part_line_name
+from rheingoldgraph.pitch import note_name_to_number
+from rheingoldgraph.prefetch import PrefetchBuffer, DEFAULT_HIGH_WATERMARK, DEFAULT_LOW_WATERMARK
 from rheingoldgraph.magenta_link import run_with_config, RheingoldMagentaConfig
+from rheingoldgraph.quantize import notes_from_sequence_proto
+from rheingoldgraph.stats import LineStatistics, GraphSummary, STATISTICS_PROPERTIES
 
 # Load gremlin_python statics
+# These shadow builtins such as range, sum, min and max, which are used from builtins
 statics.load_statics(globals())
 
-DEFAULT_GREMLIN_URI = 'ws://localhost:8182/gremlin'
+logger = logging.getLogger(__name__)
+
 DEFAULT_MIDI_PORT = 'IAC Driver MidoPython'
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_CHUNK_SIZE = 512
+RANGE_UNITS = ('ticks', 'seconds', 'measures')
+SKIP_SPANS = (16, 256, 4096)
+DEFAULT_DROP_BATCH_SIZE = 1000
 
 # Exceptions
 class LineDoesNotExist(Exception):
@@ -32,16 +53,193 @@ class LineExists(Exception):
 class RheingoldGraphIntegrityError(Exception):
     pass
 
+class LineIngestError(Exception):
+    """One or more lines failed to be added.
+
+    Attributes:
+        errors: dict of line name to the exception raised while adding it
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Failed to add lines: {0}'.format(', '.join(sorted(errors))))
+
 # Classes
+class PlayableNoteBuilder:
+    """Turn a stream of notated Notes into playable protobuf Notes.
+
+    Tied notes are merged into the note they are tied to,
+    and rests advance the start time of the next playable note.
+    Notes that carry a stored onset and duration are placed by them,
+    so a line can be started from any note.
+    """
+    def __init__(self, bpm, ticks_per_beat=480, velocity=100):
+        self.bpm = bpm
+        self.ticks_per_beat = ticks_per_beat
+        self.velocity = velocity
+
+        self._play_duration = 0
+        self._group_onset = None
+        self._last_end_tick = 0
+
+
+    def add(self, note, tied_to_next=False):
+        """Add the next note of a line.
+
+        Args:
+            note: Note
+            tied_to_next: True if the note is tied to the following note
+        Returns:
+            pb_note: protobuf Note if a note is complete, otherwise None
+        """
+        # Stored timing is in ticks of DEFAULT_TICKS_PER_BEAT
+        scale = self.ticks_per_beat / DEFAULT_TICKS_PER_BEAT
+        if self._group_onset is None:
+            self._group_onset = self._last_end_tick if note.onset is None else note.onset * scale
+        if note.duration is None:
+            self._play_duration += note.ticks(self.ticks_per_beat)
+        else:
+            self._play_duration += note.duration * scale
+
+        # Tied notes are merged into the following note
+        if tied_to_next:
+            return None
+
+        start_tick = self._group_onset
+        self._last_end_tick = start_tick + self._play_duration
+        self._group_onset = None
+        self._play_duration = 0
+
+        if note.name == 'R':
+            return None
+
+        pb_note = music_pb2.NoteSequence.Note()
+        pb_note.pitch = note_name_to_number(note.name)
+        pb_note.velocity = self.velocity
+
+        # Calc start and end times
+        seconds_per_tick = 60 / (self.bpm * self.ticks_per_beat)
+        pb_note.start_time = start_tick * seconds_per_tick
+        pb_note.end_time = self._last_end_tick * seconds_per_tick
+
+        return pb_note
+
+
 class Session:
     """A RheingoldGraph Session."""
-    def __init__(self, server_uri=None):
-        """Instantiate a new RheingoldGraph Session."""
-        if server_uri is None:
-            server_uri = DEFAULT_GREMLIN_URI
+    def __init__(self, server_uri=None, *, backend=None, cache_size=None, pool=None,
+                 metrics=False, metrics_hook=None):
+        """Instantiate a new RheingoldGraph Session.
+
+        Args:
+            server_uri: Gremlin Server websocket URI
+            backend: backend to connect to, ex: MemoryBackend() for an in-process graph.
+                     By default, the backend of pool, or a GremlinServerBackend for server_uri.
+            cache_size: maximum number of lines held in the client-side LRU cache.
+                        Caching is disabled if None.
+            pool: ConnectionPool to borrow a connection from, instead of opening one.
+                  The connection is given back to the pool when the session is closed.
+            metrics: if True, record every traversal the session issues, see metrics()
+            metrics_hook: optional callable, called with every TraversalRecord.
+                          Implies metrics=True.
+        """
+        if backend is None:
+            backend = pool.backend if pool is not None else GremlinServerBackend(server_uri)
+
+        self.backend = backend
+        self._pool = pool
+        if pool is not None:
+            self._connection = pool.acquire()
+        else:
+            self._connection = backend.connect()
+
+        self._metrics = None
+        remote = self._connection
+        if metrics or metrics_hook is not None:
+            self._metrics = TraversalMetrics(hook=metrics_hook)
+            remote = InstrumentedConnection(self._connection, self._metrics, [__file__])
 
         self.graph = Graph()
-        self.g = self.graph.traversal().withRemote(DriverRemoteConnection(server_uri, 'g'))
+        self.g = self.graph.traversal().withRemote(remote)
+
+        self.cache = LineCache(cache_size) if cache_size else None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def close(self):
+        """Close the session.
+
+        A pooled connection is released back to its pool, otherwise it is closed.
+        """
+        if self._connection is None:
+            return
+
+        if self._pool is not None:
+            self._pool.release(self._connection)
+        else:
+            self._connection.close()
+        self._connection = None
+
+
+    def cache_info(self):
+        """Return line cache hit/miss statistics, or None if caching is disabled."""
+        if self.cache is None:
+            return None
+        return self.cache.info()
+
+
+    def metrics(self):
+        """Return traversal statistics per call site, or None if metrics are disabled.
+
+        Returns:
+            dict of call site to CallSiteStats, with latency percentiles in seconds
+        """
+        if self._metrics is None:
+            return None
+        return self._metrics.summary()
+
+
+    def reset_metrics(self):
+        """Discard the traversal statistics recorded so far."""
+        if self._metrics is not None:
+            self._metrics.reset()
+
+
+    def _invalidate_line(self, line_name):
+        """Drop any cached state for a line that has been modified."""
+        if self.cache is not None:
+            self.cache.invalidate(line_name)
+
+
+    @staticmethod
+    def _add_line_traversal(g, line_name):
+        """Build a traversal that adds a line only if no line of that name exists.
+
+        The existence check and the write happen in a single traversal,
+        so concurrent writers cannot both create the same line.
+        The traversal returns a dict in form, {'id': line graph ID, 'created': bool}
+        """
+        return g.V().hasLabel('Line').has('name', line_name).fold() \
+                .coalesce(unfold().project('id', 'created').by(id).by(constant(False)),
+                          addV('Line').property('name', line_name)
+                          .project('id', 'created').by(id).by(constant(True)))
+
+
+    @staticmethod
+    def _line_from_add_result(result, line_name):
+        """Build the new Line from an _add_line_traversal result."""
+        if not result['created']:
+            logger.warning('Line %s already exists', line_name)
+            raise LineExists
+
+        # We just wrote every property, so there is no need to re-fetch the vertex
+        return Line.from_dict({'id': result['id'], 'label': 'Line', 'name': line_name})
 
 
     def _add_line(self, line_name):
@@ -51,26 +249,100 @@ class Session:
             line_name: Name of the line to add
         Returns:
             line: new Line object added to the graph
+        Raises:
+            LineExists: if a line with that name is already in the graph
         """
+        result = self._add_line_traversal(self.g, line_name).next()
 
-        raw_line = self.g.addV('Line').property('name', line_name).next()
-
-        # Get full line object and properties
-        line = self.get_vertex_by_id(raw_line.id)
-
-        return line
+        return self._line_from_add_result(result, line_name)
 
 
     @staticmethod
-    def _add_note_to_traversal(traversal, note):
-        """Add Note and all its property to a traversal."""
-        traversal = traversal.addV(note.label).as_('new')
+    def _add_note_to_traversal(traversal, note, step_label='new'):
+        """Add Note and all its property to a traversal, including any timing."""
+        traversal = traversal.addV(note.label).as_(step_label)
         for prop, value in note.property_dict().items():
             traversal = traversal.property(prop, value)
+        for prop, value in note.timing_dict().items():
+            traversal = traversal.property(prop, value)
 
         return traversal
 
 
+    @classmethod
+    def _note_batch_traversal(cls, g, line_id, batch, prev_note_id=None, tied_to_prev=False):
+        """Build a single traversal that writes a batch of notes to a line.
+
+        Each note is chained to the previous one with a 'next' edge (or to the
+        line with a 'start' edge if it is the first note of the line),
+        linked back to its line with an 'in_line' edge, and tied to the previous
+        note with a 'tie' edge where required.
+
+        Args:
+            g: graph traversal source
+            line_id: graph ID of the line the notes belong to
+            batch: list of (Note, tied_to_next) pairs
+            prev_note_id: graph ID of the last note already in the line, if any
+            tied_to_prev: True if the first note of the batch is tied to prev_note_id
+        Returns:
+            traversal: traversal returning the graph ID of the last note in the batch
+        """
+        traversal = g.V(line_id).as_('l')
+        prev_label = None
+        if prev_note_id is not None:
+            traversal = traversal.V(prev_note_id).as_('prev')
+            prev_label = 'prev'
+
+        for i, (note, tied_to_next) in enumerate(batch):
+            label = 'n{0}'.format(i)
+            traversal = cls._add_note_to_traversal(traversal, note, label)
+            if prev_label is None:
+                traversal = traversal.addE('start').from_('l').to(label)
+            else:
+                traversal = traversal.addE('next').from_(prev_label).to(label)
+                if tied_to_prev:
+                    traversal = traversal.addE('tie').from_(prev_label).to(label)
+            traversal = traversal.addE('in_line').from_(label).to('l')
+
+            prev_label = label
+            tied_to_prev = tied_to_next
+
+        return traversal.select(prev_label).id()
+
+
+    def _add_notes(self, line, notes, batch_size=DEFAULT_BATCH_SIZE):
+        """Add a stream of notes to a line, one traversal per batch.
+
+        The index, onset and duration of every note are set as it is written,
+        so readers never need to walk a line from its start to place a note.
+
+        Args:
+            line: Line object the notes belong to
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+            batch_size: maximum number of notes written per traversal
+        Returns:
+            note_counter: number of notes added
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+
+        notes = timed_notes(notes)
+        note_counter = 0
+        prev_note_id = None
+        tied_to_prev = False
+        while True:
+            batch = list(islice(notes, batch_size))
+            if not batch:
+                break
+
+            prev_note_id = self._note_batch_traversal(self.g, line.id, batch,
+                                                      prev_note_id, tied_to_prev).next()
+            tied_to_prev = batch[-1][1]
+            note_counter += len(batch)
+
+        return note_counter
+
+
     def get_vertex_by_id(self, vertex_id):
         """Get a Vertex element from the graph.
 
@@ -103,6 +375,11 @@ class Session:
         Args:
             line_name: Name of line to find
         """
+        if self.cache is not None:
+            line = self.cache.get_line(line_name)
+            if line is not None:
+                return line
+
         try:
             result = self.g.V().hasLabel('Line').has('name', line_name) \
                          .as_('v').properties().as_('p').select('v', 'p').toList()
@@ -114,10 +391,15 @@ class Session:
             if len(vertex_list) > 1:
                 raise RheingoldGraphIntegrityError
 
-            return self._build_object_from_props(vertex_list[0])
+            line = self._build_object_from_props(vertex_list[0])
         except StopIteration:
             return None
 
+        if self.cache is not None:
+            self.cache.put_line(line_name, line)
+
+        return line
+
     @staticmethod
     def _build_object_from_props(prop_dict):
         """Build object from vertex properties.
@@ -126,65 +408,636 @@ class Session:
         Searches the rheingoldgraph.elements module for a class definition of the
         element type specified by the graph 'label'.
         If found, returns an object of that type.
-        If not found, creates a generic Vertex object
-        # TODO(Ryan): If not found, dynamically create a new object of new class
-        # with type that matches the label foundin the props_dict
+        If not found, returns a GenericVertex holding every property of the vertex.
 
         Args:
             prop_dict: dictionary of vertex properties
         Returns:
             obj: new instance of the object described by the props_dict
         """
-        cls = getattr(sys.modules['rheingoldgraph.elements'],
-                      prop_dict['label'], Vertex)
+        cls = getattr(sys.modules['rheingoldgraph.elements'], prop_dict['label'], None)
+        if getattr(cls, 'label', None) != prop_dict['label']:
+            cls = GenericVertex
         obj = cls.from_dict(prop_dict)
 
         return obj
 
 
-    def get_line_and_notes(self, line_name):
+    @staticmethod
+    def _note_chunk_traversal(traversal, chunk_size):
+        """Extend a traversal positioned on a Note to fetch a chunk of its line.
+
+        The returned traversal yields up to chunk_size rows, in line order,
+        starting with the current note and following 'next' edges.
+        Each row also carries the number of outgoing 'tie' edges of the note,
+        so tie resolution needs no extra round trips.
+
+        Args:
+            traversal: traversal whose current element is a Note vertex
+            chunk_size: maximum number of notes to return
+        Returns:
+            traversal: traversal of rows in form,
+                {'v': gremlin.Vertex, 'props': valueMap, 'tied': tie edge count}
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer')
+        if chunk_size > 1:
+            # identity() keeps emit() from modulating a repeat() the traversal ends with
+            traversal = traversal.identity().emit().repeat(out('next')).times(chunk_size - 1)
+
+        return traversal.project('v', 'props', 'tied') \
+                        .by().by(valueMap()).by(outE('tie').count())
+
+
+    @staticmethod
+    def _build_prop_dict_from_row(row):
+        """Build a dict of vertex properties from a chunk traversal row."""
+        vertex = row['v']
+        prop_dict = {key: values[0] for key, values in row['props'].items()}
+
+        prop_dict['id'] = vertex.id
+        prop_dict['label'] = vertex.label
+
+        return prop_dict
+
+
+    def _iter_note_chunks(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE, first=None):
+        """Iterate through a line in chunks of note properties.
+
+        Each chunk is fetched with a single traversal, so an N-note line
+        costs roughly N / chunk_size round trips.
+
+        Args:
+            line_name: Name of line to retrieve
+            chunk_size: maximum number of notes fetched per traversal
+            first: traversal to the note to start from, instead of the first note of the line
+        Returns:
+            generator of lists of (prop_dict, tied_to_next) pairs, in line order
+        """
+        if first is None:
+            traversal = self.g.V().hasLabel('Line').has('name', line_name).out('start')
+        else:
+            traversal = first
+
+        while True:
+            rows = self._note_chunk_traversal(traversal, chunk_size).toList()
+            if rows == []:
+                break
+
+            yield [(self._build_prop_dict_from_row(row), row['tied'] > 0) for row in rows]
+
+            if len(rows) < chunk_size:
+                break
+            traversal = self.g.V(rows[-1]['v'].id).out('next')
+
+
+    def _iter_line_notes(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Iterate through the notes of a line along with their tie information.
+
+        If caching is enabled, a line that has been read in full is served
+        from the cache without touching the server.
+
+        Args:
+            line_name: Name of line to retrieve
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            generator of (Note, tied_to_next) pairs, in line order
+        """
+        if self.cache is None:
+            for chunk in self._iter_note_chunks(line_name, chunk_size):
+                for prop_dict, tied in chunk:
+                    yield Note.from_dict(prop_dict), tied
+            return
+
+        notes = self.cache.get_notes(line_name)
+        if notes is not None:
+            yield from notes
+            return
+
+        # Only cache the line once it has been read to the end
+        notes = []
+        for chunk in self._iter_note_chunks(line_name, chunk_size):
+            for prop_dict, tied in chunk:
+                note = Note.from_dict(prop_dict)
+                notes.append((note, tied))
+                yield note, tied
+        self.cache.put_notes(line_name, notes)
+
+
+    def get_line_and_notes(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE):
         """Get all notes in a musical line from the graph.
 
-        Use multiple traversals for generator functionality.
+        Notes are fetched in chunks of chunk_size per traversal,
+        but are still yielded one at a time.
         This ensures that even a very large music line can be efficiently iterated.
 
         Args:
             line_name: Name of line to retrieve
+            chunk_size: maximum number of notes fetched per traversal
         """
-        result = self.g.V().hasLabel('Line').has('name', line_name).out('start') \
-                     .as_('v').properties().as_('p').select('v', 'p').toList()
+        for note, _ in self._iter_line_notes(line_name, chunk_size):
+            yield note
 
-        while result != []:
-            prop_dict = self._build_prop_dict_from_result(result)
-            last_id = prop_dict['id']
-            yield Note.from_dict(prop_dict)
 
-            result = self.g.V(('id', last_id)).out('next') \
-                         .as_('v').properties().as_('p').select('v', 'p').toList()
+    @staticmethod
+    def _range_bounds(start, end, unit, bpm=None):
+        """Convert a range to the Note property it is on, and half-open bounds.
+
+        Args:
+            start: start of the range
+            end: end of the range, or None for the end of the line
+            unit: one of RANGE_UNITS
+            bpm: tempo in beats per minute, required for 'seconds'
+        Returns:
+            key, start, end: Note property, and the range start <= value < end
+        """
+        if unit == 'ticks':
+            return 'onset', start, end
+        if unit == 'seconds':
+            if bpm is None:
+                raise ValueError('bpm is required for a range in seconds')
+            ticks_per_second = bpm / 60 * DEFAULT_TICKS_PER_BEAT
+            return ('onset', start * ticks_per_second,
+                    None if end is None else end * ticks_per_second)
+        if unit == 'measures':
+            # The end measure is included
+            return 'measure', start, None if end is None else end + 1
+
+        raise ValueError('unit must be one of {0}'.format(', '.join(RANGE_UNITS)))
+
+
+    @staticmethod
+    def _skip_edges_traversal(g, edges):
+        """Build a single traversal that adds 'skip' edges between notes.
+
+        Args:
+            g: graph traversal source
+            edges: list of (from_note_id, to_note_id, span) tuples
+        """
+        traversal = g
+        for i, (from_id, to_id, span) in enumerate(edges):
+            label = 'f{0}'.format(i)
+            traversal = traversal.V(from_id).as_(label).V(to_id) \
+                                 .addE('skip').from_(label).property('span', span)
+
+        return traversal
+
+
+    @staticmethod
+    def _skip_edges_plan(note_ids, num_notes, spans):
+        """List the skip edges of a line.
+
+        Args:
+            note_ids: dict of note index to graph ID, for every multiple of the smallest span
+            num_notes: number of notes in the line
+            spans: increasing note spans
+        Returns:
+            edges: list of (from_note_id, to_note_id, span) tuples
+        """
+        return [(note_ids[i], note_ids[i + span], span)
+                for span in spans
+                for i in builtins.range(0, num_notes - span, span)
+                if i in note_ids and i + span in note_ids]
+
+
+    @staticmethod
+    def _skip_sources_traversal(g, line_id, num_notes, span):
+        """Build a traversal for the graph ID and index of every note at a multiple of span.
+
+        The traversal returns dicts in form, {'id': note graph ID, 'index': note index}
+        """
+        return g.V(line_id).in_('in_line') \
+                .has('index', within(list(builtins.range(0, num_notes, span)))) \
+                .project('id', 'index').by(id).by('index')
+
+
+    @staticmethod
+    def _skip_spans_traversal(g, line_id, spans, edge_count):
+        """Build a traversal that stores the skip spans and edge count on a Line vertex."""
+        return g.V(line_id).property(Cardinality.single, 'skip_count', edge_count) \
+                           .property(Cardinality.single, 'skip_spans',
+                                     ','.join(str(span) for span in spans))
+
+
+    @staticmethod
+    def _check_skip_spans(spans):
+        """Return spans in increasing order, checking that each span divides the next.
+
+        Every note reached by hops of longer spans is then the source
+        of a skip edge of each shorter span.
+        """
+        spans = tuple(sorted(spans))
+        if builtins.any(span < 1 for span in spans):
+            raise ValueError('spans must be positive integers')
+        if builtins.any(longer % shorter for shorter, longer in zip(spans, spans[1:])):
+            raise ValueError('each span must divide the next, ex: (16, 256, 4096)')
+
+        return spans
+
+
+    def add_skip_edges(self, line_name, spans=SKIP_SPANS, *, batch_size=DEFAULT_BATCH_SIZE):
+        """Add hierarchical 'skip' edges along a line, for seeking in few hops.
+
+        For every span, each note whose index is a multiple of the span
+        is linked to the note span places further along the line by a 'skip' edge
+        with a 'span' property. Any skip edges the line already has are replaced.
+        Notes are located by their stored index, so the line is never walked.
+        The spans are stored on the Line vertex, for seek to use.
+
+        Args:
+            line_name: Name of the line
+            spans: increasing note spans, each dividing the next, ex: (16, 256, 4096)
+            batch_size: maximum number of edges written per traversal
+        Returns:
+            edge_counter: number of skip edges added
+        """
+        spans = self._check_skip_spans(spans)
+        if not spans:
+            raise ValueError('spans must be positive integers')
+
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        # Until the new edges are written, seek walks the line along 'next' edges
+        self.g.V(line.id).properties('skip_spans').drop().iterate()
+        self.g.V(line.id).in_('in_line').outE('skip').drop().iterate()
+        num_notes = self.g.V(line.id).in_('in_line').count().next()
+        rows = self._skip_sources_traversal(self.g, line.id, num_notes, spans[0]).toList()
+        edges = self._skip_edges_plan({row['index']: row['id'] for row in rows},
+                                      num_notes, spans)
+        for i in builtins.range(0, len(edges), batch_size):
+            self._skip_edges_traversal(self.g, edges[i:i + batch_size]).iterate()
+        self._skip_spans_traversal(self.g, line.id, spans, len(edges)).iterate()
+
+        logger.info('Line %s (%d skip edges) added', line_name, len(edges))
+
+        return len(edges)
+
+
+    def _skip_spans(self, line_name):
+        """Return the spans of the skip edges of a line, or () if it has none."""
+        values = self.g.V().hasLabel('Line').has('name', line_name).values('skip_spans').toList()
+        if not values:
+            return ()
+
+        return tuple(int(span) for span in values[0].split(','))
+
+
+    @staticmethod
+    def _seek_traversal(g, line_name, k, spans=SKIP_SPANS):
+        """Build a single traversal to the k-th note of a line.
+
+        Hops along the longest 'skip' edges first, then shorter ones,
+        and finishes with fewer than spans[0] 'next' edges,
+        so the k-th note is reached in O(log k) hops for spans that grow geometrically.
+        With no spans, the line is walked along its 'next' edges, in k hops.
+        """
+        traversal = g.V().hasLabel('Line').has('name', line_name).out('start')
+        position = 0
+        for span in sorted(spans, reverse=True):
+            hops = (k - position) // span
+            if hops:
+                traversal = traversal.repeat(outE('skip').has('span', span).inV()).times(hops)
+                position += hops * span
+        if k > position:
+            traversal = traversal.repeat(out('next')).times(k - position)
+
+        return traversal
+
+
+    def seek(self, line_name, k):
+        """Get the k-th note (0-based) of a line, with a single traversal.
+
+        The traversal hops along the skip edges of the line, see add_skip_edges.
+        A line without skip edges is walked along its 'next' edges instead,
+        which costs k hops on the server.
+
+        Args:
+            line_name: Name of the line
+            k: index of the note in the line
+        Returns:
+            note: Note, with its stored timing, or None if the line has no k-th note
+        """
+        if k < 0:
+            raise ValueError('k must be a non-negative integer')
+
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        traversal = self._seek_traversal(self.g, line_name, k, self._skip_spans(line_name))
+        rows = self._note_chunk_traversal(traversal, 1).toList()
+        if rows == []:
+            return None
+
+        return Note.from_dict(self._build_prop_dict_from_row(rows[0]))
+
+
+    @staticmethod
+    def _range_seek_traversal(g, line_name, key, start, spans=()):
+        """Build a single traversal to the first note of a line with a key property >= start.
+
+        The key must not decrease along the line, as onset and measure do.
+        From the first note, the traversal hops along the 'skip' edges of each span,
+        longest first, for as long as the note hopped to is still before start,
+        then steps along 'next' edges to the first note at or after start.
+        For spans that grow geometrically, ex: SKIP_SPANS, this takes
+        O(N / spans[-1] + log N) hops in a line of N notes.
+        A line without skip edges is walked from its start, in as many hops
+        as there are notes before start.
+        """
+        traversal = g.V().hasLabel('Line').has('name', line_name).out('start')
+        for span in sorted(spans, reverse=True):
+            traversal = traversal.until(not_(outE('skip').has('span', span).inV()
+                                             .has(key, lt(start)))) \
+                                 .repeat(outE('skip').has('span', span).inV())
+
+        return traversal.until(has(key, gte(start))).repeat(out('next'))
+
+
+    def _iter_line_range(self, line_name, key, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Iterate through the notes of a line with start <= key property < end.
+
+        A line held in the cache is filtered in memory.
+
+        Returns:
+            generator of (Note, tied_to_next) pairs, in line order
+        """
+        notes = self.cache.get_notes(line_name) if self.cache is not None else None
+        if notes is not None:
+            for note, tied in notes:
+                value = getattr(note, key)
+                if value is None or value < start:
+                    continue
+                if end is not None and value >= end:
+                    return
+                yield note, tied
+            return
+
+        first = self._range_seek_traversal(self.g, line_name, key, start,
+                                           self._skip_spans(line_name))
+        for chunk in self._iter_note_chunks(line_name, chunk_size, first):
+            for prop_dict, tied in chunk:
+                note = Note.from_dict(prop_dict)
+                if end is not None and getattr(note, key) >= end:
+                    return
+                yield note, tied
+
+
+    def get_line_range(self, line_name, start, end=None, *, unit='ticks', bpm=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+        """Get the notes of a line between two offsets or measures.
+
+        The first note is found from its stored timing, by hopping along
+        the skip edges of the line, see add_skip_edges, so reading from the middle
+        of a line costs a few hops more than reading from its start.
+        On a line without skip edges, the notes before start are walked on the server.
+        Lines added before timing was stored must first be updated
+        with backfill_line_timing.
+
+        Args:
+            line_name: Name of line to retrieve
+            start: start of the range
+            end: end of the range, or None for the end of the line
+            unit: 'ticks' or 'seconds' for the notes that start in [start, end),
+                  'measures' for the notes of measures start to end, inclusive
+            bpm: tempo in beats per minute, required for 'seconds'
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            generator of Notes, with their stored timing
+        """
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        key, start, end = self._range_bounds(start, end, unit, bpm)
+        for note, _ in self._iter_line_range(line_name, key, start, end, chunk_size):
+            yield note
+
+
+    def get_playable_range(self, line_name, bpm, start, end=None, *, unit='ticks',
+                           chunk_size=DEFAULT_CHUNK_SIZE):
+        """Return a playable representation of part of a line.
+
+        Notes keep their start and end times from the start of the line.
+
+        Args:
+            line_name: Name of the musical line
+            bpm: tempo in beats per minute
+            start: start of the range
+            end: end of the range, or None for the end of the line
+            unit: one of RANGE_UNITS, as for get_line_range
+            chunk_size: maximum number of notes fetched per traversal
+        returns:
+            generator object of protobuf Notes
+        """
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
 
+        key, start, end = self._range_bounds(start, end, unit, bpm)
+        builder = PlayableNoteBuilder(bpm)
+        for note, tied in self._iter_line_range(line_name, key, start, end, chunk_size):
+            pb_note = builder.add(note, tied)
+            if pb_note is not None:
+                yield pb_note
 
-    def drop_line(self, line_name):
+
+    def get_range_as_sequence_proto(self, line_name, bpm, start, end=None, *, unit='ticks'):
+        """Return part of a line as a protobuf NoteSequence starting at time 0.
+
+        Times are shifted so the first note of the range, or rest, starts at 0,
+        ex: for priming a Magenta model from the middle of a piece.
+
+        Args:
+            line_name: Name of the musical line
+            bpm: tempo in beats per minute
+            start: start of the range
+            end: end of the range, or None for the end of the line
+            unit: one of RANGE_UNITS, as for get_line_range
+        """
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        key, start, end = self._range_bounds(start, end, unit, bpm)
+        notes = list(self._iter_line_range(line_name, key, start, end))
+
+        sequence = music_pb2.NoteSequence()
+        sequence.ticks_per_quarter = DEFAULT_TICKS_PER_BEAT
+        sequence.tempos.add(qpm=bpm)
+        if not notes:
+            return sequence
+
+        offset = notes[0][0].onset * 60 / (bpm * DEFAULT_TICKS_PER_BEAT)
+        builder = PlayableNoteBuilder(bpm)
+        for note, tied in notes:
+            pb_note = builder.add(note, tied)
+            if pb_note is None:
+                continue
+            pb_note.start_time -= offset
+            pb_note.end_time -= offset
+            sequence.notes.extend([pb_note])
+        sequence.total_time = sequence.notes[-1].end_time if sequence.notes else 0
+
+        return sequence
+
+
+    @staticmethod
+    def _drop_batch_ids_traversal(g, line_id, batch_size):
+        """Build a traversal for the IDs of the first batch_size + 1 notes of a line."""
+        return g.V(line_id).out('start').emit().repeat(out('next')).times(batch_size).id()
+
+
+    @staticmethod
+    def _drop_batch_traversal(g, line_id, batch_ids, next_id=None):
+        """Build a single traversal that drops notes from the front of a line.
+
+        The 'start' edge is moved to next_id in the same traversal,
+        so the rest of the line remains a complete line after every batch.
+
+        Args:
+            g: graph traversal source
+            line_id: graph ID of the line
+            batch_ids: graph IDs of the notes to drop, from the start of the line
+            next_id: graph ID of the note following the batch, if any
+        """
+        traversal = g
+        if next_id is not None:
+            traversal = traversal.V(line_id).as_('l').V(next_id).addE('start').from_('l')
+
+        return traversal.V(*batch_ids).drop()
+
+
+    def drop_line(self, line_name, *, batch_size=DEFAULT_DROP_BATCH_SIZE, progress=None,
+                  pause=0):
         """Remove a line and all associated musical content.
 
+        Notes are dropped from the front of the line, batch_size at a time,
+        each batch in its own traversal, so no single request runs long
+        and other requests are served between batches.
+        The line stays intact but shorter after every batch,
+        so a drop that fails part way can be resumed by calling drop_line again.
+
         Args:
             line_name: line name to drop
+            batch_size: maximum number of notes dropped per traversal
+            progress: optional callable, called after every batch with
+                      the number of notes dropped so far, and the number of notes
+                      in the line, if known
+            pause: seconds to wait between batches
+        Returns:
+            note_counter: number of notes dropped
         """
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+
         # Check that line exists
         line = self.find_line(line_name)
         if not line:
-            print("Line {0} does not exist".format(line_name))
+            logger.warning('Line %s does not exist', line_name)
             raise LineDoesNotExist
 
-        self.g.V().hasLabel('Line').has('name', line_name).in_('in_line').drop().iterate()
-        self.g.V().hasLabel('Line').has('name', line_name).drop().iterate()
+        self._invalidate_line(line_name)
+        self._drop_ngram_postings(line.id, batch_size)
+
+        # Statistics stop being true with the first batch, so remove them up front
+        stats = self.line_statistics(line_name)
+        num_notes = stats.note_count if stats is not None else None
+        self.g.V(line.id).properties(*STATISTICS_PROPERTIES).drop().iterate()
+
+        note_counter = 0
+        while True:
+            ids = self._drop_batch_ids_traversal(self.g, line.id, batch_size).toList()
+            if not ids:
+                # Sweep up any notes that are no longer chained to the line
+                ids = self.g.V(line.id).in_('in_line').limit(batch_size).id().toList()
+                if not ids:
+                    break
+            batch_ids, next_id = ids[:batch_size], (ids[batch_size:] or [None])[0]
+
+            self._drop_batch_traversal(self.g, line.id, batch_ids, next_id).iterate()
+            note_counter += len(batch_ids)
+            if progress is not None:
+                progress(note_counter, num_notes)
+            if pause:
+                time.sleep(pause)
+
+        self.g.V(line.id).drop().iterate()
+        self._invalidate_line(line_name)
 
         # Confirm that Line has been deleted
         if not self.find_line(line_name):
-            print('Line {0} dropped from graph'.format(line_name))
+            logger.info('Line %s dropped from graph', line_name)
         else:
-            print('Line {0} not dropped.'.format(line_name))
+            logger.error('Line %s not dropped', line_name)
             raise LineExists
 
+        return note_counter
+
+    @staticmethod
+    def _timing_update_traversal(g, notes):
+        """Build a single traversal that sets the stored timing of existing notes.
+
+        Args:
+            g: graph traversal source
+            notes: list of Notes read from the graph, with timing set
+        """
+        traversal = g
+        for note in notes:
+            traversal = traversal.V(note.id)
+            for prop, value in note.timing_dict().items():
+                traversal = traversal.property(Cardinality.single, prop, value)
+
+        return traversal
+
+
+    def backfill_line_timing(self, line_name, *, batch_size=DEFAULT_BATCH_SIZE,
+                             chunk_size=DEFAULT_CHUNK_SIZE):
+        """Store the index, onset and duration of every note of an existing line.
+
+        Lines written before timing was stored at ingest are walked once,
+        and their notes updated in batches. Running it again is harmless.
+
+        Args:
+            line_name: Name of the line to update
+            batch_size: maximum number of notes updated per traversal
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            note_counter: number of notes updated
+        """
+        if batch_size < 1:
+            raise ValueError('batch_size must be a positive integer')
+
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        self._invalidate_line(line_name)
+        notes = timed_notes((Note.from_dict(prop_dict), tied)
+                            for chunk in self._iter_note_chunks(line_name, chunk_size)
+                            for prop_dict, tied in chunk)
+        note_counter = 0
+        while True:
+            batch = [note for note, _ in islice(notes, batch_size)]
+            if not batch:
+                break
+
+            self._timing_update_traversal(self.g, batch).iterate()
+            note_counter += len(batch)
+
+        logger.info('Line %s (%d notes) timing updated', line_name, note_counter)
+
+        return note_counter
+
+
     @staticmethod
     def _build_prop_dict_from_result(result):
         # Build our note dict of properties
@@ -193,7 +1046,6 @@ class Session:
 
         prop_dict['id'] = vertex.id
         prop_dict['label'] = vertex.label
-        # print(prop_dict)
 
         return prop_dict
 
@@ -230,149 +1082,403 @@ class Session:
         return vertex_list
 
 
-    def add_lines_from_xml(self, filename, piece_name=None):
+    def add_lines_from_xml(self, filename, piece_name=None, *, batch_size=DEFAULT_BATCH_SIZE,
+                           max_workers=None, skip_spans=SKIP_SPANS):
         """Add lines in graph from an xml file.
 
-        Currently supports monophonic parts
+        Currently supports monophonic parts.
+        The file is streamed, so memory use does not grow with the size of the score.
+        Notes are written in bulk, with up to batch_size notes
+        (and their edges) chained into a single traversal.
+
+        With max_workers > 1, parts are written concurrently by a bounded pool of
+        worker threads, each writing its own line. At most max_workers parts
+        are held in memory at once. Every worker runs to completion,
+        and any failures are raised together as a LineIngestError.
 
         Args:
             filename: XML filename
             piece_name: Name to give the piece of music,
                         used for constructing line names
+            batch_size: maximum number of notes written per traversal
+            max_workers: number of parts to write concurrently
+            skip_spans: spans of the skip edges to add to each line,
+                        so seeks and range reads do not walk the line.
+                        None adds no skip edges.
         """
-        parts = get_parts_from_xml(filename)
+        if skip_spans:
+            self._check_skip_spans(skip_spans)
+        parts = stream_parts_from_xml(filename)
+        line_names = [part_line_name(piece_name, part, len(parts)) for part in parts]
+
+        # Check if any line already exists before writing anything
+        for line_name in line_names:
+            self._invalidate_line(line_name)
+            if self.find_line(line_name):
+                logger.warning('Line %s already exists', line_name)
+                raise LineExists
 
-        for part in parts:
-            # TODO(ryan): Make this more robust
-            if len(parts) == 1:
-                line_name = piece_name
-            else:
-                line_name = '{0}_{1}'.format(piece_name, part.id)
+        if not max_workers or max_workers == 1:
+            for line_name, part in zip(line_names, parts):
+                self._add_part(line_name, part.notes, batch_size, skip_spans)
+            return
 
-            print(line_name)
+        errors = {}
+        slots = threading.BoundedSemaphore(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for line_name, part in zip(line_names, parts):
+                slots.acquire()
+                # The parts share one pass over the file, so read them here, in order
+                try:
+                    notes = list(part.notes)
+                except Exception as e:
+                    slots.release()
+                    errors[line_name] = e
+                    continue
 
-            # Check if line already exists
-            if self.find_line(line_name):
-                print("Line already exists")
-                raise LineExists
+                future = executor.submit(self._add_part, line_name, notes, batch_size, skip_spans)
+                future.add_done_callback(lambda f: slots.release())
+                futures[future] = line_name
 
-            line = self._add_line(line_name)
-            # print(line)
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    errors[futures[future]] = future.exception()
 
-            # Add notes to the line
-            note_counter = 0
-            prev_note = None
-            tie_flag = False
-            # Can I generalize this more?
-            for note, tied_to_next in part.notes:
-                prev_note = self._add_note(line, note, prev_note, tie_flag)
+        if errors:
+            raise LineIngestError(errors)
 
-                tie_flag = tied_to_next
-                note_counter += 1
 
-            print('Line {0} ({1} notes) added'.format(line_name, note_counter))
+    def _add_part(self, line_name, notes, batch_size=DEFAULT_BATCH_SIZE, skip_spans=None):
+        """Add a new line and its notes to the graph.
 
+        Args:
+            line_name: Name of the line to add
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+            batch_size: maximum number of notes written per traversal
+            skip_spans: if given, spans of the skip edges to add to the line
+        Returns:
+            note_counter: number of notes added
+        """
+        logger.info('Adding line %s', line_name)
+        start_time = time.perf_counter()
+        self._invalidate_line(line_name)
+        line = self._add_line(line_name)
+
+        # Add notes to the line, keeping them for the n-gram index, if the graph has one
+        ngram_size = self._ngram_size()
+        if ngram_size is not None:
+            notes = list(notes)
+        stats = LineStatistics()
+        note_counter = self._add_notes(line, stats.track(notes), batch_size)
+        self._line_statistics_traversal(self.g, line.id, stats).iterate()
+        if ngram_size is not None:
+            self._add_ngram_postings(line.id, notes, ngram_size, batch_size)
+        # A line no longer than the shortest span has no skip edges
+        if skip_spans and note_counter > builtins.min(skip_spans):
+            self.add_skip_edges(line_name, skip_spans, batch_size=batch_size)
+
+        elapsed = time.perf_counter() - start_time
+        logger.info('Line %s (%d notes) added in %.2f sec (%.1f notes/sec)',
+                    line_name, note_counter, elapsed, note_counter / elapsed if elapsed else 0)
+
+        return note_counter
 
-    def _add_note(self, line, note, prev_note=None, tied_to_prev=False):
-        if prev_note is None:
-            traversal = self.g.V(line.id).as_('l')
-            traversal = self._add_note_to_traversal(traversal, note)
-            traversal = traversal.addE('start').from_('l').to('new')
-        else:
-            traversal = self.g.V(prev_note.id).as_('prev').out('in_line').as_('l')
-            traversal = self._add_note_to_traversal(traversal, note)
-            traversal = traversal.addE('next').from_('prev').to('new')
 
-            if tied_to_prev:
-                traversal = traversal.addE('tie').from_('prev').to('new')
+    @staticmethod
+    def _ngram_size_traversal(g):
+        """Traversal for the n-gram size of the index stored in the graph, if any."""
+        return g.V().hasLabel('NGramIndex').values('n')
+
+
+    @staticmethod
+    def _ngram_index_traversal(g, n):
+        """Build a traversal that marks the graph as n-gram indexed, with n-grams of n notes."""
+        return g.V().hasLabel('NGramIndex').fold() \
+                .coalesce(unfold(), addV('NGramIndex')) \
+                .property(Cardinality.single, 'n', n)
+
+
+    @staticmethod
+    def _ngram_postings(notes, n):
+        """List the n-gram postings of a line.
+
+        Args:
+            notes: iterable of (Note, tied_to_next) pairs, in line order
+            n: n-gram size of the index
+        Returns:
+            postings: list of (key, melody position, line index) tuples
+        """
+        melody = melody_from_notes(notes)
+        return [(key, position, melody[position][2])
+                for position, key in ngram_keys(melody, n)]
+
+
+    @staticmethod
+    def _ngram_postings_traversal(g, line_id, postings):
+        """Build a single traversal that writes n-gram postings of a line.
+
+        Each posting is an 'occurs' edge to the Line vertex from the NGram vertex
+        of its key, which is added if the graph does not have it yet.
+        The edge holds the melody position and line index of the occurrence.
+
+        Args:
+            g: graph traversal source
+            line_id: graph ID of the line
+            postings: list of (key, melody position, line index) tuples
+        """
+        traversal = g
+        for key, position, index in postings:
+            traversal = traversal.V().hasLabel('NGram').has('key', key).fold() \
+                                 .coalesce(unfold(), addV('NGram').property('key', key)) \
+                                 .addE('occurs').to(V(line_id)) \
+                                 .property('position', position).property('index', index)
+
+        return traversal
+
+
+    @staticmethod
+    def _ngram_lookup_traversal(g, key):
+        """Build a traversal for the postings of an n-gram key.
+
+        The traversal returns dicts in form,
+        {'line': line name, 'position': melody position, 'index': line index}
+        """
+        return g.V().hasLabel('NGram').has('key', key).outE('occurs') \
+                .project('line', 'position', 'index') \
+                .by(inV().values('name')).by('position').by('index')
+
+
+    @staticmethod
+    def _postings_from_rows(rows):
+        """Group _ngram_lookup_traversal rows by line, as search_postings expects."""
+        lines = {}
+        for row in rows:
+            lines.setdefault(row['line'], {})[row['position']] = row['index']
+
+        return lines
+
+
+    def _ngram_size(self):
+        """Return the n-gram size of the index stored in the graph, or None if it has none."""
+        values = self._ngram_size_traversal(self.g).toList()
+        return values[0] if values else None
+
+
+    def _add_ngram_postings(self, line_id, notes, n, batch_size=DEFAULT_BATCH_SIZE):
+        """Write the n-gram postings of a line, batch_size postings per traversal."""
+        postings = self._ngram_postings(notes, n)
+        for i in builtins.range(0, len(postings), batch_size):
+            self._ngram_postings_traversal(self.g, line_id, postings[i:i + batch_size]).iterate()
+
+        return len(postings)
+
 
-        traversal = traversal.addE('in_line').from_('new').to('l')
+    def _drop_ngram_postings(self, line_id, batch_size=DEFAULT_DROP_BATCH_SIZE):
+        """Remove a line from the n-gram index, with any NGram vertex left without postings."""
+        ngram_ids = sorted(set(self.g.V(line_id).in_('occurs').id().toList()))
+        if not ngram_ids:
+            return
 
-        raw_note = traversal.select('new').next()
+        self.g.V(line_id).inE('occurs').drop().iterate()
+        for i in builtins.range(0, len(ngram_ids), batch_size):
+            self.g.V(*ngram_ids[i:i + batch_size]).not_(outE('occurs')).drop().iterate()
 
-        # Get full line object and properties
-        added_note = self.get_vertex_by_id(raw_note.id)
 
-        return added_note
+    def build_ngram_index(self, n=DEFAULT_NGRAM_SIZE, *, chunk_size=DEFAULT_CHUNK_SIZE,
+                          batch_size=DEFAULT_BATCH_SIZE):
+        """Index the melodic n-grams of every line, storing the index in the graph.
 
+        Every distinct n-gram is an NGram vertex, keyed by its 'key' property,
+        with an 'occurs' edge to the Line vertex of each of its occurrences.
+        The index is kept in the graph, so it survives restarts and is shared
+        by every session, and it is kept up to date as lines are added and dropped.
+        Lookups are by exact key, so they are fast wherever 'key' is indexed.
+        Any earlier index is replaced.
 
-    def get_playable_line(self, line_name, bpm, *, excerpt_len=None):
+        Args:
+            n: number of notes per n-gram
+            chunk_size: maximum number of notes fetched per traversal
+            batch_size: maximum number of postings written per traversal
+        Returns:
+            posting_counter: number of postings added
+        """
+        if n < 2:
+            raise ValueError('n must be at least 2')
+
+        while True:
+            ngram_ids = self.g.V().hasLabel('NGram').limit(DEFAULT_DROP_BATCH_SIZE).id().toList()
+            if not ngram_ids:
+                break
+            self.g.V(*ngram_ids).drop().iterate()
+        # Lines added from now on are indexed as they are written
+        self._ngram_index_traversal(self.g, n).iterate()
+
+        posting_counter = 0
+        for line in self.g.V().hasLabel('Line').project('id', 'name').by(id).by('name').toList():
+            notes = self._iter_line_notes(line['name'], chunk_size)
+            posting_counter += self._add_ngram_postings(line['id'], notes, n, batch_size)
+
+        logger.info('N-gram index (%d postings) built', posting_counter)
+
+        return posting_counter
+
+
+    def search_pattern(self, notes, *, rhythm=True):
+        """Find a motif in every line of the graph.
+
+        Matches are transposition and tempo invariant. The n-gram index
+        stored in the graph is built on first use, see build_ngram_index.
+        Only the postings of the motif's n-grams are read,
+        so the cost does not grow with the size of the corpus.
+
+        Args:
+            notes: the motif, as a list of Notes, ex: [Note('D3', 8, 0), Note('F3', 8, 0), ...]
+            rhythm: if True, the rhythm of the motif must match as well as its intervals
+        Returns:
+            matches: sorted list of PatternMatches (line_name, index),
+                     with the index in the line of the first note of each occurrence
+        """
+        melody = melody_from_notes((note, False) for note in notes)
+        ngram_size = self._ngram_size()
+        if ngram_size is None:
+            ngram_size = DEFAULT_NGRAM_SIZE
+            self.build_ngram_index(ngram_size)
+
+        def postings(key):
+            return self._postings_from_rows(self._ngram_lookup_traversal(self.g, key).toList())
+
+        return search_postings(melody, ngram_size, rhythm, postings)
+
+
+    def get_playable_line(self, line_name, bpm, *, excerpt_len=None,
+                          chunk_size=DEFAULT_CHUNK_SIZE):
         """Iterate through a notation line and return a playable representation.
 
+        Note and tie information are fetched together in chunks,
+        so an N-note line costs roughly N / chunk_size round trips.
+
         Args:
             line_name: Name of the musical line
+            bpm: tempo in beats per minute
+            excerpt_len: a integer number of notes to include
+            chunk_size: maximum number of notes fetched per traversal
         returns:
             generator object of protobuf Notes
         """
         # Check if line exists
         line = self.find_line(line_name)
         if not line:
-            print("Line {0} does not exist".format(line_name))
+            logger.warning('Line %s does not exist', line_name)
             raise LineDoesNotExist
 
-        ticks_per_beat = 480
+        builder = PlayableNoteBuilder(bpm)
+        num_notes_returned = 0
+        for note, tied in self._iter_line_notes(line_name, chunk_size):
+            pb_note = builder.add(note, tied)
+            if pb_note is None:
+                continue
+            yield pb_note
 
-        result = self.g.V().hasLabel('Line').has('name', line_name).out('start') \
-                     .as_('v').properties().as_('p').select('v', 'p').toList()
+            # Stop iteration once the excerpt is complete
+            num_notes_returned += 1
+            if num_notes_returned == excerpt_len:
+                return
 
-        play_duration = 0
-        num_notes_returned = 0
-        excerpt_complete = False
-        default_velocity = 100
-        last_end_time = 0
-        while result != [] and not excerpt_complete:
-            vertex_list = self._build_vertex_list_from_result(result)
-            note = self._build_object_from_props(vertex_list[0])
 
-            play_duration += 1/note.length * \
-                             (2 - (1 / 2**note.dot)) * \
-                             4 * ticks_per_beat
+    def play_line(self, line_name, tempo, midi_port=DEFAULT_MIDI_PORT, *,
+                  high_watermark=DEFAULT_HIGH_WATERMARK, low_watermark=DEFAULT_LOW_WATERMARK):
+        """Play a line with MIDI instrument.
 
-            try:
-                # Check if the note is tied
-                self.g.V(note.id).out('tie').next()
-            except StopIteration:
-                # If the note is not tied, ...
-                note_length_in_sec = (60 / bpm) * (play_duration / ticks_per_beat)
-                if note.name != 'R':
-                    pb_note = music_pb2.NoteSequence.Note()
-                    pb_note.pitch = pretty_midi.note_name_to_number(note.name)
-                    pb_note.velocity = default_velocity
+        This method streams protobuf Notes to a MIDI player.
+        Notes are read from the graph ahead of playback by a background thread,
+        so graph latency does not reach the MIDI output.
 
-                    # Calc start and end times
-                    pb_note.start_time = last_end_time
-                    pb_note.end_time = pb_note.start_time + note_length_in_sec
-                    yield pb_note
+        Args:
+            line_name: Name of the line to play
+            tempo: tempo in bpm
+            midi_port: MIDI output port
+            high_watermark: maximum number of notes read ahead of playback
+            low_watermark: number of notes left ahead of playback at which reading resumes
+        Returns:
+            jitter: JitterStats of the MIDI messages sent
+        """
+        return self.play_lines([line_name], tempo, midi_port,
+                               high_watermark=high_watermark, low_watermark=low_watermark)
 
-                    last_end_time = pb_note.end_time
 
-                    # Flag if the excerpt is complete to stop iteration
-                    num_notes_returned += 1
-                    if num_notes_returned == excerpt_len:
-                        excerpt_complete = True
+    def _playable_streams(self, line_names, bpm, chunk_size=DEFAULT_CHUNK_SIZE, *,
+                          high_watermark=DEFAULT_HIGH_WATERMARK,
+                          low_watermark=DEFAULT_LOW_WATERMARK):
+        """Return a PrefetchBuffer of playable notes for each line, with its first chunk read.
 
-                elif note.name == 'R':
-                    last_end_time += note_length_in_sec
+        Every buffer starts reading its line at once on its own thread,
+        so the lines are fetched concurrently, and this returns once
+        every buffer holds its first note, or its line has ended.
+        """
+        for line_name in line_names:
+            if not self.find_line(line_name):
+                logger.warning('Line %s does not exist', line_name)
+                raise LineDoesNotExist
 
-                play_duration = 0
+        streams = [PrefetchBuffer(self.get_playable_line(line_name, bpm, chunk_size=chunk_size),
+                                  high_watermark=high_watermark, low_watermark=low_watermark)
+                   for line_name in line_names]
+        for stream in streams:
+            stream.wait_ready()
 
-            result = self.g.V(('id', note.id)).out('next') \
-                           .as_('v').properties().as_('p').select('v', 'p').toList()
+        return streams
 
 
-    def play_line(self, line_name, tempo, midi_port=DEFAULT_MIDI_PORT):
-        """Play a line with MIDI instrument.
+    def play_lines(self, line_names, tempo, midi_port=DEFAULT_MIDI_PORT, *, programs=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, high_watermark=DEFAULT_HIGH_WATERMARK,
+                   low_watermark=DEFAULT_LOW_WATERMARK):
+        """Play several lines together with MIDI instruments, ex: the parts of a score.
 
-        This method streams protobuf Notes to a MIDI player
+        Every line is read ahead of playback by its own background thread,
+        so playback starts once the first chunk of every line has arrived,
+        and the wait does not grow with the number of lines.
+        The lines are merged lazily by note start time.
 
         Args:
-            line_name: Name of the line to play
+            line_names: Names of the lines to play
             tempo: tempo in bpm
+            midi_port: MIDI output port
+            programs: General MIDI program of each line
+            chunk_size: maximum number of notes fetched per traversal
+            high_watermark: maximum number of notes of each line read ahead of playback
+            low_watermark: number of notes left ahead of playback at which reading resumes
+        Returns:
+            jitter: JitterStats of the MIDI messages sent
         """
         m = MIDIEngine(midi_port, ticks_per_beat=480)
 
-        notes = self.get_playable_line(line_name, tempo)
-        m.play_protobuf(notes)
+        with ExitStack() as stack:
+            streams = [stack.enter_context(stream) for stream in self._playable_streams(
+                line_names, tempo, chunk_size,
+                high_watermark=high_watermark, low_watermark=low_watermark)]
+            jitter = m.play_protobuf_streams(streams, programs=programs)
+
+        logger.info('Prefetch buffer underruns: %d',
+                    builtins.sum(stream.underruns for stream in streams))
+
+        return jitter
+
+
+    def get_line_frame(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Return a whole line from the graph as a columnar LineFrame.
+
+        Args:
+            line_name: Name of the musical line
+            chunk_size: maximum number of notes fetched per traversal
+        """
+        # Check if line exists
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        return LineFrame.from_notes(self._iter_line_notes(line_name, chunk_size), name=line_name)
 
 
     def save_line_to_midi(self, line_name, tempo, filename, *, excerpt_len=None):
@@ -384,8 +1490,11 @@ class Session:
             filename: name of the MIDI file to create, ex: my_midi.mid
             excerpt_len: a integer number of notes to include
         """
-        sequence = self.get_line_as_sequence_proto(line_name, tempo, excerpt_len=excerpt_len)
-        magenta.music.sequence_proto_to_midi_file(sequence, filename)
+        if excerpt_len is None:
+            self.get_line_frame(line_name).to_midi_file(filename, tempo)
+        else:
+            sequence = self.get_line_as_sequence_proto(line_name, tempo, excerpt_len=excerpt_len)
+            magenta.music.sequence_proto_to_midi_file(sequence, filename)
 
 
     def get_line_as_sequence_proto(self, line_name, bpm, *, excerpt_len=None):
@@ -394,8 +1503,13 @@ class Session:
         This method returns the entire line (or an excerpt as a single NoteSequence.
         This means that the entire line is ready to be processed in batch,
         as opposed to streamed.
+        An entire line is converted through a LineFrame, while an excerpt is
+        streamed so that only the notes it needs are read.
         """
-        print("Returning line {0} as NoteSequence protobuf".format(line_name))
+        logger.debug('Returning line %s as NoteSequence protobuf', line_name)
+        if excerpt_len is None:
+            return self.get_line_frame(line_name).to_sequence_proto(bpm)
+
         notes = self.get_playable_line(line_name, bpm, excerpt_len=excerpt_len)
 
         sequence = music_pb2.NoteSequence()
@@ -406,22 +1520,101 @@ class Session:
         sequence.tempos.add(qpm=bpm)
 
         sequence.notes.extend([n for n in notes])
-        sequence.total_time = sequence.notes[-1].end_time
+        sequence.total_time = sequence.notes[-1].end_time if sequence.notes else 0
 
         return sequence
 
 
-    def graph_summary(self):
-        """Print a summary of musical information in our graph.
+    @staticmethod
+    def _line_statistics_traversal(g, line_id, stats):
+        """Build a traversal that stores LineStatistics on a Line vertex."""
+        traversal = g.V(line_id)
+        for prop, value in stats.to_properties().items():
+            traversal = traversal.property(Cardinality.single, prop, value)
+
+        return traversal
+
+
+    def update_line_statistics(self, line_name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Recount the statistics of a line and store them on its Line vertex.
+
+        Lines are counted as they are written, so this is only needed
+        for lines added before statistics were kept.
+
+        Args:
+            line_name: Name of the line
+            chunk_size: maximum number of notes fetched per traversal
+        Returns:
+            stats: LineStatistics of the line
         """
-        # Get graph summary stats
-        total_vertices = self.g.V().count().next()
-        total_edges = self.g.E().count().next()
-        num_lines = self.g.V().hasLabel('Line').count().next()
-        line_summary = self.g.V().hasLabel('Line').group().by('name') \
-                              .by(inE('in_line').count()).next()
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
 
-        # Print graph summary
+        stats = LineStatistics()
+        for _ in stats.track(self._iter_line_notes(line_name, chunk_size)):
+            pass
+        stats.skip_count = self.g.V(line.id).in_('in_line').outE('skip').count().next()
+        self._line_statistics_traversal(self.g, line.id, stats).iterate()
+
+        return stats
+
+
+    def line_statistics(self, line_name):
+        """Return the stored LineStatistics of a line, or None if it has none.
+
+        Args:
+            line_name: Name of the line
+        """
+        line = self.find_line(line_name)
+        if not line:
+            logger.warning('Line %s does not exist', line_name)
+            raise LineDoesNotExist
+
+        props = self.g.V(line.id).valueMap().next()
+        return LineStatistics.from_properties({key: values[0] for key, values in props.items()})
+
+
+    @staticmethod
+    def _summary_from_line_properties(rows):
+        """Build a GraphSummary from the valueMaps of every Line vertex.
+
+        Returns None if any line has no stored statistics.
+        """
+        line_stats = {}
+        for row in rows:
+            props = {key: values[0] for key, values in row.items()}
+            stats = LineStatistics.from_properties(props)
+            if stats is None:
+                logger.warning('Some lines have no statistics, counting the whole graph. '
+                               'Run update_line_statistics to store them.')
+                return None
+            line_stats[props['name']] = stats
+
+        return GraphSummary(builtins.sum(stats.num_vertices for stats in line_stats.values()),
+                            builtins.sum(stats.num_edges for stats in line_stats.values()),
+                            len(line_stats),
+                            {name: stats.note_count for name, stats in line_stats.items()})
+
+
+    @staticmethod
+    def _line_properties_traversal(g):
+        """Traversal for the valueMap of every Line vertex, with its stored statistics."""
+        return g.V().hasLabel('Line').valueMap()
+
+
+    @staticmethod
+    def _graph_summary_traversals(g):
+        """Traversals for total vertices, total edges, number of lines and notes per line."""
+        return (g.V().count(),
+                g.E().count(),
+                g.V().hasLabel('Line').count(),
+                g.V().hasLabel('Line').group().by('name').by(inE('in_line').count()))
+
+
+    @staticmethod
+    def _print_graph_summary(total_vertices, total_edges, num_lines, line_summary):
         print("Total Vertices: {0}".format(total_vertices))
         print("Total Edges: {0}".format(total_edges))
         print("Number of Lines: {0}\n----------------".format(num_lines))
@@ -429,66 +1622,56 @@ class Session:
             print("{0}: {1}".format(key, val))
 
 
-    def add_sequence_proto_to_graph(self, sequence, line_name):
-        """Add a Protocol Buffer Note Sequence to the graph.
+    def graph_summary(self, verify=False):
+        """Print a summary of musical information in our graph.
+
+        The summary is built from the statistics stored on each Line vertex,
+        so its cost grows with the number of lines, not notes.
+        With verify=True, or if any line has no stored statistics,
+        every vertex and edge is counted instead.
 
         Args:
-            sequence: protobuf NoteSequence
-            line_name: name of the new line to be added to the graph
+            verify: count the whole graph instead of using stored statistics
+        Returns:
+            summary: GraphSummary
         """
-        print("Adding protobuf sequence to RheingoldGraph line {0}".format(line_name))
-        # Create a new line if it doesn't already exist
-        if self.find_line(line_name):
-            raise LineExists
-        else:
-            # Should return a line object, but getting there...
-            line = self.g.addV('Line').property('name', line_name).next()
+        summary = None
+        if not verify:
+            rows = self._line_properties_traversal(self.g).toList()
+            summary = self._summary_from_line_properties(rows)
 
-        # Add notes to the line
-        note_counter = 0
-        prev_note = None
-        for note in sequence.notes:
-            # Need to handle RESTS!
-            # print(note)
-
-            note_length_in_sec = note.end_time - note.start_time
-
-            # For now we just handle a single tempo
-            bpm = sequence.tempos[0].qpm
-
-            percent_of_whole = round((bpm * note_length_in_sec) / 240, 5)
+        if summary is None:
+            summary = GraphSummary(*[traversal.next() for traversal
+                                     in self._graph_summary_traversals(self.g)])
 
-            # Converting note to note & dots
-            possible_values = [1, 0.5, 0.25, 0.125, 0.0625]
-
-            tied_notes = []
-            remainder = percent_of_whole
-            for val in possible_values:
-                if val <= remainder:
-                    tied_notes.append(val)
-                    remainder -= val
-                    if remainder == 0:
-                        break
+        # Print graph summary
+        self._print_graph_summary(*summary)
 
-            # TODO(ryan) Need additional algo to estimate dots
-            dot = 0
-            tie_flag = False
-            while len(tied_notes) > 0:
-                t_note = tied_notes.pop(0)
-                note_length = int(1 / t_note)
-                graph_note = Note(name=pretty_midi.note_number_to_name(note.pitch),
-                                  length=note_length, dot=dot)
+        return summary
 
-                # print(graph_note)
 
-                prev_note = self._add_note(line, graph_note, prev_note, tie_flag)
+    def add_sequence_proto_to_graph(self, sequence, line_name, *, batch_size=DEFAULT_BATCH_SIZE,
+                                    skip_spans=SKIP_SPANS):
+        """Add a Protocol Buffer Note Sequence to the graph.
 
-                note_counter += 1
+        The whole sequence, including the rests between notes, is quantized at once,
+        and the resulting notes are written in batches.
 
-                if len(tied_notes) > 0:
-                    tie_flag = True
+        Args:
+            sequence: protobuf NoteSequence
+            line_name: name of the new line to be added to the graph
+            batch_size: maximum number of notes written per traversal
+            skip_spans: spans of the skip edges to add to the line, None for none
+        """
+        logger.info('Adding protobuf sequence to RheingoldGraph line %s', line_name)
+        if skip_spans:
+            self._check_skip_spans(skip_spans)
+        self._invalidate_line(line_name)
+        # Create a new line if it doesn't already exist
+        if self.find_line(line_name):
+            raise LineExists
 
-        print('Line {0} ({1} notes) added'.format(line_name, note_counter))
+        self._add_part(line_name, notes_from_sequence_proto(sequence), batch_size, skip_spans)
 
 
     def generate_melody_from_trained_model(self, trained_model_name, bundle_file,
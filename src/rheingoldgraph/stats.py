@@ -0,0 +1,103 @@
+"""RheingoldGraph line statistics.
+
+Statistics are gathered as a line is written and stored as properties
+of its Line vertex, so summaries of the graph never need to scan notes or edges.
+"""
+import json
+from collections import Counter, namedtuple
+
+GraphSummary = namedtuple('GraphSummary', ['total_vertices', 'total_edges', 'num_lines',
+                                           'line_summary'])
+
+# Line vertex properties that LineStatistics are stored as
+STATISTICS_PROPERTIES = ('note_count', 'tie_count', 'skip_count', 'duration', 'pitch_histogram')
+
+
+class LineStatistics:
+    """Counts and totals of a single line.
+
+    Attributes:
+        note_count: number of Note vertices, including rests
+        tie_count: number of 'tie' edges
+        skip_count: number of 'skip' edges
+        duration: total duration of the line, in ticks
+        pitch_histogram: dict of note name to number of notes, excluding rests
+    """
+    def __init__(self, note_count=0, tie_count=0, skip_count=0, duration=0,
+                 pitch_histogram=None):
+        self.note_count = note_count
+        self.tie_count = tie_count
+        self.skip_count = skip_count
+        self.duration = duration
+        self.pitch_histogram = Counter(pitch_histogram or {})
+
+
+    def __repr__(self):
+        return 'LineStatistics(note_count={0}, tie_count={1}, skip_count={2}, duration={3})'.format(
+            self.note_count, self.tie_count, self.skip_count, self.duration)
+
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.to_properties() == other.to_properties()
+        else:
+            return False
+
+
+    @property
+    def num_vertices(self):
+        """Number of vertices of the line, including the Line vertex."""
+        return self.note_count + 1
+
+
+    @property
+    def num_edges(self):
+        """Number of edges of the line: start, next, in_line, tie and skip."""
+        if self.note_count == 0:
+            return 0
+        return 1 + (self.note_count - 1) + self.note_count + self.tie_count + self.skip_count
+
+
+    def add(self, note):
+        """Count the next note of a line."""
+        self.note_count += 1
+        self.duration += note.ticks() if note.duration is None else note.duration
+        if note.name != 'R':
+            self.pitch_histogram[note.name] += 1
+
+
+    def track(self, notes):
+        """Count a stream of (Note, tied_to_next) pairs as it is consumed.
+
+        The last note of a line cannot be tied to a following note,
+        so a trailing tie flag is not counted as an edge.
+        """
+        tied = False
+        for note, tied_to_next in notes:
+            self.add(note)
+            if tied:
+                self.tie_count += 1
+            tied = tied_to_next
+            yield note, tied_to_next
+
+
+    def to_properties(self):
+        """Return the statistics as Line vertex properties."""
+        return {'note_count': self.note_count,
+                'tie_count': self.tie_count,
+                'skip_count': self.skip_count,
+                'duration': float(self.duration),
+                'pitch_histogram': json.dumps(dict(sorted(self.pitch_histogram.items())))}
+
+
+    @classmethod
+    def from_properties(cls, mapping):
+        """Alternate constructor from Line vertex properties.
+
+        Returns None if the line has no stored statistics.
+        """
+        if any(key not in mapping for key in STATISTICS_PROPERTIES):
+            return None
+
+        return cls(mapping['note_count'], mapping['tie_count'], mapping['skip_count'],
+                   mapping['duration'], json.loads(mapping['pitch_histogram']))
@@ -0,0 +1,24 @@
+"""Fixtures shared by the RheingoldGraph tests."""
+
+import copy
+
+import pytest
+from lxml import etree
+
+# Fixtures
+@pytest.fixture
+def two_part_score(tmp_path):
+    """The Bach prelude, with its part copied as a second part."""
+    doc = etree.parse('scores/BachCelloSuiteDminPrelude.xml')
+    root = doc.getroot()
+    part_list = root.find('part-list')
+    score_part = copy.deepcopy(part_list.find('score-part'))
+    score_part.set('id', 'P2')
+    part_list.append(score_part)
+    part = copy.deepcopy(root.find('part'))
+    part.set('id', 'P2')
+    root.append(part)
+
+    filename = str(tmp_path / 'two_part.xml')
+    doc.write(filename)
+    return filename
@@ -0,0 +1,89 @@
+"""Tests of RheingoldGraph asyncio session."""
+
+import asyncio
+
+import pytest
+
+from rheingoldgraph.backend import MemoryBackend
+from rheingoldgraph.elements import Line, Note
+from rheingoldgraph.async_session import AsyncSession
+from rheingoldgraph.index import PatternMatch
+from rheingoldgraph.session import Session, LineExists
+
+# Fixtures
+@pytest.fixture
+def session():
+    session = AsyncSession(backend=MemoryBackend())
+    yield session
+    session.close()
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+# Functional tests
+class TestFindLine:
+    def test_return_none_if_no_line(self, session):
+        assert asyncio.run(session.find_line('no_strauss_here')) is None
+
+
+class TestAddReadLine:
+    def test_add_read_then_drop(self, session):
+        async def run():
+            await session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml',
+                                             'async_bach', batch_size=50)
+            line = await session.find_line('async_bach')
+            notes = await collect(session.get_line_and_notes('async_bach', chunk_size=100))
+            playable = await collect(session.get_playable_line('async_bach', 80, excerpt_len=11))
+
+            with pytest.raises(LineExists):
+                await session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml',
+                                                 'async_bach')
+            return line, notes, playable
+
+        line, notes, playable = asyncio.run(run())
+        Session(backend=session.backend).drop_line('async_bach')
+
+        assert type(line) is Line
+        assert len(notes) == 643
+        assert notes[:2] == [Note('D3', 8, 0), Note('F3', 8, 0)]
+        assert len(playable) == 11
+
+    def test_concurrent_reads(self, session):
+        async def run():
+            return await asyncio.gather(*[session.find_line('no_strauss_here')
+                                          for _ in range(16)])
+
+        assert asyncio.run(run()) == [None] * 16
+
+    def test_parts_and_skip_edges(self, session, two_part_score):
+        asyncio.run(session.add_lines_from_xml(two_part_score, 'duo', skip_spans=(4, 16, 64)))
+        sync_session = Session(backend=session.backend)
+        notes = list(sync_session.get_line_and_notes('duo_P1'))
+
+        assert notes == list(sync_session.get_line_and_notes('duo_P2'))
+        assert sync_session.line_statistics('duo_P2').skip_count == 160 + 40 + 10
+        assert [sync_session.seek('duo_P2', k) for k in (0, 330, 642)] == \
+               [notes[0], notes[330], notes[642]]
+
+
+class TestIndexAndSummary:
+    def test_search_pattern_sees_new_lines(self, session):
+        motif = [Note('D3', 16, 0), Note('F3', 16, 0), Note('A3', 16, 0)]
+
+        async def run():
+            await session.build_ngram_index()
+            await session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml', 'async_bach')
+            return await session.search_pattern(motif, rhythm=False)
+
+        assert PatternMatch('async_bach', 0) in asyncio.run(run())
+
+    def test_graph_summary(self, session):
+        async def run():
+            await session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml', 'async_bach')
+            return await session.graph_summary(), await session.graph_summary(verify=True)
+
+        summary, counted = asyncio.run(run())
+        assert summary == counted
+        assert summary.line_summary == {'async_bach': 643}
+        assert summary.total_edges == 1334
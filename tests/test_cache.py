@@ -0,0 +1,65 @@
+"""Tests of RheingoldGraph line cache."""
+
+import pytest
+
+from rheingoldgraph.cache import LineCache
+from rheingoldgraph.elements import Line, Note
+
+# Fixtures
+@pytest.fixture
+def cache():
+    return LineCache(maxsize=2)
+
+@pytest.fixture
+def note_list():
+    return [(Note('D3', 8, 0), False), (Note('F3', 8, 0), True), (Note('F3', 4, 0), False)]
+
+
+# Tests
+class TestLineCache:
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            LineCache(maxsize=0)
+
+    def test_miss_then_hit(self, cache):
+        assert cache.get_line('bach_cello') is None
+        cache.put_line('bach_cello', Line('bach_cello'))
+        assert cache.get_line('bach_cello') == Line('bach_cello')
+
+        info = cache.info()
+        assert info.hits == 1
+        assert info.misses == 1
+        assert info.currsize == 1
+
+    def test_notes(self, cache, note_list):
+        cache.put_line('bach_cello', Line('bach_cello'))
+        assert cache.get_notes('bach_cello') is None
+
+        cache.put_notes('bach_cello', iter(note_list))
+        assert cache.get_notes('bach_cello') == note_list
+
+    def test_least_recently_used_is_evicted(self, cache):
+        cache.put_line('a', Line('a'))
+        cache.put_line('b', Line('b'))
+        cache.get_line('a')
+        cache.put_line('c', Line('c'))
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+        assert len(cache) == 2
+
+    def test_invalidate(self, cache, note_list):
+        cache.put_line('a', Line('a'))
+        cache.put_notes('a', note_list)
+        cache.invalidate('a')
+        cache.invalidate('not_cached')
+
+        assert cache.get_line('a') is None
+        assert cache.get_notes('a') is None
+
+    def test_clear(self, cache):
+        cache.put_line('a', Line('a'))
+        cache.get_line('a')
+        cache.clear()
+        assert cache.info() == (0, 0, 2, 0)
@@ -1,7 +1,9 @@
 """Tests of Basic RheingoldGraph Elements"""
 
+import mido
 import pytest
-from rheingoldgraph.elements import Note, Line 
+from rheingoldgraph.elements import (Note, Line, GenericVertex, LineFrame, REST_PITCH,
+                                    timed_notes)
 
 # Fixtures
 @pytest.fixture
@@ -12,6 +14,14 @@ def note():
 def line():
     return Line(name='bach_cello')
 
+@pytest.fixture
+def frame():
+    notes = [(Note('D3', 4, 0), True),
+             (Note('D3', 8, 0), False),
+             (Note('R', 4, 0), False),
+             (Note('F3', 4, 1), False)]
+    return LineFrame.from_notes(notes, name='tester')
+
 # Tests
 class TestNote:
     def test_type(self, note):
@@ -89,6 +99,59 @@ class TestNote:
         other = Note.from_dict(other_dict)
         assert note == other
 
+    #### Timing
+    def test_default_timing_is_None(self, note):
+        assert (note.index, note.onset, note.duration) == (None, None, None)
+        assert note.timing_dict() == {}
+
+    def test_alt_constr_w_timing(self):
+        note_dict = {'name': 'D3', 'length': 4, 'dot': 0, 'label': 'Note',
+                     'index': 3, 'onset': 960.0, 'duration': 480.0}
+        new = Note.from_dict(note_dict)
+        assert new.timing_dict() == {'index': 3, 'onset': 960.0, 'duration': 480.0}
+        # Timing is not part of the note's value
+        assert new.property_dict() == {'name': 'D3', 'length': 4, 'dot': 0}
+        assert new == Note('D3', 4, 0)
+
+    def test_ticks(self):
+        assert Note('D3', 4, 0).ticks() == 480
+        assert Note('D3', 8, 1).ticks() == 360
+        assert Note('D3', 2, 2).ticks(96) == 336
+
+
+class TestTimedNotes:
+    def test_timing(self):
+        notes = [(Note('D3', 4, 0), True), (Note('D3', 8, 0), False), (Note('R', 4, 1), False)]
+        timed = list(timed_notes(notes))
+        assert [tied for _, tied in timed] == [True, False, False]
+        assert [n.timing_dict() for n, _ in timed] == [
+            {'index': 0, 'onset': 0, 'duration': 480},
+            {'index': 1, 'onset': 480, 'duration': 240},
+            {'index': 2, 'onset': 720, 'duration': 720}]
+
+    def test_start_offset(self):
+        notes = [(Note('D3', 4, 0), False), (Note('E3', 4, 0), False)]
+        timed = list(timed_notes(notes, start_index=10, start_onset=4800))
+        assert [(n.index, n.onset) for n, _ in timed] == [(10, 4800), (11, 5280)]
+
+
+
+class TestGenericVertex:
+    def test_alt_constr_keeps_properties(self):
+        vertex = GenericVertex.from_dict({'id': 7, 'label': 'NGram', 'key': 'i:3 4'})
+        assert vertex.id == 7
+        assert vertex.label == 'NGram'
+        assert vertex.key == 'i:3 4'
+        assert vertex.property_dict() == {'key': 'i:3 4'}
+
+    def test_missing_property(self):
+        with pytest.raises(AttributeError):
+            GenericVertex('NGram').key
+
+    def test_reflexive(self):
+        vertex = GenericVertex('NGram', key='i:3 4')
+        assert eval(repr(vertex)) == vertex
+        assert vertex != GenericVertex('Motif', key='i:3 4')
 
 
 class TestLine:
@@ -150,3 +213,51 @@ class TestLine:
         assert line == other
 
 
+class TestLineFrame:
+    def test_columns(self, frame):
+        assert len(frame) == 4
+        assert frame.pitch.tolist() == [50, 50, REST_PITCH, 53]
+        assert frame.length.tolist() == [4, 8, 4, 4]
+        assert frame.dot.tolist() == [0, 0, 0, 1]
+        assert frame.tied.tolist() == [True, False, False, False]
+
+    def test_columns_must_match(self):
+        with pytest.raises(ValueError):
+            LineFrame([50, 52], [4], [0], [False])
+
+    def test_timing(self, frame):
+        assert frame.durations().tolist() == [480, 240, 480, 720]
+        assert frame.onsets().tolist() == [0, 480, 720, 1200]
+
+    def test_playable_merges_ties_and_drops_rests(self, frame):
+        pitch, onset, duration = frame.playable()
+        assert pitch.tolist() == [50, 53]
+        assert onset.tolist() == [0, 1200]
+        assert duration.tolist() == [720, 720]
+
+    def test_empty(self):
+        frame = LineFrame.from_notes([])
+        assert len(frame) == 0
+        assert [a.tolist() for a in frame.playable()] == [[], [], []]
+        assert frame.to_sequence_proto(120).total_time == 0
+
+    def test_to_sequence_proto(self, frame):
+        sequence = frame.to_sequence_proto(120)
+        assert sequence.tempos[0].qpm == 120
+        assert [n.pitch for n in sequence.notes] == [50, 53]
+        assert [n.start_time for n in sequence.notes] == [0, 1.25]
+        assert [n.end_time for n in sequence.notes] == [0.75, 2]
+        assert sequence.total_time == 2
+
+    def test_to_sequence_proto_excerpt(self, frame):
+        sequence = frame.to_sequence_proto(120, excerpt_len=1)
+        assert [n.pitch for n in sequence.notes] == [50]
+        assert sequence.total_time == 0.75
+
+    def test_to_midi_file(self, frame, tmp_path):
+        filename = str(tmp_path / 'frame.mid')
+        frame.to_midi_file(filename, 120)
+        messages = [m for m in mido.MidiFile(filename).tracks[0] if not m.is_meta]
+        assert [(m.type, m.note, m.time) for m in messages] == [
+            ('note_on', 50, 0), ('note_off', 50, 720),
+            ('note_on', 53, 480), ('note_off', 53, 720)]
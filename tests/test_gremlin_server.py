@@ -0,0 +1,100 @@
+"""Integration tests of RheingoldGraph against a live Gremlin Server.
+
+These run the traversals that the other tests run on the in-process graph
+against TinkerGraph, served with the test configuration:
+
+    bin/gremlin-server.sh conf/gremlin-server-rheingold-test.yaml
+
+They are skipped when no server is listening on its port.
+"""
+
+import asyncio
+import socket
+import uuid
+
+import pytest
+
+from rheingoldgraph.async_session import AsyncSession
+from rheingoldgraph.elements import Note
+from rheingoldgraph.index import PatternMatch
+from rheingoldgraph.session import Session
+
+TEST_SERVER_HOST = 'localhost'
+TEST_SERVER_PORT = 8189
+TEST_SERVER_URI = 'ws://{0}:{1}/gremlin'.format(TEST_SERVER_HOST, TEST_SERVER_PORT)
+BACH = 'scores/BachCelloSuiteDminPrelude.xml'
+
+
+def server_is_reachable():
+    try:
+        socket.create_connection((TEST_SERVER_HOST, TEST_SERVER_PORT), timeout=0.5).close()
+    except OSError:
+        return False
+    return True
+
+
+pytestmark = pytest.mark.skipif(not server_is_reachable(),
+                                reason='No Gremlin Server on {0}'.format(TEST_SERVER_URI))
+
+# Fixtures
+@pytest.fixture
+def line_name():
+    # The server graph may be shared, so every test writes its own line
+    return 'test_{0}'.format(uuid.uuid4().hex)
+
+@pytest.fixture
+def session(line_name):
+    session = Session(TEST_SERVER_URI)
+    session.add_lines_from_xml(BACH, line_name)
+    yield session
+    if session.find_line(line_name):
+        session.drop_line(line_name)
+    session.close()
+
+
+# Tests
+class TestSession:
+    def test_read_line(self, session, line_name):
+        notes = list(session.get_line_and_notes(line_name))
+        assert len(notes) == 643
+        assert notes[:2] == [Note('D3', 8, 0), Note('F3', 8, 0)]
+        assert session.line_statistics(line_name).note_count == 643
+
+    def test_seek_and_range(self, session, line_name):
+        notes = list(session.get_line_and_notes(line_name))
+        assert [session.seek(line_name, k) for k in (0, 330, 642)] == \
+               [notes[0], notes[330], notes[642]]
+
+        expected = [n.index for n in notes if n.measure in (20, 21)]
+        in_range = session.get_line_range(line_name, 20, 21, unit='measures')
+        assert [n.index for n in in_range] == expected
+
+    def test_search_pattern(self, session, line_name):
+        motif = [Note('A3', 16, 0), Note('F3', 16, 0), Note('E3', 16, 0), Note('D3', 16, 0),
+                 Note('C#3', 16, 0)]
+        assert PatternMatch(line_name, 555) in session.search_pattern(motif)
+
+    def test_drop_line(self, session, line_name):
+        assert session.drop_line(line_name) == 643
+        assert session.find_line(line_name) is None
+
+
+class TestAsyncSession:
+    def test_add_read_then_drop(self, line_name):
+        async def run():
+            async with AsyncSession(TEST_SERVER_URI) as session:
+                await session.add_lines_from_xml(BACH, line_name)
+                notes = [note async for note in session.get_line_and_notes(line_name)]
+                playable = [note async for note in session.get_playable_line(line_name, 120)]
+                return notes, playable
+
+        try:
+            notes, playable = asyncio.run(run())
+        finally:
+            with Session(TEST_SERVER_URI) as session:
+                if session.find_line(line_name):
+                    session.drop_line(line_name)
+
+        assert len(notes) == 643
+        assert notes[0] == Note('D3', 8, 0)
+        assert playable[0].pitch == 50
@@ -0,0 +1,94 @@
+"""Tests of RheingoldGraph melodic n-gram index."""
+
+import pytest
+
+from rheingoldgraph.elements import Note, timed_notes
+from rheingoldgraph.index import NGramIndex, PatternMatch, melody_from_notes
+from rheingoldgraph.musicxml import get_parts_from_xml
+
+# Fixtures
+@pytest.fixture
+def line():
+    # D F A | D (tied) | rest | G B D
+    notes = [Note('D3', 8, 0), Note('F3', 8, 0), Note('A3', 8, 0), Note('D4', 8, 0),
+             Note('D4', 8, 0), Note('R', 4, 0), Note('G3', 8, 0), Note('B3', 8, 0),
+             Note('D4', 8, 0)]
+    tied = [False, False, False, True, False, False, False, False, False]
+    return list(timed_notes(zip(notes, tied)))
+
+@pytest.fixture
+def index(line):
+    ngram_index = NGramIndex(n=3)
+    ngram_index.add_line('tester', line)
+    return ngram_index
+
+@pytest.fixture
+def bach():
+    part = get_parts_from_xml('scores/BachCelloSuiteDminPrelude.xml')[0]
+    return list(timed_notes((n.note, n.tied) for n in part.notes))
+
+
+# Tests
+class TestMelodyFromNotes:
+    def test_merges_ties_and_drops_rests(self, line):
+        melody = melody_from_notes(line)
+        assert [(pitch, index) for pitch, _, index in melody] == [
+            (50, 0), (53, 1), (57, 2), (62, 3), (55, 6), (59, 7), (62, 8)]
+        assert melody[3][1] == 480
+
+
+class TestNGramIndex:
+    def test_invalid_n(self):
+        with pytest.raises(ValueError):
+            NGramIndex(n=1)
+
+    def test_transposed_motif(self, index):
+        # A minor triad, transposed from D minor
+        motif = [Note('A4', 16, 0), Note('C5', 16, 0), Note('E5', 16, 0)]
+        assert index.search(motif) == [PatternMatch('tester', 0)]
+
+    def test_rhythm(self, index):
+        motif = [Note('A3', 8, 0), Note('D4', 4, 0), Note('G3', 8, 0)]
+        assert index.search(motif) == [PatternMatch('tester', 2)]
+        motif = [Note('A3', 8, 0), Note('D4', 8, 0), Note('G3', 8, 0)]
+        assert index.search(motif) == []
+        assert index.search(motif, rhythm=False) == [PatternMatch('tester', 2)]
+
+    def test_long_motif(self, index):
+        motif = [Note('F3', 8, 0), Note('A3', 8, 0), Note('D4', 4, 0), Note('G3', 8, 0),
+                 Note('B3', 8, 0)]
+        assert index.search(motif) == [PatternMatch('tester', 1)]
+
+    def test_short_motif_at_end_of_line(self, index):
+        motif = [Note('G3', 8, 0), Note('Bb3', 8, 0)]
+        assert index.search(motif, rhythm=False) == [PatternMatch('tester', 0),
+                                                     PatternMatch('tester', 7)]
+
+    def test_motif_needs_two_notes(self, index):
+        with pytest.raises(ValueError):
+            index.search([Note('D3', 8, 0), Note('R', 8, 0)])
+
+    def test_remove_line(self, index, line):
+        index.add_line('other', line)
+        motif = [Note('D3', 8, 0), Note('F3', 8, 0), Note('A3', 8, 0)]
+        assert len(index.search(motif)) == 2
+
+        index.remove_line('tester')
+        assert 'tester' not in index
+        assert index.search(motif) == [PatternMatch('other', 0)]
+        index.remove_line('other')
+        assert len(index) == 0
+        assert index._postings == {}
+
+    def test_matches_brute_force(self, bach):
+        ngram_index = NGramIndex()
+        ngram_index.add_line('bach_cello', bach)
+        melody = melody_from_notes(bach)
+        for start, size in [(0, 4), (100, 6), (321, 3), (500, 12)]:
+            motif = [Note(bach[index][0].name, bach[index][0].length, bach[index][0].dot)
+                     for _, _, index in melody[start:start + size]]
+            expected = [PatternMatch('bach_cello', melody[position][2])
+                        for position in range(len(melody) - size + 1)
+                        if [(p - melody[position][0]) for p, _, _ in melody[position:position + size]] ==
+                           [(p - melody[start][0]) for p, _, _ in melody[start:start + size]]]
+            assert ngram_index.search(motif, rhythm=False) == expected
@@ -0,0 +1,92 @@
+"""Tests of RheingoldGraph offline bulk loader."""
+
+import json
+
+import pytest
+
+from rheingoldgraph.elements import Note
+from rheingoldgraph.loader import write_lines_to_graphson, parts_to_graphson
+from rheingoldgraph.musicxml import get_parts_from_xml
+
+# Fixtures
+@pytest.fixture
+def note_list():
+    return [(Note('D3', 8, 0), False), (Note('F3', 8, 0), True), (Note('F3', 4, 0), False)]
+
+def read_graphson(filename):
+    with open(filename) as f:
+        vertices = [json.loads(row) for row in f]
+    return {v['id']['@value']: v for v in vertices}
+
+def edges(vertex, direction):
+    return [(label, e['id']['@value'], e[other]['@value'])
+            for label, edge_list in vertex.get(direction, {}).items()
+            for e in edge_list
+            for other in (['inV'] if direction == 'outE' else ['outV'])]
+
+
+# Tests
+class TestWriteLinesToGraphson:
+    def test_line_schema(self, tmp_path, note_list):
+        filename = str(tmp_path / 'line.json')
+        writer = write_lines_to_graphson([('tester', note_list)], filename)
+        vertices = read_graphson(filename)
+
+        assert writer.num_vertices == 4
+        # 1 start, 3 in_line, 2 next, 1 tie
+        assert writer.num_edges == 7
+
+        line = [v for v in vertices.values() if v['label'] == 'Line'][0]
+        assert line['properties']['name'][0]['value'] == 'tester'
+        assert line['properties']['note_count'][0]['value'] == {'@type': 'g:Int32', '@value': 3}
+        assert line['properties']['tie_count'][0]['value']['@value'] == 1
+        (_, _, first_id), = edges(line, 'outE')
+        assert len(edges(line, 'inE')) == 3
+
+        # Walk the line along next edges
+        names = []
+        ties = []
+        onsets = []
+        vertex = vertices[first_id]
+        while vertex is not None:
+            names.append(vertex['properties']['name'][0]['value'])
+            onsets.append(vertex['properties']['onset'][0]['value']['@value'])
+            out_edges = {label: in_id for label, _, in_id in edges(vertex, 'outE')}
+            ties.append('tie' in out_edges)
+            assert out_edges['in_line'] == line['id']['@value']
+            vertex = vertices.get(out_edges.get('next'))
+
+        assert names == ['D3', 'F3', 'F3']
+        assert ties == [False, True, False]
+        assert onsets == [0, 240, 480]
+
+    def test_out_edges_match_in_edges(self, tmp_path, note_list):
+        filename = str(tmp_path / 'lines.json')
+        write_lines_to_graphson([('a', note_list), ('b', note_list)], filename)
+        vertices = read_graphson(filename)
+
+        out_edges = {(label, e_id, v_id, in_id) for v_id, v in vertices.items()
+                     for label, e_id, in_id in edges(v, 'outE')}
+        in_edges = {(label, e_id, out_id, v_id) for v_id, v in vertices.items()
+                    for label, e_id, out_id in edges(v, 'inE')}
+        assert out_edges == in_edges
+        assert len(out_edges) == 14
+
+    def test_empty_line(self, tmp_path):
+        filename = str(tmp_path / 'empty.json')
+        writer = write_lines_to_graphson([('empty', [])], filename)
+        assert writer.num_vertices == 1
+        assert writer.num_edges == 0
+
+
+class TestPartsToGraphson:
+    def test_bach(self, tmp_path):
+        filename = str(tmp_path / 'bach.json')
+        parts = get_parts_from_xml('scores/BachCelloSuiteDminPrelude.xml')
+        writer = parts_to_graphson(parts, filename, 'bach_cello')
+
+        vertices = read_graphson(filename)
+        assert writer.num_vertices == len(vertices) == 644
+        names = [v['properties']['name'][0]['value'] for v in vertices.values()
+                 if v['label'] == 'Line']
+        assert names == ['bach_cello']
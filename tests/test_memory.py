@@ -0,0 +1,127 @@
+"""Tests of RheingoldGraph in-process graph."""
+
+import pytest
+
+from gremlin_python.process.graph_traversal import __
+from gremlin_python.process.traversal import Cardinality, P
+from gremlin_python.structure.graph import Graph, Vertex
+
+from rheingoldgraph.backend import MemoryBackend
+from rheingoldgraph.memory import MemoryGraph, MemoryRemoteConnection, UnsupportedStep
+
+# Fixtures
+@pytest.fixture
+def graph():
+    return MemoryGraph()
+
+@pytest.fixture
+def g(graph):
+    return Graph().traversal().withRemote(MemoryRemoteConnection(graph))
+
+@pytest.fixture
+def chain(g):
+    """A line of 5 notes, chained by 'next' edges, with a tie between the last two."""
+    line_id = g.addV('Line').property('name', 'tester').id().next()
+    ids = [g.addV('Note').property('index', i).id().next() for i in range(5)]
+    g.V(line_id).as_('l').V(ids[0]).addE('start').from_('l').iterate()
+    for a, b in zip(ids, ids[1:]):
+        g.V(a).as_('a').V(b).addE('next').from_('a').iterate()
+    for note_id in ids:
+        g.V(note_id).addE('in_line').to(__.V(line_id)).iterate()
+    g.V(ids[3]).as_('a').V(ids[4]).addE('tie').from_('a').iterate()
+    return line_id, ids
+
+
+# Tests
+class TestMemoryGraph:
+    def test_add_and_read_vertex(self, g):
+        vertex = g.addV('Line').property('name', 'tester').next()
+        assert isinstance(vertex, Vertex)
+        assert vertex.label == 'Line'
+        assert g.V(vertex.id).valueMap().next() == {'name': ['tester']}
+
+    def test_name_index_is_kept_up_to_date(self, g, graph):
+        vertex_id = g.addV('Line').property('name', 'tester').id().next()
+        assert graph.vertices(label='Line', key='name', value='tester')[0].id == vertex_id
+
+        g.V(vertex_id).property(Cardinality.single, 'name', 'renamed').iterate()
+        assert g.V().hasLabel('Line').has('name', 'tester').toList() == []
+        assert g.V().hasLabel('Line').has('name', 'renamed').id().toList() == [vertex_id]
+
+        g.V(vertex_id).drop().iterate()
+        assert g.V().hasLabel('Line').has('name', 'renamed').toList() == []
+
+    def test_add_if_absent(self, g):
+        def add(name):
+            return g.V().hasLabel('Line').has('name', name).fold() \
+                    .coalesce(__.unfold().project('created').by(__.constant(False)),
+                              __.addV('Line').property('name', name)
+                              .project('created').by(__.constant(True))).next()
+
+        assert add('tester') == {'created': True}
+        assert add('tester') == {'created': False}
+        assert g.V().count().next() == 1
+
+    def test_emit_repeat_times_walks_in_order(self, g, chain):
+        line_id, ids = chain
+        rows = g.V(line_id).out('start').emit().repeat(__.out('next')).times(2) \
+                .project('index', 'tied').by('index').by(__.outE('tie').count()).toList()
+        assert rows == [{'index': 0, 'tied': 0}, {'index': 1, 'tied': 0}, {'index': 2, 'tied': 0}]
+
+        assert g.V(ids[3]).emit().repeat(__.out('next')).times(4).values('index').toList() == [3, 4]
+        assert g.V(ids[0]).repeat(__.out('next')).times(3).values('index').toList() == [3]
+
+    def test_until_repeat(self, g, chain):
+        line_id, ids = chain
+        first = g.V(line_id).out('start')
+        # until() before repeat() is checked before every loop, after it, after every loop
+        assert first.until(__.has('index', P.gte(0))).repeat(__.out('next')) \
+                    .values('index').toList() == [0]
+        first = g.V(line_id).out('start')
+        assert first.repeat(__.out('next')).until(__.has('index', P.gte(0))) \
+                    .values('index').toList() == [1]
+        first = g.V(line_id).out('start')
+        assert first.until(__.has('index', P.gte(2))).repeat(__.out('next')) \
+                    .until(__.has('index', P.gte(4))).repeat(__.out('next')) \
+                    .values('index').toList() == [4]
+        assert g.V(ids[0]).until(__.has('index', 10)).repeat(__.out('next')).toList() == []
+
+    def test_predicates(self, g, chain):
+        line_id, ids = chain
+        notes = g.V(line_id).in_('in_line')
+        assert sorted(notes.has('index', P.within([0, 2, 4])).values('index').toList()) == [0, 2, 4]
+        first = g.V(line_id).in_('in_line').has('index', P.gte(2)) \
+                 .not_(__.in_('next').has('index', P.gte(2))).values('index').toList()
+        assert first == [2]
+
+    def test_group_count(self, g, chain):
+        summary = g.V().hasLabel('Line').group().by('name').by(__.inE('in_line').count()).next()
+        assert summary == {'tester': 5}
+
+    def test_drop_removes_edges_and_properties(self, g, chain):
+        line_id, ids = chain
+        g.V(*ids[:2]).drop().iterate()
+        assert g.V(line_id).out('start').toList() == []
+        assert g.V(line_id).in_('in_line').count().next() == 3
+        assert g.E().count().next() == 3 + 2 + 1
+
+        g.V(line_id).properties('name').drop().iterate()
+        assert g.V(line_id).valueMap().next() == {}
+
+    def test_unsupported_step(self, g):
+        with pytest.raises(UnsupportedStep):
+            g.V().order().toList()
+
+
+class TestMemoryBackend:
+    def test_connections_share_the_graph(self):
+        backend = MemoryBackend()
+        g1 = Graph().traversal().withRemote(backend.connect())
+        g2 = Graph().traversal().withRemote(backend.connect())
+        g1.addV('Line').property('name', 'tester').iterate()
+        assert g2.V().hasLabel('Line').values('name').toList() == ['tester']
+
+    def test_submit_async(self):
+        connection = MemoryBackend().connect()
+        g = Graph().traversal().withRemote(connection)
+        assert g.V().count().promise(lambda t: t.next()).result() == 0
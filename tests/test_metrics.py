@@ -0,0 +1,129 @@
+"""Tests of RheingoldGraph traversal metrics."""
+
+import pytest
+
+from gremlin_python.driver.remote_connection import RemoteTraversal, RemoteTraversalSideEffects
+from gremlin_python.process.traversal import Traverser
+from gremlin_python.structure.graph import Graph
+
+from rheingoldgraph.metrics import (TraversalMetrics, TraversalRecord, InstrumentedConnection,
+                                    CallSiteStats)
+from rheingoldgraph.pool import ConnectionPool
+from rheingoldgraph.session import Session, LineDoesNotExist
+
+# Fixtures
+class FakeConnection:
+    """Remote connection that answers every traversal with the same results."""
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.submitted = []
+        self.closed = False
+
+    def submit(self, bytecode):
+        self.submitted.append(bytecode)
+        return RemoteTraversal(iter([Traverser(r) for r in self.results]),
+                               RemoteTraversalSideEffects(None, None))
+
+    def close(self):
+        self.closed = True
+
+
+def issue_traversal(g):
+    return g.V(1).out('next').toList()
+
+
+@pytest.fixture
+def metrics():
+    return TraversalMetrics()
+
+
+# Tests
+class TestTraversalMetrics:
+    def test_summary_percentiles(self, metrics):
+        for i in range(1, 101):
+            metrics.record(TraversalRecord('find_line', i / 1000, 1, 10))
+
+        stats = metrics.summary()['find_line']
+        assert isinstance(stats, CallSiteStats)
+        assert stats.count == 100
+        assert stats.p50 == pytest.approx(0.05)
+        assert stats.p95 == pytest.approx(0.095)
+        assert stats.p99 == pytest.approx(0.099)
+        assert stats.max == pytest.approx(0.1)
+        assert stats.mean == pytest.approx(0.0505)
+        assert stats.rows == 100
+        assert stats.payload_bytes == 1000
+
+    def test_samples_are_bounded(self):
+        metrics = TraversalMetrics(max_samples=10)
+        for i in range(100):
+            metrics.record(TraversalRecord('seek', float(i), 0, 0))
+
+        stats = metrics.summary()['seek']
+        assert stats.count == 100
+        assert stats.p50 == 94.0
+        assert stats.max == 99.0
+
+    def test_hook_and_reset(self):
+        records = []
+        metrics = TraversalMetrics(hook=records.append)
+        record = TraversalRecord('drop_line', 0.01, 0, 5)
+        metrics.record(record)
+        assert records == [record]
+
+        metrics.reset()
+        assert metrics.summary() == {}
+
+
+class TestInstrumentedConnection:
+    def test_records_call_site_rows_and_payload(self, metrics):
+        connection = InstrumentedConnection(FakeConnection(['a', 'b', 'c']), metrics, [__file__])
+        g = Graph().traversal().withRemote(connection)
+
+        assert issue_traversal(g) == ['a', 'b', 'c']
+
+        summary = metrics.summary()
+        assert list(summary) == ['test_records_call_site_rows_and_payload/issue_traversal']
+        stats = summary['test_records_call_site_rows_and_payload/issue_traversal']
+        assert stats.count == 1
+        assert stats.rows == 3
+        assert stats.payload_bytes > 0
+
+    def test_delegates_to_connection(self, metrics):
+        inner = FakeConnection()
+        connection = InstrumentedConnection(inner, metrics, [])
+        connection.close()
+        assert inner.closed
+
+
+class TestSessionMetrics:
+    def test_disabled_by_default(self):
+        inner = FakeConnection()
+        pool = ConnectionPool(connection_factory=lambda uri: inner)
+        session = Session(pool=pool)
+
+        assert session.find_line('bach_cello') is None
+        assert len(inner.submitted) == 1
+        assert session.metrics() is None
+        session.close()
+
+    def test_session_call_sites(self):
+        records = []
+        pool = ConnectionPool(connection_factory=lambda uri: FakeConnection())
+        session = Session(pool=pool, metrics_hook=records.append)
+
+        assert session.find_line('bach_cello') is None
+        with pytest.raises(LineDoesNotExist):
+            list(session.get_playable_line('bach_cello', 80))
+
+        summary = session.metrics()
+        assert summary['find_line'].count == 1
+        assert summary['get_playable_line/find_line'].count == 1
+        assert len(records) == 2
+
+        session.reset_metrics()
+        assert session.metrics() == {}
+
+        # The pooled connection, not the wrapper, goes back to the pool
+        session.close()
+        assert type(pool.acquire(timeout=0)) is FakeConnection
@@ -0,0 +1,171 @@
+"""Tests of RheingoldGraph MIDI scheduling."""
+
+import time
+
+import pytest
+from magenta.protobuf import music_pb2
+from mido import Message
+
+from rheingoldgraph.midi import MIDIScheduler, MIDIEngine, merge_note_streams
+
+# Fixtures
+class FakePort:
+    """Output port that records messages with the time they were sent."""
+    def __init__(self):
+        self.start = time.monotonic()
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append((time.monotonic() - self.start, message))
+
+
+@pytest.fixture
+def port():
+    return FakePort()
+
+def pb_note(pitch, start_time, end_time):
+    return music_pb2.NoteSequence.Note(pitch=pitch, velocity=100,
+                                       start_time=start_time, end_time=end_time)
+
+
+# Tests
+class TestMIDIScheduler:
+    def test_polyphony(self, port):
+        with MIDIScheduler(port) as scheduler:
+            scheduler.schedule_note(50, 100, 0, 0.06)
+            scheduler.schedule_note(53, 100, 0.02, 0.04)
+            scheduler.schedule_note(57, 100, 0.03, 0.05)
+
+        assert [(m.type, m.note) for _, m in port.sent] == [
+            ('note_on', 50), ('note_on', 53), ('note_on', 57),
+            ('note_off', 53), ('note_off', 57), ('note_off', 50)]
+
+    def test_note_off_before_note_on_at_same_time(self, port):
+        with MIDIScheduler(port) as scheduler:
+            scheduler.schedule_note(50, 100, 0, 0.02)
+            scheduler.schedule_note(50, 100, 0.02, 0.04)
+
+        assert [m.type for _, m in port.sent] == ['note_on', 'note_off', 'note_on', 'note_off']
+
+    def test_absolute_deadlines(self, port):
+        # 50 notes of 4 ms, so sleeping per note would drift
+        with MIDIScheduler(port, lookahead=0.05) as scheduler:
+            for i in range(50):
+                scheduler.schedule_note(60, 100, i * 0.004, (i + 1) * 0.004)
+
+        last_sent, last = port.sent[-1]
+        assert last.type == 'note_off'
+        assert last_sent == pytest.approx(0.2, abs=0.05)
+
+        jitter = scheduler.jitter()
+        assert jitter.count == 100
+        assert 0 <= jitter.mean <= jitter.p99 <= jitter.max
+
+    def test_lookahead_blocks_producer(self, port):
+        scheduler = MIDIScheduler(port, lookahead=0.01)
+        scheduler.start()
+        scheduler.schedule(0.05, Message('note_on', note=60))
+        # The producer is held back until playback is within lookahead of the message
+        assert scheduler.elapsed() >= 0.04
+        scheduler.finish()
+
+    def test_long_note_does_not_block_producer(self, port):
+        with MIDIScheduler(port, lookahead=0.01) as scheduler:
+            scheduler.schedule_note(50, 100, 0, 0.1)
+            scheduler.schedule_note(53, 100, 0.02, 0.03)
+
+        assert [(m.type, m.note) for _, m in port.sent] == [
+            ('note_on', 50), ('note_on', 53), ('note_off', 53), ('note_off', 50)]
+        assert port.sent[1][0] < 0.06
+
+    def test_stop_silences_sounding_notes(self, port):
+        scheduler = MIDIScheduler(port)
+        scheduler.start()
+        scheduler.schedule_note(50, 100, 0, 10)
+        time.sleep(0.02)
+        scheduler.stop()
+
+        assert [(m.type, m.note) for _, m in port.sent] == [('note_on', 50), ('note_off', 50)]
+
+    def test_cannot_start_twice(self, port):
+        scheduler = MIDIScheduler(port)
+        scheduler.start()
+        with pytest.raises(RuntimeError):
+            scheduler.start()
+        scheduler.finish()
+
+    def test_jitter_memory_is_bounded(self, port):
+        scheduler = MIDIScheduler(port, jitter_samples=10)
+        for lateness in [0.5] + [0.001] * 99:
+            scheduler._record_lateness(lateness)
+
+        assert len(scheduler._lateness) == 10
+        assert scheduler.jitter() == (100, pytest.approx(0.5 / 100 + 0.001 * 0.99), 0.5, 0.001)
+
+    def test_no_messages(self, port):
+        with MIDIScheduler(port) as scheduler:
+            pass
+        assert scheduler.jitter() == (0, 0, 0, 0)
+
+
+class TestMIDIEngine:
+    def test_play_starts_with_first_note(self, port):
+        notes = [pb_note(50, 60, 60.02), pb_note(53, 60.01, 60.03)]
+        jitter = MIDIEngine._play_on_port(port, ((0, n) for n in notes))
+
+        assert jitter.count == 4
+        assert port.sent[-1][0] < 1
+        assert [m.type for _, m in port.sent] == ['note_on', 'note_on', 'note_off', 'note_off']
+
+
+    def test_first_fetch_is_not_charged_to_playback(self, port):
+        # A fake clock that a slow first fetch moves half a second on
+        skew = [0]
+        def clock():
+            return time.monotonic() + skew[0]
+
+        def notes():
+            skew[0] += 0.5
+            for i, pitch in enumerate((60, 61, 62)):
+                yield 0, pb_note(pitch, i * 0.01, (i + 1) * 0.01)
+
+        jitter = MIDIEngine._play_on_port(port, notes(), clock=clock)
+
+        assert jitter.count == 6
+        assert jitter.max < 0.1
+        assert [(m.type, m.note) for _, m in port.sent] == [
+            ('note_on', 60), ('note_off', 60), ('note_on', 61),
+            ('note_off', 61), ('note_on', 62), ('note_off', 62)]
+
+
+    def test_stream_error_stops_scheduler(self, port):
+        def notes():
+            yield 0, pb_note(50, 0, 0.01)
+            raise ConnectionError
+
+        with pytest.raises(ConnectionError):
+            MIDIEngine._play_on_port(port, notes())
+
+
+class TestMergeNoteStreams:
+    def test_merge_in_start_time_order(self):
+        violin = [pb_note(74, 0, 0.5), pb_note(76, 0.5, 1)]
+        cello = [pb_note(50, 0, 1), pb_note(53, 1, 2)]
+        events = list(merge_note_streams([violin, cello]))
+        assert [(channel, n.pitch) for channel, n in events] == [(0, 74), (1, 50), (0, 76), (1, 53)]
+
+    def test_streams_are_read_lazily(self):
+        consumed = []
+        def stream(pitch):
+            for i in range(1000):
+                consumed.append(pitch)
+                yield pb_note(pitch, i, i + 1)
+
+        events = merge_note_streams([stream(50), stream(62)])
+        assert [n.pitch for _, n in (next(events), next(events))] == [50, 62]
+        assert len(consumed) <= 4
+
+    def test_percussion_channel_is_skipped(self):
+        streams = [[pb_note(60, i, i + 1)] for i in range(11)]
+        channels = [channel for channel, _ in merge_note_streams(streams)]
+        assert channels == [0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 11]
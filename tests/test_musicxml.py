@@ -0,0 +1,111 @@
+"""Tests of RheingoldGraph MusicXML parsing."""
+
+import pytest
+
+from rheingoldgraph.elements import Note
+from rheingoldgraph.musicxml import (XMLNote, get_parts_from_xml,
+                                     stream_parts_from_xml, iter_xml_notes)
+
+SCORE = """<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="3.0">
+  <part-list>
+    <score-part id="P1"><part-name>Violin</part-name></score-part>
+    <score-part id="P2"><part-name>Cello</part-name></score-part>
+  </part-list>
+  <part id="P1">
+    <measure number="1">
+      <attributes><divisions>2</divisions></attributes>
+      <note><pitch><step>D</step><octave>5</octave></pitch><type>quarter</type>
+        <tie type="start"/></note>
+      <note><pitch><step>D</step><octave>5</octave></pitch><type>eighth</type></note>
+      <note><rest/><type>eighth</type></note>
+    </measure>
+    <measure number="2">
+      <note><pitch><step>B</step><alter>-1</alter><octave>4</octave></pitch>
+        <type>half</type><dot/></note>
+    </measure>
+  </part>
+  <part id="P2">
+    <measure number="1">
+      <attributes><divisions>2</divisions></attributes>
+      <note><pitch><step>F</step><alter>1</alter><octave>2</octave></pitch>
+        <type>whole</type></note>
+    </measure>
+  </part>
+</score-partwise>
+"""
+
+# Fixtures
+@pytest.fixture
+def score_file(tmp_path):
+    filename = tmp_path / 'score.xml'
+    filename.write_text(SCORE)
+    return str(filename)
+
+@pytest.fixture
+def expected_notes():
+    return {'P1': [XMLNote(Note('D5', 4, 0), True),
+                   XMLNote(Note('D5', 8, 0), False),
+                   XMLNote(Note('R', 8, 0), False),
+                   XMLNote(Note('Bb4', 2, 1), False)],
+            'P2': [XMLNote(Note('F#2', 1, 0), False)]}
+
+
+# Tests
+class TestGetPartsFromXml:
+    def test_parts(self, score_file, expected_notes):
+        parts = get_parts_from_xml(score_file)
+        assert [(p.id, p.name) for p in parts] == [('P1', 'Violin'), ('P2', 'Cello')]
+        assert {p.id: list(p.notes) for p in parts} == expected_notes
+
+
+class TestStreamPartsFromXml:
+    def test_parts(self, score_file):
+        parts = stream_parts_from_xml(score_file)
+        assert [(p.id, p.name) for p in parts] == [('P1', 'Violin'), ('P2', 'Cello')]
+
+    def test_notes_in_document_order(self, score_file, expected_notes):
+        parts = stream_parts_from_xml(score_file)
+        assert {p.id: list(p.notes) for p in parts} == expected_notes
+
+    def test_skipped_part_is_drained(self, score_file, expected_notes):
+        parts = stream_parts_from_xml(score_file)
+        assert list(parts[1].notes) == expected_notes['P2']
+
+    def test_parts_out_of_part_list_order(self, tmp_path, expected_notes):
+        # The cello part comes first in the file, but second in the part-list
+        p1_start, p2_start = SCORE.index('  <part id="P1">'), SCORE.index('  <part id="P2">')
+        end = SCORE.index('</score-partwise>')
+        filename = tmp_path / 'swapped.xml'
+        filename.write_text(SCORE[:p1_start] + SCORE[p2_start:end] +
+                            SCORE[p1_start:p2_start] + SCORE[end:])
+
+        parts = stream_parts_from_xml(str(filename))
+        assert [p.id for p in parts] == ['P1', 'P2']
+        assert {p.id: list(p.notes) for p in parts} == expected_notes
+
+    def test_matches_dom_parser(self):
+        filename = 'scores/BachCelloSuiteDminPrelude.xml'
+        dom = [list(p.notes) for p in get_parts_from_xml(filename)]
+        streamed = [list(p.notes) for p in stream_parts_from_xml(filename)]
+        assert streamed == dom
+
+
+class TestIterXmlNotes:
+    def test_single_pass_over_all_parts(self, score_file, expected_notes):
+        expected = [(part_id, note) for part_id in ('P1', 'P2')
+                    for note in expected_notes[part_id]]
+        assert list(iter_xml_notes(score_file)) == expected
+
+
+class TestMeasureNumbers:
+    def test_notes_carry_measure(self, score_file):
+        parts = get_parts_from_xml(score_file)
+        assert [n.note.measure for n in parts[0].notes] == [1, 1, 1, 2]
+
+    def test_streamed_notes_carry_measure(self):
+        filename = 'scores/BachCelloSuiteDminPrelude.xml'
+        dom = [n.note.measure for n in get_parts_from_xml(filename)[0].notes]
+        streamed = [n.note.measure for n in stream_parts_from_xml(filename)[0].notes]
+        assert streamed == dom
+        assert dom[0] == 1 and dom[-1] == 63
@@ -0,0 +1,48 @@
+"""Tests of RheingoldGraph pitch spelling."""
+
+import pretty_midi
+import pytest
+
+from rheingoldgraph.pitch import (NAME_TO_NUMBER, NUMBER_TO_NAME,
+                                  note_name_to_number, note_number_to_name)
+
+# Tests
+class TestNoteNameToNumber:
+    @pytest.mark.parametrize('name, number', [
+        ('C4', 60), ('C-1', 0), ('G9', 127), ('D3', 50),
+        ('Bb3', 58), ('A#3', 58), ('B#3', 60), ('Cb4', 59),
+        ('E#4', 65), ('Fb4', 64), ('F##4', 67), ('Dbb4', 60)])
+    def test_names(self, name, number):
+        assert note_name_to_number(name) == number
+
+    def test_matches_pretty_midi(self):
+        # pretty_midi does not spell double sharps or flats
+        for name, number in NAME_TO_NUMBER.items():
+            if '##' in name or 'bb' in name:
+                continue
+            assert pretty_midi.note_name_to_number(name) == number
+
+    @pytest.mark.parametrize('name', ['R', 'H4', 'C', 'G#9', 'Cb-1', ''])
+    def test_unknown_name(self, name):
+        with pytest.raises(ValueError):
+            note_name_to_number(name)
+
+    def test_table_is_immutable(self):
+        with pytest.raises(TypeError):
+            NAME_TO_NUMBER['C4'] = 61
+
+
+class TestNoteNumberToName:
+    def test_matches_pretty_midi(self):
+        assert len(NUMBER_TO_NAME) == 128
+        for number in range(128):
+            assert note_number_to_name(number) == pretty_midi.note_number_to_name(number)
+
+    def test_round_trip(self):
+        for number in range(128):
+            assert note_name_to_number(note_number_to_name(number)) == number
+
+    @pytest.mark.parametrize('number', [-1, 128])
+    def test_out_of_range(self, number):
+        with pytest.raises(ValueError):
+            note_number_to_name(number)
@@ -0,0 +1,150 @@
+"""Tests of RheingoldGraph connection pool."""
+
+import threading
+import time
+
+import pytest
+
+from rheingoldgraph.backend import MemoryBackend
+from rheingoldgraph.pool import ConnectionPool, PoolExhausted, PoolClosed
+from rheingoldgraph.session import Session
+
+class FakeConnection:
+    def __init__(self, server_uri):
+        self.server_uri = server_uri
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+# Fixtures
+@pytest.fixture
+def pool():
+    return ConnectionPool('ws://localhost:8189/gremlin', maxsize=2,
+                          connection_factory=FakeConnection)
+
+
+# Tests
+class TestConnectionPool:
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            ConnectionPool(maxsize=0, connection_factory=FakeConnection)
+
+    def test_opens_lazily(self, pool):
+        assert pool.num_open == 0
+        conn = pool.acquire()
+        assert conn.server_uri == 'ws://localhost:8189/gremlin'
+        assert pool.num_open == 1
+
+    def test_reuses_released_connection(self, pool):
+        conn = pool.acquire()
+        pool.release(conn)
+        assert pool.acquire() is conn
+        assert pool.num_open == 1
+
+    def test_bounded(self, pool):
+        pool.acquire()
+        pool.acquire()
+        with pytest.raises(PoolExhausted):
+            pool.acquire(timeout=0.01)
+        assert pool.num_open == 2
+
+    def test_waits_for_release(self, pool):
+        first = pool.acquire()
+        pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [first])
+        timer.start()
+        assert pool.acquire(timeout=5) is first
+        timer.join()
+
+    def test_context_manager_releases(self, pool):
+        with pool.connection() as conn:
+            assert pool.num_idle == 0
+        assert pool.num_idle == 1
+        assert not conn.closed
+
+    def test_close(self, pool):
+        idle = pool.acquire()
+        borrowed = pool.acquire()
+        pool.release(idle)
+        pool.close()
+
+        assert idle.closed
+        assert not borrowed.closed
+        pool.release(borrowed)
+        assert borrowed.closed
+        assert pool.num_open == 0
+
+        with pytest.raises(PoolClosed):
+            pool.acquire()
+
+    def test_threads_share_pool(self, pool):
+        borrowed = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(50):
+                with pool.connection() as conn:
+                    with lock:
+                        borrowed.append(conn)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(borrowed) == 400
+        assert len(set(map(id, borrowed))) <= 2
+        assert pool.num_open <= 2
+
+    def test_failed_open_wakes_waiter(self):
+        attempts = []
+
+        def factory(server_uri):
+            attempts.append(server_uri)
+            if len(attempts) == 2:
+                time.sleep(0.05)
+                raise ConnectionError
+            return FakeConnection(server_uri)
+
+        pool = ConnectionPool(maxsize=1, connection_factory=factory)
+        first = pool.acquire()
+        pool.discard(first)
+
+        # The second open fails, and its slot goes to the waiting thread
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(pool.acquire(timeout=5)))
+        with pytest.raises(ConnectionError):
+            threading.Timer(0.01, waiter.start).start()
+            pool.acquire()
+        waiter.join()
+
+        assert len(attempts) == 3
+        assert results[0].server_uri == pool.server_uri
+        assert pool.num_open == 1
+
+    def test_discard(self, pool):
+        conn = pool.acquire()
+        pool.acquire()
+        pool.discard(conn)
+        assert conn.closed
+        assert pool.num_open == 1
+        assert pool.acquire(timeout=0.01) is not conn
+        assert pool.num_open == 2
+
+    def test_close_wakes_waiters(self, pool):
+        pool.acquire()
+        pool.acquire()
+        threading.Timer(0.05, pool.close).start()
+        with pytest.raises(PoolClosed):
+            pool.acquire(timeout=5)
+
+    def test_backend_connections(self):
+        backend = MemoryBackend()
+        with ConnectionPool(maxsize=1, backend=backend) as pool:
+            with Session(pool=pool) as session:
+                assert session.backend is backend
+                session._add_line('tester')
+            assert pool.num_idle == 1
+            assert Session(backend=backend).find_line('tester') is not None
@@ -0,0 +1,91 @@
+"""Tests of RheingoldGraph background prefetch."""
+
+import threading
+import time
+
+import pytest
+
+from rheingoldgraph.prefetch import PrefetchBuffer
+
+# Fixtures
+def slow_stream(num_items, delay, stall_at=None, stall=0):
+    for i in range(num_items):
+        time.sleep(stall if i == stall_at else delay)
+        yield i
+
+
+# Tests
+class TestPrefetchBuffer:
+    def test_items_in_order(self):
+        with PrefetchBuffer(range(1000), high_watermark=16, low_watermark=4) as buffer:
+            assert list(buffer) == list(range(1000))
+
+        stats = buffer.stats()
+        assert stats.produced == stats.consumed == 1000
+        assert stats.refills > 0
+
+    def test_invalid_watermarks(self):
+        with pytest.raises(ValueError):
+            PrefetchBuffer([], high_watermark=4, low_watermark=4)
+
+    def test_buffer_is_bounded(self):
+        buffer = PrefetchBuffer(range(1000), high_watermark=10, low_watermark=2)
+        time.sleep(0.05)
+        assert len(buffer) == 10
+        assert next(buffer) == 0
+        buffer.close()
+
+    def test_reads_ahead_of_consumer(self):
+        buffer = PrefetchBuffer(slow_stream(20, 0.001), high_watermark=32, low_watermark=8)
+        time.sleep(0.2)
+        start = time.monotonic()
+        assert list(buffer) == list(range(20))
+        assert time.monotonic() - start < 0.01
+        assert buffer.underruns == 0
+
+    def test_underruns_are_counted(self):
+        buffer = PrefetchBuffer(slow_stream(5, 0, stall_at=3, stall=0.05),
+                                high_watermark=32, low_watermark=8)
+        items = []
+        for item in buffer:
+            items.append(item)
+            time.sleep(0.01)
+        assert items == list(range(5))
+        assert buffer.underruns == 1
+
+    def test_errors_reach_consumer(self):
+        def failing():
+            yield 1
+            raise ConnectionError
+
+        buffer = PrefetchBuffer(failing())
+        assert next(buffer) == 1
+        with pytest.raises(ConnectionError):
+            next(buffer)
+
+    def test_wait_ready(self):
+        with PrefetchBuffer(slow_stream(3, 0.05)) as buffer:
+            assert not buffer.wait_ready(timeout=0.001)
+            assert buffer.wait_ready()
+            assert len(buffer) >= 1
+            assert buffer.consumed == 0
+
+        with PrefetchBuffer([]) as buffer:
+            assert buffer.wait_ready()
+
+    def test_close_stops_producer(self):
+        closed = threading.Event()
+        def endless():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                closed.set()
+
+        buffer = PrefetchBuffer(endless(), high_watermark=8, low_watermark=2)
+        assert next(buffer) == 0
+        buffer.close()
+        assert closed.wait(1)
+        assert list(buffer) == []
@@ -0,0 +1,91 @@
+"""Tests of RheingoldGraph quantization."""
+
+import numpy as np
+import pytest
+
+from magenta.protobuf import music_pb2
+
+from rheingoldgraph.elements import Note
+from rheingoldgraph.quantize import (REST_PITCH, quantize_durations,
+                                     sequence_proto_to_arrays, notes_from_sequence_proto)
+
+# Fixtures
+@pytest.fixture
+def sequence():
+    """At 120 qpm, a quarter note lasts 0.5 sec"""
+    sequence = music_pb2.NoteSequence()
+    sequence.tempos.add(qpm=120)
+    sequence.notes.add(pitch=50, velocity=100, start_time=0.5, end_time=1.25)
+    sequence.notes.add(pitch=53, velocity=100, start_time=1.5, end_time=6.5)
+    return sequence
+
+
+# Tests
+class TestQuantizeDurations:
+    @pytest.mark.parametrize('whole_fraction, expected', [
+        (1/16, [(16, 0)]),
+        (1/4, [(4, 0)]),
+        (3/8, [(4, 1)]),
+        (7/16, [(4, 2)]),
+        (13/16, [(2, 1), (16, 0)]),
+        (1, [(1, 0)]),
+        (3/2, [(1, 1)]),
+        (5/2, [(1, 0), (1, 1)]),
+    ])
+    def test_single_note(self, whole_fraction, expected):
+        pitches, lengths, dots, tied = quantize_durations([60], [whole_fraction])
+        assert list(zip(lengths.tolist(), dots.tolist())) == expected
+        assert pitches.tolist() == [60] * len(expected)
+        assert tied.tolist() == [True] * (len(expected) - 1) + [False]
+
+    def test_rests_are_not_tied(self):
+        _, _, _, tied = quantize_durations([REST_PITCH], [13/16])
+        assert tied.tolist() == [False, False]
+
+    def test_empty_durations_are_dropped(self):
+        pitches, lengths, _, _ = quantize_durations([REST_PITCH, 60], [0.01, 1/4])
+        assert pitches.tolist() == [60]
+        assert lengths.tolist() == [4]
+
+    def test_rounding_does_not_build_up(self):
+        # 12 triplet eighths, each 1.33 sixteenths, fill a whole note
+        pitches, lengths, dots, _ = quantize_durations([60] * 12, [1/12] * 12)
+        assert np.sum((2 - 0.5 ** dots) / lengths) == pytest.approx(1)
+        assert set(pitches.tolist()) == {60}
+
+    def test_off_grid_sequence_keeps_its_length(self):
+        sequence = music_pb2.NoteSequence()
+        sequence.tempos.add(qpm=120)
+        for i in range(12):
+            sequence.notes.add(pitch=60, start_time=i / 3, end_time=(i + 1) / 3)
+        notes = list(notes_from_sequence_proto(sequence))
+        assert sum(n.ticks() for n, _ in notes) == 2 * Note('C4', 1, 0).ticks()
+
+
+class TestSequenceProtoToArrays:
+    def test_rests_between_notes(self, sequence):
+        pitches, durations = sequence_proto_to_arrays(sequence)
+        assert pitches.tolist() == [REST_PITCH, 50, REST_PITCH, 53]
+        np.testing.assert_allclose(durations, [1/4, 3/8, 1/8, 5/2])
+
+    def test_overlapping_notes_are_cut(self):
+        sequence = music_pb2.NoteSequence()
+        sequence.tempos.add(qpm=120)
+        sequence.notes.add(pitch=53, start_time=0.5, end_time=1.0)
+        sequence.notes.add(pitch=50, start_time=0.0, end_time=1.0)
+        pitches, durations = sequence_proto_to_arrays(sequence)
+        assert pitches.tolist() == [REST_PITCH, 50, REST_PITCH, 53]
+        np.testing.assert_allclose(durations, [0, 1/4, 0, 1/4])
+
+
+class TestNotesFromSequenceProto:
+    def test_notes(self, sequence):
+        assert list(notes_from_sequence_proto(sequence)) == [
+            (Note('R', 4, 0), False),
+            (Note('D3', 4, 1), False),
+            (Note('R', 8, 0), False),
+            (Note('F3', 1, 0), True),
+            (Note('F3', 1, 1), False)]
+
+    def test_empty_sequence(self):
+        assert list(notes_from_sequence_proto(music_pb2.NoteSequence())) == []
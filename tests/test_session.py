@@ -1,19 +1,25 @@
 """Tests of RheingoldGraph session."""
 
+import time
+
 import pytest
 
 from gremlin_python.structure.graph import Vertex, VertexProperty
 
-from rheingoldgraph.elements import Line, Note
-from rheingoldgraph.session import Session
-
-# TODO(ryan): Launch and query a standalone test TinkerGraph instance
+from rheingoldgraph.backend import MemoryBackend
+from rheingoldgraph.elements import Line, Note, timed_notes
+from rheingoldgraph.index import NGramIndex, PatternMatch
+from rheingoldgraph.stats import LineStatistics
+from rheingoldgraph.session import (Session, PlayableNoteBuilder, LineExists, LineDoesNotExist,
+                                    LineIngestError, SKIP_SPANS)
 
 # Fixtures
 @pytest.fixture
 def session():
-    server_uri = 'ws://localhost:8189/gremlin'
-    return Session(server_uri)
+    # An in-process graph holding the Bach prelude, so no Gremlin Server is needed
+    session = Session(backend=MemoryBackend())
+    session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml', 'bach_cello')
+    return session
 
 @pytest.fixture
 def traversal_line_result():
@@ -205,6 +211,390 @@ class TestAddDropLine:
         session.drop_line(line_name)    
         assert session.find_line(line_name) is None
 
+class TestAddNotes:
+    @pytest.fixture
+    def tied_notes(self):
+        return [(Note('D3', 4, 0), True), (Note('D3', 8, 0), False), (Note('R', 4, 0), False),
+                (Note('F3', 4, 1), True), (Note('F3', 4, 0), False)]
+
+    @pytest.mark.parametrize('batch_size', [1, 2, 100])
+    def test_notes_and_ties_across_batches(self, session, tied_notes, batch_size):
+        assert session._add_part('tester', tied_notes, batch_size) == 5
+        notes = list(session._iter_line_notes('tester'))
+        line = session.find_line('tester')
+
+        assert notes == tied_notes
+        assert [note.index for note, _ in notes] == [0, 1, 2, 3, 4]
+        assert [note.onset for note, _ in notes] == [0, 480, 720, 1200, 1920]
+        assert session.g.V(line.id).in_('in_line').outE('tie').count().next() == 2
+
+    def test_backfill_line_timing(self, session):
+        before = list(session.get_line_and_notes('bach_cello'))
+        line = session.find_line('bach_cello')
+        session.g.V(line.id).in_('in_line').properties('index', 'onset', 'duration').drop().iterate()
+        assert next(session.get_line_and_notes('bach_cello')).onset is None
+
+        assert session.backfill_line_timing('bach_cello', batch_size=50) == 643
+        after = list(session.get_line_and_notes('bach_cello'))
+        assert [(n.index, n.onset, n.duration) for n in after] == \
+               [(n.index, n.onset, n.duration) for n in before]
+
+
+class TestPlayableNoteBuilder:
+    @staticmethod
+    def play(notes):
+        builder = PlayableNoteBuilder(120)
+        return [(n.pitch, n.start_time, n.end_time)
+                for n in (builder.add(note, tied) for note, tied in notes) if n is not None]
+
+    def test_merges_ties_and_skips_rests(self):
+        notes = [(Note('D3', 4, 0), True), (Note('D3', 8, 0), False),
+                 (Note('R', 4, 0), False), (Note('F3', 4, 1), False)]
+        assert self.play(notes) == [(50, 0, 0.75), (53, 1.25, 2)]
+
+    def test_stored_timing_places_notes(self):
+        notes = list(timed_notes([(Note('D3', 4, 0), False), (Note('R', 4, 0), False),
+                                  (Note('F3', 8, 0), True), (Note('F3', 8, 0), False)],
+                                 start_onset=4800))
+        # Starting part way through a line keeps each note's place in time
+        assert self.play(notes[2:]) == [(53, 6, 6.5)]
+        assert self.play(notes) == [(50, 5, 5.5), (53, 6, 6.5)]
+
+
+class TestLineRange:
+    @pytest.fixture
+    def line_session(self, session):
+        notes = [Note('D3', 4, 0), Note('R', 4, 0), Note('F3', 8, 0), Note('F3', 8, 0),
+                 Note('A3', 2, 0)]
+        for note, measure in zip(notes, [1, 1, 1, 1, 2]):
+            note.measure = measure
+        session._add_part('tester', zip(notes, [False, False, True, False, False]))
+        return session
+
+    def test_range_bounds(self):
+        assert Session._range_bounds(960, 1920, 'ticks') == ('onset', 960, 1920)
+        assert Session._range_bounds(1, 2, 'seconds', bpm=120) == ('onset', 960, 1920)
+        assert Session._range_bounds(200, 210, 'measures') == ('measure', 200, 211)
+        assert Session._range_bounds(200, None, 'measures') == ('measure', 200, None)
+
+    def test_range_bounds_errors(self):
+        with pytest.raises(ValueError):
+            Session._range_bounds(1, 2, 'seconds')
+        with pytest.raises(ValueError):
+            Session._range_bounds(1, 2, 'beats')
+
+    @pytest.mark.parametrize('skip_spans', [None, SKIP_SPANS, (4, 16, 64)])
+    def test_range_from_the_middle_of_a_line(self, session, skip_spans):
+        session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml', 'range_bach',
+                                   skip_spans=skip_spans)
+        notes = list(session.get_line_and_notes('range_bach'))
+        for start, end in [(0, 960), (notes[400].onset, notes[420].onset),
+                           (notes[400].onset + 1, None), (notes[-1].onset, None), (10 ** 9, None)]:
+            expected = [n.index for n in notes if n.onset >= start and (end is None or n.onset < end)]
+            assert [n.index for n in session.get_line_range('range_bach', start, end)] == expected
+
+        expected = [n.index for n in notes if n.measure in (20, 21)]
+        notes = list(session.get_line_range('range_bach', 20, 21, unit='measures'))
+        assert [n.index for n in notes] == expected
+
+    def test_range_from_cache(self, session):
+        cached = Session(backend=session.backend, cache_size=1)
+        cached.find_line('bach_cello')
+        notes = list(cached.get_line_and_notes('bach_cello'))
+        session.drop_line('bach_cello')
+        expected = [n.index for n in notes if 960 <= n.onset < 1920]
+        assert [n.index for n in cached.get_line_range('bach_cello', 960, 1920)] == expected
+
+    def test_ticks_range(self, line_session):
+        notes = list(line_session.get_line_range('tester', 480, 1200))
+        assert [(n.name, n.onset) for n in notes] == [('R', 480), ('F3', 960)]
+
+    def test_measures_range(self, line_session):
+        notes = list(line_session.get_line_range('tester', 2, 2, unit='measures'))
+        assert [n.name for n in notes] == ['A3']
+
+    def test_playable_range_keeps_line_time(self, line_session):
+        notes = list(line_session.get_playable_range('tester', 120, 1, unit='seconds'))
+        assert [(n.pitch, n.start_time, n.end_time) for n in notes] == [(53, 1, 1.5), (57, 1.5, 2.5)]
+
+    def test_range_as_sequence_proto_starts_at_zero(self, line_session):
+        sequence = line_session.get_range_as_sequence_proto('tester', 120, 1, 1, unit='measures')
+        assert [(n.pitch, n.start_time, n.end_time) for n in sequence.notes] == [(50, 0, 0.5),
+                                                                              (53, 1, 1.5)]
+        sequence = line_session.get_range_as_sequence_proto('tester', 120, 2, unit='measures')
+        assert [(n.start_time, n.end_time) for n in sequence.notes] == [(0, 1)]
+        assert sequence.total_time == 1
+
+
+class TestPlayLines:
+    @pytest.fixture
+    def lines_session(self, session):
+        for line_name, names in [('violin', ['D5', 'E5', 'F5']), ('cello', ['D3', 'A2'])]:
+            session._add_part(line_name, [(Note(name, 4, 0), False) for name in names])
+        return session
+
+    def test_playable_streams(self, lines_session):
+        streams = lines_session._playable_streams(['violin', 'cello'], 120)
+        assert [[n.pitch for n in stream] for stream in streams] == [[74, 76, 77], [50, 45]]
+
+    def test_missing_line(self, lines_session):
+        with pytest.raises(LineDoesNotExist):
+            lines_session._playable_streams(['violin', 'viola'], 120)
+
+    def test_first_notes_are_read_before_playback(self, lines_session, monkeypatch):
+        get_playable_line = lines_session.get_playable_line
+        def slow_playable_line(*args, **kwargs):
+            time.sleep(0.2)
+            yield from get_playable_line(*args, **kwargs)
+        monkeypatch.setattr(lines_session, 'get_playable_line', slow_playable_line)
+
+        streams = lines_session._playable_streams(['violin', 'cello'], 120)
+        assert all(len(stream) for stream in streams)
+
+        # Playback finds the first notes waiting, so their deadlines are not already past
+        start = time.monotonic()
+        assert [next(stream).pitch for stream in streams] == [74, 50]
+        assert time.monotonic() - start < 0.05
+
+
+class TestNoteChunks:
+    @pytest.mark.parametrize('chunk_size', [1, 7, 643, 1000])
+    def test_chunk_sizes(self, session, chunk_size):
+        notes = list(session.get_line_and_notes('bach_cello', chunk_size=chunk_size))
+        assert [n.index for n in notes] == list(range(643))
+        assert notes[:2] == [Note('D3', 8, 0), Note('F3', 8, 0)]
+
+    def test_chunks_carry_ties(self, session):
+        ties = sum(tied for chunk in session._iter_note_chunks('bach_cello', 100)
+                   for _, tied in chunk)
+        assert ties == session.line_statistics('bach_cello').tie_count
+
+    def test_invalid_chunk_size(self, session):
+        with pytest.raises(ValueError):
+            list(session.get_line_and_notes('bach_cello', chunk_size=0))
+
+    def test_unknown_label_keeps_properties(self):
+        obj = Session._build_object_from_props({'id': 7, 'label': 'Motif', 'name': 'fugue_subject',
+                                                'note_count': 12})
+        assert (obj.label, obj.id, obj.name, obj.note_count) == ('Motif', 7, 'fugue_subject', 12)
+        # Names in the elements module that are not vertex classes are not used
+        assert Session._build_object_from_props({'label': 'Message'}).label == 'Message'
+
+    def test_build_prop_dict_from_row(self):
+        row = {'v': Vertex(id=7700, label='Note'),
+               'props': {'name': ['D3'], 'length': [16], 'dot': [0]}}
+        prop_dict = Session._build_prop_dict_from_row(row)
+        assert prop_dict == {'id': 7700, 'label': 'Note', 'name': 'D3', 'length': 16, 'dot': 0}
+
+
+class TestAddLinesFromXml:
+    def test_parallel_ingest(self, session):
+        session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml',
+                                   'parallel_bach', max_workers=4)
+        notes = list(session.get_line_and_notes('parallel_bach'))
+        session.drop_line('parallel_bach')
+
+        assert len(notes) == 643
+
+    def test_parallel_ingest_of_parts(self, session, two_part_score):
+        session.add_lines_from_xml(two_part_score, 'duo', max_workers=2)
+        expected = list(session.get_line_and_notes('bach_cello'))
+        for line_name in ('duo_P1', 'duo_P2'):
+            assert list(session.get_line_and_notes(line_name)) == expected
+
+    def test_failed_part_does_not_stop_the_others(self, session, two_part_score, monkeypatch):
+        add_part = session._add_part
+        def failing_add_part(line_name, *args):
+            if line_name == 'duo_P2':
+                raise ConnectionError
+            return add_part(line_name, *args)
+        monkeypatch.setattr(session, '_add_part', failing_add_part)
+
+        with pytest.raises(LineIngestError) as excinfo:
+            session.add_lines_from_xml(two_part_score, 'duo', max_workers=2)
+        assert list(excinfo.value.errors) == ['duo_P2']
+        assert isinstance(excinfo.value.errors['duo_P2'], ConnectionError)
+        assert len(list(session.get_line_and_notes('duo_P1'))) == 643
+
+    def test_existing_line_is_not_added_again(self, session):
+        session._add_line('existing_bach')
+        with pytest.raises(LineExists):
+            session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml',
+                                       'existing_bach', max_workers=4)
+        with pytest.raises(LineExists):
+            session._add_line('existing_bach')
+        session.drop_line('existing_bach')
+
+
+    def test_skip_edges_by_default(self, session):
+        assert session._skip_spans('bach_cello') == SKIP_SPANS
+        assert session.line_statistics('bach_cello').skip_count == 42
+
+    def test_skip_edges_seek(self, session):
+        session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml',
+                                   'skip_bach', skip_spans=(4, 16, 64))
+        notes = list(session.get_line_and_notes('skip_bach'))
+        seeks = [session.seek('skip_bach', k) for k in (0, 5, 330, 642, 643)]
+        session.drop_line('skip_bach')
+
+        assert seeks[:4] == [notes[0], notes[5], notes[330], notes[642]]
+        assert seeks[2].index == 330
+        assert seeks[4] is None
+
+
+class TestSkipEdges:
+    def test_seek_without_skip_edges(self, session):
+        notes = list(session.get_line_and_notes('bach_cello'))
+        assert [session.seek('bach_cello', k) for k in (0, 20, 642)] == \
+               [notes[0], notes[20], notes[642]]
+        assert session.seek('bach_cello', 643) is None
+
+    def test_seek_every_note(self, session):
+        notes = list(session.get_line_and_notes('bach_cello'))
+        session.add_skip_edges('bach_cello', (4, 16, 64))
+        seeks = [session.seek('bach_cello', k) for k in range(len(notes))]
+        assert seeks == notes
+        assert [note.index for note in seeks] == list(range(len(notes)))
+
+    def test_missing_line(self, session):
+        with pytest.raises(LineDoesNotExist):
+            session.seek('no_strauss_here', 0)
+
+    def test_spans_must_divide(self, session):
+        with pytest.raises(ValueError):
+            session.add_skip_edges('bach_cello', (4, 10))
+        with pytest.raises(ValueError):
+            session.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml', 'skip_bach',
+                                       skip_spans=(4, 10))
+        assert session.find_line('skip_bach') is None
+
+    def test_skip_edges_replaced(self, session):
+        assert session.add_skip_edges('bach_cello', (4, 16)) == 160 + 40
+        assert session.add_skip_edges('bach_cello', (64,)) == 10
+        assert session.line_statistics('bach_cello').skip_count == 10
+        assert session.seek('bach_cello', 200).index == 200
+
+    def test_skip_edges_plan(self):
+        note_ids = {i: 1000 + i for i in range(0, 40, 4)}
+        edges = Session._skip_edges_plan(note_ids, 37, (4, 16))
+        assert [e for e in edges if e[2] == 16] == [(1000, 1016, 16), (1016, 1032, 16)]
+        assert len([e for e in edges if e[2] == 4]) == 9
+        assert edges[0] == (1000, 1004, 4)
+
+
+class TestDropLineBatches:
+    def test_interrupted_drop_resumes(self, session):
+        def progress(done, total):
+            if done == 200:
+                raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            session.drop_line('bach_cello', batch_size=100, progress=progress)
+        # The rest of the line is still a complete line
+        notes = list(session.get_line_and_notes('bach_cello'))
+        assert [n.index for n in notes] == list(range(200, 643))
+
+        assert session.drop_line('bach_cello', batch_size=100) == 443
+        assert session.find_line('bach_cello') is None
+        assert session.graph_summary(verify=True).total_vertices == 0
+
+
+class TestNGramIndex:
+    motif = [Note('A3', 16, 0), Note('F3', 16, 0), Note('E3', 16, 0), Note('D3', 16, 0),
+             Note('C#3', 16, 0)]
+
+    def test_matches_in_memory_index(self, session):
+        ngram_index = NGramIndex()
+        ngram_index.add_line('bach_cello', session._iter_line_notes('bach_cello'))
+        for motif in (self.motif, self.motif[:2]):
+            for rhythm in (True, False):
+                assert session.search_pattern(motif, rhythm=rhythm) == \
+                       ngram_index.search(motif, rhythm)
+        assert session.search_pattern(self.motif)
+
+    def test_index_is_shared_and_kept_up_to_date(self, session):
+        session.build_ngram_index()
+        matches = session.search_pattern(self.motif, rhythm=False)
+
+        # A new session finds the index in the graph, and keeps it up to date
+        other = Session(backend=session.backend)
+        other.add_lines_from_xml('scores/BachCelloSuiteDminPrelude.xml', 'other_bach')
+        other_matches = [PatternMatch('other_bach', index) for _, index in matches]
+        assert session.search_pattern(self.motif, rhythm=False) == \
+               sorted(matches + other_matches)
+
+        other.drop_line('other_bach')
+        assert session.search_pattern(self.motif, rhythm=False) == matches
+
+    def test_drop_line_removes_ngrams(self, session):
+        session.build_ngram_index()
+        assert session.g.V().hasLabel('NGram').count().next() > 0
+
+        session.drop_line('bach_cello')
+        assert session.g.V().hasLabel('NGram').count().next() == 0
+        assert session.search_pattern(self.motif) == []
+
+    def test_lookups_do_not_scan_the_corpus(self, session):
+        session.build_ngram_index()
+        session = Session(backend=session.backend, metrics=True)
+        session.search_pattern(self.motif)
+        # One lookup for the index size, and one per n-gram of the motif
+        assert sum(stats.count for stats in session.metrics().values()) == 3
+
+
+class TestGraphSummary:
+    def test_summary_from_line_properties(self):
+        stats = LineStatistics(note_count=643, tie_count=2, duration=1000,
+                               pitch_histogram={'D3': 10})
+        rows = [{key: [value] for key, value in dict(stats.to_properties(), name=name).items()}
+                for name in ('a', 'b')]
+        summary = Session._summary_from_line_properties(rows)
+        assert summary == (1288, 2 * 1288, 2, {'a': 643, 'b': 643})
+
+    def test_summary_needs_every_line(self):
+        rows = [{'name': ['a']}]
+        assert Session._summary_from_line_properties(rows) is None
+
+    def test_update_line_statistics(self, session):
+        stored = session.line_statistics('bach_cello')
+        line = session.find_line('bach_cello')
+        session.g.V(line.id).properties('note_count').drop().iterate()
+        assert session.line_statistics('bach_cello') is None
+
+        assert session.update_line_statistics('bach_cello') == stored
+        assert session.line_statistics('bach_cello') == stored
+
+
+class TestStoredLine:
+    def test_summary_matches_full_count(self, session):
+        summary = session.graph_summary()
+        assert summary == session.graph_summary(verify=True)
+        assert summary.total_vertices == 644
+        # 1292 note edges, and 40 + 2 skip edges of spans 16 and 256
+        assert summary.total_edges == 1334
+
+    def test_line_range_from_graph(self, session):
+        notes = list(session.get_line_range('bach_cello', 2, 2, unit='measures'))
+        assert notes[0] == Note('C#3', 16, 0)
+        assert {note.measure for note in notes} == {2}
+
+    def test_drop_line_in_batches(self, session):
+        progress = []
+        assert session.drop_line('bach_cello', batch_size=100,
+                                 progress=lambda done, total: progress.append((done, total))) == 643
+        assert progress[0] == (100, 643)
+        assert progress[-1] == (643, 643)
+        assert session.graph_summary(verify=True).total_vertices == 0
+
+
+class TestLineIngestError:
+    def test_errors_are_aggregated(self):
+        errors = {'piece_P2': LineExists(), 'piece_P1': ValueError()}
+        error = LineIngestError(errors)
+        assert error.errors is errors
+        assert str(error) == 'Failed to add lines: piece_P1, piece_P2'
+
+
 class TestAddNote:
     def test_add_first_note(self, session):
         # note = self._add_note(line, 
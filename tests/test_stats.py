@@ -0,0 +1,58 @@
+"""Tests of RheingoldGraph line statistics."""
+
+import pytest
+
+from rheingoldgraph.elements import Note
+from rheingoldgraph.musicxml import get_parts_from_xml
+from rheingoldgraph.stats import LineStatistics, STATISTICS_PROPERTIES
+
+# Fixtures
+@pytest.fixture
+def note_list():
+    return [(Note('D3', 8, 0), False), (Note('F3', 8, 0), True), (Note('F3', 4, 0), False),
+            (Note('R', 4, 1), True)]
+
+@pytest.fixture
+def stats(note_list):
+    line_stats = LineStatistics()
+    assert list(line_stats.track(note_list)) == note_list
+    return line_stats
+
+
+# Tests
+class TestLineStatistics:
+    def test_counts(self, stats):
+        assert stats.note_count == 4
+        # A trailing tie flag does not make an edge
+        assert stats.tie_count == 1
+        assert stats.duration == 240 + 240 + 480 + 720
+        assert stats.pitch_histogram == {'D3': 1, 'F3': 2}
+
+    def test_graph_counts(self, stats):
+        assert stats.num_vertices == 5
+        # 1 start, 3 next, 4 in_line, 1 tie
+        assert stats.num_edges == 9
+        stats.skip_count = 2
+        assert stats.num_edges == 11
+
+    def test_empty_line(self):
+        stats = LineStatistics()
+        assert (stats.num_vertices, stats.num_edges) == (1, 0)
+
+    def test_properties_round_trip(self, stats):
+        props = stats.to_properties()
+        assert tuple(props) == STATISTICS_PROPERTIES
+        assert props['pitch_histogram'] == '{"D3": 1, "F3": 2}'
+        assert LineStatistics.from_properties(dict(props, name='tester')) == stats
+
+    def test_missing_properties(self):
+        assert LineStatistics.from_properties({'name': 'tester'}) is None
+
+    def test_bach(self):
+        part = get_parts_from_xml('scores/BachCelloSuiteDminPrelude.xml')[0]
+        stats = LineStatistics()
+        for _ in stats.track((n.note, n.tied) for n in part.notes):
+            pass
+        # Matches the counts in the README graph summary, less the 42 skip edges
+        assert stats.num_vertices == 644
+        assert stats.num_edges == 1292